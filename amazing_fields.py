@@ -0,0 +1,202 @@
+"""
+Amazing Fields resolver.
+
+Plugin data for every card comes nested in the board request, indexed by card
+ID. Cards without the Amazing Fields plugin are never sent to the Amazing
+Fields API, and decoded results are cached under a hash of the card's plugin
+data, so a card whose plugin data did not change is decoded only once.
+"""
+import os
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from fetcher import fan_out, fan_out_async, fan_out_async_iter, fan_out_iter
+from trello_client import get_client, get_async_client
+
+logger = logging.getLogger(__name__)
+
+AMAZING_FIELDS_PLUGIN_ID = '5d2cac7c242c7d3a3a5588b6'
+
+DEFAULT_CACHE_SIZE = 5000
+
+
+class AmazingFieldsError(Exception):
+    """Raised when the Amazing Fields API does not decode a card."""
+
+    def __init__(self, message, status_code=500):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def find_amazing_fields_data(plugin_data):
+    """Return the Amazing Fields entry from a card's pluginData list, if any."""
+    for data in plugin_data or []:
+        if data.get('idPlugin') == AMAZING_FIELDS_PLUGIN_ID:
+            return data
+    return None
+
+
+def index_plugin_data(cards):
+    """
+    Map card ID -> Amazing Fields plugin entry for cards fetched with their
+    pluginData nested, removing the pluginData from the cards. Cards without
+    the plugin are left out.
+    """
+    entries = {}
+    for card in cards:
+        entry = find_amazing_fields_data(card.pop('pluginData', None))
+        if entry is not None:
+            entries[card['id']] = entry
+    return entries
+
+
+def plugin_data_hash(entry):
+    """Content hash of a card's Amazing Fields plugin data."""
+    return hashlib.sha1(str(entry.get('value', '')).encode('utf-8')).hexdigest()
+
+
+class AmazingFieldsResolver:
+    def __init__(self, api_url, token, cache_size=DEFAULT_CACHE_SIZE, client=None, async_client=None):
+        self.api_url = api_url
+        self.token = token
+        self.cache_size = cache_size
+        self.client = client
+        self.async_client = async_client
+        self.stats = {'decoded': 0, 'hits': 0, 'skipped': 0, 'errors': 0}
+        self._decoded = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def _cached(self, key):
+        with self._lock:
+            decoded = self._decoded.get(key)
+            if decoded is not None:
+                self._decoded.move_to_end(key)
+                self.stats['hits'] += 1
+            return decoded
+
+    def _remember(self, key, decoded):
+        with self._lock:
+            self._decoded[key] = decoded
+            self._decoded.move_to_end(key)
+            while len(self._decoded) > self.cache_size:
+                self._decoded.popitem(last=False)
+            self.stats['decoded'] += 1
+
+    def _url_and_headers(self, card_id):
+        return f"{self.api_url}/card/{card_id}", {'Authorization': f'Bearer {self.token}'}
+
+    def _decoded_json(self, card_id, response):
+        if response.status_code != 200:
+            logger.error(f"Error accessing Amazing Fields API: {response.status_code}")
+            logger.error(f"Response: {response.text}")
+            raise AmazingFieldsError('Error accessing Amazing Fields API', response.status_code)
+        return response.json()
+
+    def decode(self, card_id, entry):
+        """Decoded Amazing Fields of a card, from the cache or the Amazing Fields API."""
+        key = (card_id, plugin_data_hash(entry))
+        decoded = self._cached(key)
+        if decoded is None:
+            url, headers = self._url_and_headers(card_id)
+            # Not through the response cache: the content hash in key is what invalidates a decode
+            response = (self.client or get_client()).get(url, headers=headers, use_cache=False)
+            decoded = self._decoded_json(card_id, response)
+            self._remember(key, decoded)
+        return decoded
+
+    async def decode_async(self, card_id, entry):
+        key = (card_id, plugin_data_hash(entry))
+        decoded = self._cached(key)
+        if decoded is None:
+            url, headers = self._url_and_headers(card_id)
+            response = await (self.async_client or get_async_client()).get(url, headers=headers, use_cache=False)
+            decoded = self._decoded_json(card_id, response)
+            self._remember(key, decoded)
+        return decoded
+
+    def _split(self, cards, entries):
+        with_plugin = [card for card in cards if card['id'] in entries]
+        skipped = len(cards) - len(with_plugin)
+        if skipped:
+            self._count('skipped', skipped)
+            logger.debug("%d cards have no Amazing Fields data", skipped)
+        return with_plugin
+
+    def _resolve_card(self, card, entries):
+        try:
+            decoded = self.decode(card['id'], entries[card['id']])
+            if decoded:
+                card['customFields'] = decoded
+        except Exception:
+            self._count('errors')
+            logger.exception(f"Error getting Amazing Fields data for card {card['id']}")
+        return card
+
+    async def _resolve_card_async(self, card, entries):
+        try:
+            decoded = await self.decode_async(card['id'], entries[card['id']])
+            if decoded:
+                card['customFields'] = decoded
+        except Exception:
+            self._count('errors')
+            logger.exception(f"Error getting Amazing Fields data for card {card['id']}")
+        return card
+
+    def resolve(self, cards, entries):
+        """Set card['customFields'] to the decoded Amazing Fields of every card that has the plugin."""
+        fan_out(lambda card: self._resolve_card(card, entries), self._split(cards, entries))
+
+    async def resolve_async(self, cards, entries):
+        await fan_out_async(lambda card: self._resolve_card_async(card, entries), self._split(cards, entries))
+
+    def iter_resolved(self, cards, entries):
+        """
+        Yield every card once its Amazing Fields are resolved: cards without the
+        plugin right away, the others as each decode completes.
+        """
+        with_plugin = self._split(cards, entries)
+        for card in cards:
+            if card['id'] not in entries:
+                yield card
+        yield from fan_out_iter(lambda card: self._resolve_card(card, entries), with_plugin)
+
+    async def iter_resolved_async(self, cards, entries):
+        with_plugin = self._split(cards, entries)
+        for card in cards:
+            if card['id'] not in entries:
+                yield card
+        async for card in fan_out_async_iter(lambda card: self._resolve_card_async(card, entries), with_plugin):
+            yield card
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, entries=len(self._decoded), max_entries=self.cache_size)
+
+
+_resolver = None
+_resolver_lock = threading.Lock()
+
+
+def get_resolver():
+    """
+    Return the process-wide resolver configured by AMAZING_FIELDS_API_URL,
+    AMAZING_FIELDS_TOKEN and AMAZING_FIELDS_CACHE_SIZE, or None without a token.
+    """
+    global _resolver
+    token = os.getenv('AMAZING_FIELDS_TOKEN')
+    if not token:
+        return None
+    with _resolver_lock:
+        if _resolver is None or _resolver.token != token:
+            _resolver = AmazingFieldsResolver(
+                os.getenv('AMAZING_FIELDS_API_URL', 'https://api.amazingfields.com/api/v1'),
+                token,
+                cache_size=int(os.getenv('AMAZING_FIELDS_CACHE_SIZE', DEFAULT_CACHE_SIZE)),
+            )
+        return _resolver
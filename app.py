@@ -1,25 +1,69 @@
-from flask import Flask, render_template, jsonify, request, send_from_directory
-import requests
+from flask import Flask, Response, render_template, jsonify, request, send_file, send_from_directory, stream_with_context
 from dotenv import load_dotenv
 import os
 import logging
 import json
 import datetime
-import io
-import csv
+import threading
+import uuid
+
+from amazing_fields import AmazingFieldsError, find_amazing_fields_data, get_resolver, index_plugin_data
+from trello_client import get_client, get_async_client
+from board_loader import BoardLoader, CARD_FIELDS, DETAIL_RESOURCES, TrelloError, find_list
+from board_pages import page_body, paginate, parse_page_args, project, wants
+from mirror import BoardMirror, verify_signature
+from vtiger_export import DEFAULT_MAPPING, build_vtiger_row, generate_vtiger_csv, iter_csv_rows, gzip_chunks
+from vtiger_client import vtiger_client_from_env
+from jobs import job_queue_from_env, job_status
+from sync_state import IncrementalRun, get_sync_state
+from json_provider import NDJSON_MIMETYPE, init_json, json_bytes, wants_ndjson
+from compression import init_compression
+from metrics import Gauge, SpanTotal, annotate, init_metrics, registry, span
+from log_config import configure_logging
+from targets import get_scheduler, get_target_status, get_targets, run_targets
+from export_store import get_export_store, sanitize
+from row_validation import ValidationReport, iter_validated
+from snapshot import BoardSnapshot, DEFAULT_SNAPSHOT_PATH, build_snapshot
 
 # Load environment variables
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Configure logging (LOG_LEVEL, LOG_FORMAT=json, LOG_QUEUE)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Constants
-AMAZING_FIELDS_PLUGIN_ID = '5d2cac7c242c7d3a3a5588b6'
-AMAZING_FIELDS_API_URL = 'https://api.amazingfields.com/api/v1'
+TRELLO_API_URL = os.getenv('TRELLO_API_URL', 'https://api.trello.com/1')
 
 app = Flask(__name__)
+init_json(app)
+init_compression(app)
+init_metrics(app)
+
+def fetch_mirror_card(card_id):
+    """Re-fetch a single card for the board mirror, bypassing the response cache."""
+    cache = get_client().cache
+    if cache is not None:
+        cache.invalidate_card(card_id)
+    loader = BoardLoader(TRELLO_API_URL, os.getenv('TRELLO_API_KEY'), os.getenv('TRELLO_API_TOKEN'))
+    return loader.get_card(card_id, use_cache=False)
+
+board_mirror = BoardMirror(fetch_mirror_card, enabled=os.getenv('BOARD_MIRROR', '0') == '1')
+
+def load_board_snapshot():
+    """Fresh snapshot of the Factura list, loaded from Trello."""
+    loader = BoardLoader(TRELLO_API_URL, os.getenv('TRELLO_API_KEY'), os.getenv('TRELLO_API_TOKEN'))
+    return build_snapshot(loader, os.getenv('TRELLO_BOARD_ID'))
+
+# Pre-warmed Factura list (see prewarm.py), refreshed in the background; the mirror takes precedence
+board_snapshot = BoardSnapshot(
+    load_board_snapshot,
+    os.getenv('TRELLO_BOARD_ID'),
+    path=os.getenv('SNAPSHOT_PATH', DEFAULT_SNAPSHOT_PATH),
+    refresh_interval=int(os.getenv('SNAPSHOT_REFRESH_INTERVAL', '300')),
+    enabled=os.getenv('BOARD_SNAPSHOT', '0') == '1',
+)
+board_snapshot.start()
 
 @app.route('/')
 def index():
@@ -31,387 +75,371 @@ def get_amazing_fields_data(card_id):
     Get Amazing Fields data for a specific card using the Amazing Fields API
     """
     try:
-        api_key = os.getenv('TRELLO_API_KEY')
-        token = os.getenv('TRELLO_API_TOKEN')
-        amazing_fields_token = os.getenv('AMAZING_FIELDS_TOKEN', '')
-        
-        if not amazing_fields_token:
+        resolver = get_resolver()
+        if resolver is None:
             logger.warning("Amazing Fields token not found. You need a supporter account to access the Amazing Fields API.")
             return jsonify({'error': 'Amazing Fields token not configured'}), 400
         
-        # Get plugin data directly from Trello API
-        plugin_data_url = f"https://api.trello.com/1/cards/{card_id}/pluginData"
-        plugin_data_response = requests.get(
-            plugin_data_url,
-            params={
-                'key': api_key,
-                'token': token
-            }
-        )
-        
-        if plugin_data_response.status_code != 200:
-            logger.error(f"Error getting plugin data: {plugin_data_response.status_code}")
-            logger.error(f"Response: {plugin_data_response.text}")
-            return jsonify({'error': f"Error getting plugin data: {plugin_data_response.status_code}"}), 500
-            
-        plugin_data = plugin_data_response.json()
-        logger.debug(f"Plugin data for card {card_id}: {json.dumps(plugin_data, indent=2)}")
+        loader = BoardLoader(TRELLO_API_URL, os.getenv('TRELLO_API_KEY'), os.getenv('TRELLO_API_TOKEN'))
+        plugin_data = loader.get_json(f"/cards/{card_id}/pluginData", 'plugin data')
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Plugin data for card %s: %s", card_id, json.dumps(plugin_data, indent=2))
         
-        # Filter for Amazing Fields plugin data
-        amazing_fields_data = None
-        for data in plugin_data:
-            if data.get('idPlugin') == AMAZING_FIELDS_PLUGIN_ID:
-                amazing_fields_data = data
-                break
-                
+        amazing_fields_data = find_amazing_fields_data(plugin_data)
         if not amazing_fields_data:
             logger.warning(f"No Amazing Fields data found for card {card_id}")
             return jsonify({'error': 'No Amazing Fields data found for this card'}), 404
-            
-        # Use Amazing Fields API to decode the data
-        amazing_fields_response = requests.get(
-            f"{AMAZING_FIELDS_API_URL}/card/{card_id}",
-            headers={
-                'Authorization': f'Bearer {amazing_fields_token}'
-            }
-        )
         
-        if amazing_fields_response.status_code != 200:
-            logger.error(f"Error accessing Amazing Fields API: {amazing_fields_response.status_code}")
-            logger.error(f"Response: {amazing_fields_response.text}")
+        # Decoded results are cached by plugin data content, so an unchanged card is decoded once
+        try:
+            return jsonify(resolver.decode(card_id, amazing_fields_data))
+        except AmazingFieldsError as e:
             return jsonify({
-                'error': 'Error accessing Amazing Fields API', 
+                'error': str(e),
                 'raw_data': amazing_fields_data,
-                'status': amazing_fields_response.status_code
+                'status': e.status_code
             }), 500
-            
-        decoded_data = amazing_fields_response.json()
-        return jsonify(decoded_data)
         
+    except TrelloError as e:
+        return jsonify({'error': str(e)}), e.status_code
     except Exception as e:
         logger.exception(f"Error processing Amazing Fields data for card {card_id}")
         return jsonify({'error': str(e)}), 500
 
-def get_amazing_fields(card_id, amazing_fields_token, api_key, token):
-    try:
-        # Get plugin data directly from Trello API
-        plugin_data_url = f"https://api.trello.com/1/cards/{card_id}/pluginData"
-        plugin_data_response = requests.get(
-            plugin_data_url,
-            params={
-                'key': api_key,
-                'token': token
-            }
-        )
-        
-        if plugin_data_response.status_code != 200:
-            logger.error(f"Error getting plugin data: {plugin_data_response.status_code}")
-            logger.error(f"Response: {plugin_data_response.text}")
-            return None
-            
-        plugin_data = plugin_data_response.json()
-        logger.debug(f"Plugin data for card {card_id}: {json.dumps(plugin_data, indent=2)}")
-        
-        # Filter for Amazing Fields plugin data
-        amazing_fields_data = None
-        for data in plugin_data:
-            if data.get('idPlugin') == AMAZING_FIELDS_PLUGIN_ID:
-                amazing_fields_data = data
-                break
-                
-        if not amazing_fields_data:
-            logger.warning(f"No Amazing Fields data found for card {card_id}")
-            return None
-            
-        # Use Amazing Fields API to decode the data
-        amazing_fields_response = requests.get(
-            f"{AMAZING_FIELDS_API_URL}/card/{card_id}",
-            headers={
-                'Authorization': f'Bearer {amazing_fields_token}'
-            }
-        )
-        
-        if amazing_fields_response.status_code != 200:
-            logger.error(f"Error accessing Amazing Fields API: {amazing_fields_response.status_code}")
-            logger.error(f"Response: {amazing_fields_response.text}")
-            return None
-            
-        decoded_data = amazing_fields_response.json()
-        return decoded_data
-        
-    except Exception as e:
-        logger.exception(f"Error processing Amazing Fields data for card {card_id}")
+def board_factura_list(board):
+    """The Factura list of a /board response, found by exact name among the board's lists, or None."""
+    factura_list = find_list(board.get('lists', []), 'Factura', exact=True)
+    if not factura_list:
+        logger.error("Factura list not found")
         return None
+    logger.debug("Factura list found: %s", factura_list['id'])
+    return factura_list
+
+def board_cards_list(factura_list, cards):
+    """The factura_list of /board with its cards, every card carrying all its keys before Amazing Fields come in."""
+    annotate(cards=len(cards))
+    for card in cards:
+        card.setdefault('checklists', [])
+        card.setdefault('customFieldItems', [])
+        card['customFields'] = {}
+    return dict(factura_list, cards=cards)
+
+def board_header(board, factura_list):
+    """First NDJSON line of /board: the board and its Factura list without the cards."""
+    return {'board': board, 'factura_list': {k: v for k, v in factura_list.items() if k != 'cards'}}
+
+def iter_board_lines(board, factura_list, cards, resolver, plugin_entries):
+    """NDJSON lines of /board: {"board", "factura_list"} without the cards, then one line per card."""
+    yield json_bytes(app, board_header(board, factura_list)) + b'\n'
+    resolved = resolver.iter_resolved(cards, plugin_entries) if resolver is not None else cards
+    for card in resolved:
+        yield json_bytes(app, card) + b'\n'
+
+def trello_headers(loader):
+    """X-Trello-Requests header of a response, after recording the count for the request log."""
+    annotate(trello_requests=loader.request_count)
+    return {'X-Trello-Requests': str(loader.request_count)}
 
 @app.route('/board')
 def get_board_data():
     try:
-        logger.info("Fetching board data...")
         api_key = os.getenv('TRELLO_API_KEY')
         token = os.getenv('TRELLO_API_TOKEN')
         board_id = os.getenv('TRELLO_BOARD_ID')
+        loader = BoardLoader(TRELLO_API_URL, api_key, token)
         
-        # Get the board data
-        logger.info(f"Fetching board data for board ID: {board_id}")
-        board_url = f"https://api.trello.com/1/boards/{board_id}"
-        board_response = requests.get(
-            board_url,
-            params={
-                'key': api_key,
-                'token': token,
-                'lists': 'open',
-                'cards': 'open',
-                'card_fields': 'name,desc,labels,due,idChecklists',
-                'fields': 'name,url'
-            }
-        )
-        
-        if board_response.status_code != 200:
-            logger.error(f"Error getting board data: {board_response.status_code}")
-            return jsonify({'error': f"Error getting board data: {board_response.status_code}"}), 500
-            
-        board = board_response.json()
-        logger.info(f"Board data fetched successfully: {board['name']}")
-        
-        # Get all lists
-        logger.info("Fetching lists...")
-        lists_url = f"https://api.trello.com/1/boards/{board_id}/lists"
-        lists_response = requests.get(
-            lists_url,
-            params={
-                'key': api_key,
-                'token': token,
-                'cards': 'open',
-                'card_fields': 'name,desc,labels,due,idChecklists'
-            }
-        )
-        
-        if lists_response.status_code != 200:
-            logger.error(f"Error getting lists: {lists_response.status_code}")
-            return jsonify({'error': f"Error getting lists: {lists_response.status_code}"}), 500
-            
-        lists = lists_response.json()
-        logger.info(f"Lists fetched successfully: {len(lists)} lists found")
+        # Get the board data, including its open lists (and the cards' plugin data for Amazing Fields)
+        resolver = get_resolver()
+        logger.debug("Fetching board data for board ID: %s", board_id)
+        board = loader.get_board(board_id, plugin_data=resolver is not None)
+        plugin_entries = index_plugin_data(board.get('cards', []))
+        logger.debug("Board data fetched successfully: %s", board['name'])
         
         # Find the "Factura" list
-        factura_list = None
-        for list_item in lists:
-            if list_item['name'] == 'Factura':
-                factura_list = list_item
-                break
-                
+        factura_list = board_factura_list(board)
         if not factura_list:
-            logger.error("Factura list not found")
             return jsonify({'error': "Factura list not found"}), 404
-            
-        logger.info(f"Factura list found: {factura_list['id']}")
         
-        # Get cards from the Factura list
-        cards = factura_list.get('cards', [])
-        logger.info(f"Found {len(cards)} cards in the Factura list")
+        # Get cards from the Factura list with checklists and custom fields nested
+        cards = loader.get_list_cards(factura_list['id'], custom_field_items=True)
+        factura_list = board_cards_list(factura_list, cards)
         
-        # Get checklists for each card
-        for card in cards:
-            logger.info(f"Processing card: {card['name']} ({card['id']})")
-            if 'idChecklists' in card and card['idChecklists']:
-                logger.info(f"Card has {len(card['idChecklists'])} checklists")
-                card['checklists'] = []
-                for checklist_id in card['idChecklists']:
-                    logger.info(f"Fetching checklist: {checklist_id}")
-                    checklist_url = f"https://api.trello.com/1/checklists/{checklist_id}"
-                    checklist_response = requests.get(
-                        checklist_url,
-                        params={
-                            'key': api_key,
-                            'token': token,
-                            'fields': 'name,checkItems',
-                            'checkItems': 'all',
-                            'checkItem_fields': 'name,state'
-                        }
-                    )
-                    
-                    if checklist_response.status_code == 200:
-                        checklist = checklist_response.json()
-                        logger.info(f"Checklist fetched: {checklist['name']} with {len(checklist.get('checkItems', []))} items")
-                        card['checklists'].append(checklist)
-                    else:
-                        logger.warning(f"Error getting checklist {checklist_id}: {checklist_response.status_code}")
-            else:
-                logger.info(f"Card has no checklists")
+        if resolver is None:
+            logger.warning("Amazing Fields token not set")
         
-        # Get custom fields for each card
-        for card in cards:
-            try:
-                # Get custom fields from Trello API
-                logger.info(f"Fetching custom fields for card: {card['id']}")
-                custom_fields_url = f"https://api.trello.com/1/cards/{card['id']}/customFieldItems"
-                custom_fields_response = requests.get(
-                    custom_fields_url,
-                    params={
-                        'key': api_key,
-                        'token': token
-                    }
-                )
-                
-                if custom_fields_response.status_code == 200:
-                    card['customFieldItems'] = custom_fields_response.json()
-                    logger.info(f"Custom fields fetched: {len(card['customFieldItems'])} fields found")
-                else:
-                    logger.warning(f"Error getting custom fields for card {card['id']}: {custom_fields_response.status_code}")
-                    card['customFieldItems'] = []
-                    
-                # Try to get Amazing Fields data
-                amazing_fields_token = os.getenv('AMAZING_FIELDS_TOKEN')
-                if amazing_fields_token:
-                    try:
-                        logger.info(f"Fetching Amazing Fields data for card: {card['id']}")
-                        amazing_fields = get_amazing_fields(card['id'], amazing_fields_token, api_key, token)
-                        if amazing_fields:
-                            logger.info(f"Amazing Fields data fetched: {len(amazing_fields)} fields found")
-                            card['customFields'] = amazing_fields
-                        else:
-                            logger.warning(f"No Amazing Fields data found for card {card['id']}")
-                            card['customFields'] = {}
-                    except Exception as e:
-                        logger.exception(f"Error getting Amazing Fields data for card {card['id']}")
-                        card['customFields'] = {}
-                else:
-                    logger.warning("Amazing Fields token not set")
-                    card['customFields'] = {}
-            except Exception as e:
-                logger.exception(f"Error processing custom fields for card {card['id']}")
-                card['customFieldItems'] = []
-                card['customFields'] = {}
+        # NDJSON: the board header first, then each card as soon as its Amazing Fields are in
+        if wants_ndjson(request.args, request.headers.get('Accept')):
+            lines = iter_board_lines(board, factura_list, cards, resolver, plugin_entries)
+            return Response(stream_with_context(lines), mimetype=NDJSON_MIMETYPE, headers=trello_headers(loader))
+        
+        # Try to get Amazing Fields data
+        if resolver is not None:
+            resolver.resolve(cards, plugin_entries)
         
         # Return the data
-        logger.info("Returning board data")
-        return jsonify({
-            'board': board,
-            'factura_list': factura_list
-        })
+        return jsonify({'board': board, 'factura_list': factura_list}), trello_headers(loader)
         
+    except TrelloError as e:
+        return jsonify({'error': str(e)}), e.status_code
     except Exception as e:
         logger.exception("Error getting board data")
         return jsonify({'error': str(e)}), 500
 
+def stored_board_page(before, limit, fields):
+    """
+    The /board-data body served from the board mirror, or from the pre-warmed
+    snapshot when the mirror is off, without calling Trello; None when neither
+    is ready.
+    """
+    if board_mirror.ready:
+        cards, source = board_mirror.cards(), 'mirror'
+    elif board_snapshot.ready and not board_mirror.enabled:
+        cards, source = board_snapshot.cards(), 'snapshot'
+    else:
+        return None
+    page, next_before = paginate(cards, before, limit)
+    annotate(cards=len(page), trello_requests=0, source=source)
+    return page_body(page, fields, before, limit, next_before)
+
+def is_full_load(before, limit, fields):
+    """
+    Whether a /board-data request loads every card with all its fields: when
+    it asks for them, or when the enabled board mirror still has to be seeded.
+    """
+    return (before is None and limit is None and fields is None) or board_mirror.enabled
+
+def page_details(fields, limit):
+    """
+    Detail resources fetched through /1/batch for the cards of a /board-data
+    page. A whole list (no limit) comes with its checklists nested instead.
+    """
+    return tuple(resource for resource in DETAIL_RESOURCES
+                 if wants(fields, resource) and not (limit is None and resource == 'checklists'))
+
+def page_card_fields(fields):
+    """Trello's fields= for the list cards of a /board-data projection; only the ones it returns (and the ID)."""
+    if fields is None:
+        return CARD_FIELDS
+    return ','.join(['id'] + [field for field in CARD_FIELDS.split(',') if field in fields])
+
+def full_board_page(factura_list, cards, before=None, limit=None):
+    """(page, next_before) of a full load of the Factura list, seeding the board mirror with it."""
+    if board_mirror.enabled:
+        board_mirror.seed(factura_list, cards)
+    return paginate(cards, before, limit)
+
 @app.route('/board-data')
 def get_board_data_simplified():
+    """
+    Cards of the Factura list. Optional query args: limit and before for cursor
+    pagination (newest first, like Trello's own), and fields=name,labels,due,...
+    to return only those card fields. Checklists and custom fields are only
+    fetched when requested, and for a page only those of its cards.
+    """
     try:
-        logger.info("Fetching simplified board data...")
-        api_key = os.getenv('TRELLO_API_KEY')
-        token = os.getenv('TRELLO_API_TOKEN')
-        board_id = os.getenv('TRELLO_BOARD_ID')
-        
-        # Get the board data
-        logger.info(f"Fetching board data for board ID: {board_id}")
-        
-        # Get all lists
-        lists_url = f"https://api.trello.com/1/boards/{board_id}/lists"
-        lists_response = requests.get(
-            lists_url,
-            params={
-                'key': api_key,
-                'token': token,
-                'filter': 'open',
-                'fields': 'name,id'
-            }
-        )
-        
-        if lists_response.status_code != 200:
-            logger.error(f"Error getting lists: {lists_response.status_code}")
-            return jsonify({'error': f"Error getting lists: {lists_response.status_code}"}), 500
-            
-        lists = lists_response.json()
-        logger.info(f"Found {len(lists)} lists")
-        
-        # Find the "Factura" list
-        factura_list = None
-        for list_item in lists:
-            if "factura" in list_item['name'].lower():
-                factura_list = list_item
-                break
-        
-        if not factura_list:
-            logger.error("Factura list not found")
-            return jsonify({'error': "Lista 'Factura' no encontrada"}), 404
-        
-        logger.info(f"Found Factura list: {factura_list['name']}")
-        
-        # Get cards from the Factura list
-        cards_url = f"https://api.trello.com/1/lists/{factura_list['id']}/cards"
-        cards_response = requests.get(
-            cards_url,
-            params={
-                'key': api_key,
-                'token': token,
-                'fields': 'name,desc,labels,due,idChecklists',
-                'checklists': 'all'
-            }
-        )
-        
-        if cards_response.status_code != 200:
-            logger.error(f"Error getting cards: {cards_response.status_code}")
-            return jsonify({'error': f"Error getting cards: {cards_response.status_code}"}), 500
-            
-        cards = cards_response.json()
-        logger.info(f"Found {len(cards)} cards in Factura list")
-        
-        # Get custom fields for each card
-        for card in cards:
-            # Get custom fields from Trello
-            custom_fields_url = f"https://api.trello.com/1/cards/{card['id']}/customFields"
-            custom_fields_response = requests.get(
-                custom_fields_url,
-                params={
-                    'key': api_key,
-                    'token': token
-                }
-            )
-            
-            if custom_fields_response.status_code == 200:
-                card['customFields'] = custom_fields_response.json()
-            else:
-                card['customFields'] = []
-        
-        return jsonify({'cards': cards})
+        before, limit, fields = parse_page_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        body = stored_board_page(before, limit, fields)
+        if body is not None:
+            return jsonify(body), {'X-Trello-Requests': '0'}
         
+        board_id = os.getenv('TRELLO_BOARD_ID')
+        loader = BoardLoader(TRELLO_API_URL, os.getenv('TRELLO_API_KEY'), os.getenv('TRELLO_API_TOKEN'))
+        logger.debug("Fetching board data for board ID: %s", board_id)
+        if is_full_load(before, limit, fields):
+            page, next_before = full_board_page(*loader.load_factura_cards(board_id), before, limit)
+        else:
+            factura_list = loader.find_factura_list(board_id)
+            checklists = limit is None and wants(fields, 'checklists')
+            cards = loader.get_list_cards(factura_list['id'], checklists=checklists,
+                                          fields=page_card_fields(fields), before=before)
+            page, next_before = paginate(cards, before, limit)
+            loader.attach_details(page, page_details(fields, limit))
+        
+        annotate(cards=len(page))
+        return jsonify(page_body(page, fields, before, limit, next_before)), trello_headers(loader)
+        
+    except TrelloError as e:
+        return jsonify({'error': str(e)}), e.status_code
     except Exception as e:
         logger.exception(f"Error in get_board_data_simplified: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/board-data/<card_id>')
+def get_card_detail(card_id):
+    """One card of the Factura list with its checklists and custom fields (fields= projects it)."""
+    try:
+        _, _, fields = parse_page_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        if board_mirror.ready:
+            card = board_mirror.get_card(card_id)
+            if card is None:
+                return jsonify({'error': 'Card not found in the Factura list'}), 404
+            response = jsonify(project(card, fields))
+            response.headers['X-Trello-Requests'] = '0'
+            return response
+        if board_snapshot.ready and not board_mirror.enabled:
+            card = board_snapshot.get_card(card_id)
+            if card is not None:
+                response = jsonify(project(card, fields))
+                response.headers['X-Trello-Requests'] = '0'
+                return response
+        
+        loader = BoardLoader(TRELLO_API_URL, os.getenv('TRELLO_API_KEY'), os.getenv('TRELLO_API_TOKEN'))
+        factura_list = loader.find_factura_list(os.getenv('TRELLO_BOARD_ID'))
+        card = loader.get_card(card_id, custom_fields=wants(fields, 'customFields'))
+        if card.get('idList') != factura_list['id'] or card.get('closed'):
+            return jsonify({'error': 'Card not found in the Factura list'}), 404
+        response = jsonify(project(card, fields))
+        response.headers['X-Trello-Requests'] = str(loader.request_count)
+        return response
+        
+    except TrelloError as e:
+        return jsonify({'error': str(e)}), e.status_code
+    except Exception as e:
+        logger.exception(f"Error getting card {card_id}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/webhooks/trello', methods=['HEAD', 'POST'])
+def trello_webhook():
+    """Trello webhook callback: HEAD answers Trello's registration check, POST carries an action."""
+    if request.method == 'HEAD':
+        return '', 200
+
+    body = request.get_data()
+    callback_url = os.getenv('TRELLO_WEBHOOK_CALLBACK_URL', request.base_url)
+    if not verify_signature(body, callback_url, os.getenv('TRELLO_API_SECRET'),
+                            request.headers.get('X-Trello-Webhook')):
+        logger.warning("Rejected Trello webhook with invalid signature")
+        return jsonify({'error': 'Invalid signature'}), 403
+
+    try:
+        action = json.loads(body).get('action', {})
+        result = board_mirror.apply_action(action)
+        logger.info(f"Webhook action {action.get('type')}: {result}")
+        return jsonify({'success': True, 'result': result})
+    except Exception as e:
+        logger.exception("Error applying Trello webhook")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/mirror/status')
+def mirror_status():
+    """State and counters of the webhook-driven board mirror."""
+    return jsonify(board_mirror.snapshot())
+
+@app.route('/snapshot/status')
+def snapshot_status():
+    """Age, size and refresh counters of the pre-warmed Factura list snapshot."""
+    return jsonify(board_snapshot.snapshot())
+
+@app.route('/snapshot/refresh', methods=['POST'])
+def refresh_snapshot():
+    """Rebuild the snapshot from Trello now instead of waiting for the next scheduled refresh."""
+    if not board_snapshot.enabled:
+        return jsonify({'error': 'Board snapshot not enabled (BOARD_SNAPSHOT=1)'}), 400
+    try:
+        board_snapshot.refresh(force=True)
+        return jsonify(dict(board_snapshot.snapshot(), success=True))
+    except TrelloError as e:
+        return jsonify({'error': str(e)}), e.status_code
+    except Exception as e:
+        logger.exception("Error refreshing board snapshot")
+        return jsonify({'error': str(e)}), 500
+
+def snapshot_age():
+    return {(): round(board_snapshot.snapshot()['age'], 1)} if board_snapshot.ready else {}
+
+registry.register(Gauge('board_snapshot_age_seconds', 'Age of the Factura list snapshot being served', (), snapshot_age))
+
+@app.route('/upstream-stats')
+def upstream_stats():
+    """Counters of the shared upstream HTTP clients (the async one serves the ASGI routes)."""
+    return jsonify(dict(get_client().stats, **{'async': get_async_client().stats}))
+
+@app.route('/cache/stats')
+def cache_stats():
+    """Hit/miss/eviction counters and size of the response cache and the Amazing Fields decode cache."""
+    cache = get_client().cache
+    stats = dict(cache.snapshot(), enabled=True) if cache is not None else {'enabled': False}
+    resolver = get_resolver()
+    if resolver is not None:
+        stats['amazing_fields'] = resolver.snapshot()
+    return jsonify(stats)
+
+def cache_sizes():
+    cache = get_client().cache
+    if cache is None:
+        return {}
+    snapshot = cache.snapshot()
+    return {('entries',): snapshot['entries'], ('bytes',): snapshot['bytes']}
+
+def amazing_fields_cache_sizes():
+    resolver = get_resolver()
+    return {(): resolver.snapshot()['entries']} if resolver is not None else {}
+
+registry.register(Gauge('trello_cache_size', 'Response cache size in entries and bytes', ('unit',), cache_sizes))
+registry.register(Gauge('amazing_fields_cache_entries', 'Decoded Amazing Fields cached', (), amazing_fields_cache_sizes))
+
+@app.route('/metrics')
+def metrics():
+    """Upstream latency histograms, call/error/429/cache counters and span timings in Prometheus format."""
+    return Response(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/cache/invalidate/card/<card_id>', methods=['POST'])
+def invalidate_card_cache(card_id):
+    """Forget cached data for a card after it was edited."""
+    cache = get_client().cache
+    removed = cache.invalidate_card(card_id) if cache is not None else 0
+    logger.info(f"Invalidated {removed} cache entries for card {card_id}")
+    return jsonify({'success': True, 'removed': removed})
+
+@app.route('/cache/invalidate/board/<board_id>', methods=['POST'])
+def invalidate_board_cache(board_id):
+    """Forget cached data for a whole board."""
+    cache = get_client().cache
+    removed = cache.invalidate_board(board_id) if cache is not None else 0
+    logger.info(f"Invalidated {removed} cache entries for board {board_id}")
+    return jsonify({'success': True, 'removed': removed})
+
 @app.route('/generate-vtiger-file', methods=['POST'])
 def generate_vtiger_file():
-    """Generate a file for vTiger import from card data."""
+    """
+    Generate a file for vTiger import from card data, validated like the bulk
+    exports: a card that fails validation gets a 422 with the rejected values.
+    {"async": true} runs it as a job, which fails for such a card.
+    """
     try:
-        logger.info("Received request to generate vTiger file")
         data = request.json
         if not data or 'cardData' not in data:
             logger.error("No card data provided in request")
             return jsonify({'error': 'No card data provided'}), 400
         
         card_data = data['cardData']
-        logger.info(f"Generating vTiger file for card: {card_data.get('name', 'Unknown')}")
+        if data.get('async'):
+            return queue_export_job({'cardData': card_data})
+        logger.debug("Generating vTiger file for card: %s", card_data.get('name', 'Unknown'))
         
-        # Create CSV content for vTiger import
-        csv_content = generate_vtiger_csv(card_data)
-        logger.info(f"Generated CSV content: {csv_content[:100]}...")
-        
-        # Create a unique filename
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        sanitized_name = ''.join(c if c.isalnum() else '_' for c in card_data.get('name', 'card'))
-        filename = f"vtiger_import_{sanitized_name}_{timestamp}.csv"
-        logger.info(f"Generated filename: {filename}")
+        report = ValidationReport()
+        rows = list(validated([build_vtiger_row(card_data)], DEFAULT_MAPPING, report))
+        if not rows:
+            return jsonify({'error': 'Card failed validation', 'rejects': report.reasons()}), 422
         
-        # Save the file
-        file_path = os.path.join('static', 'exports', filename)
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        logger.info(f"Saving file to: {os.path.abspath(file_path)}")
-        
-        with open(file_path, 'w', newline='', encoding='utf-8') as f:
-            f.write(csv_content)
+        # Create CSV content for vTiger import
+        csv_content = generate_vtiger_csv(rows[0])
+        logger.debug("Generated CSV content: %.100s...", csv_content)
         
+        # Save the file under a content-addressed name (an unchanged card reuses its file)
+        with span('file_write'):
+            entry = get_export_store().put(card_data.get('name', 'card'), csv_content)
+        filename = entry.filename
         download_url = f"/download-file/{filename}"
-        logger.info(f"File saved successfully. Download URL: {download_url}")
+        logger.info(f"Saved vTiger file {filename}")
         
         # Return the file path
         return jsonify({
@@ -424,18 +452,474 @@ def generate_vtiger_file():
         logger.exception(f"Error generating vTiger file: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/generate-vtiger-bulk', methods=['POST'])
+def generate_vtiger_bulk():
+    """
+    Stream a multi-row vTiger CSV for a list of card IDs ({"cardIds": [...]})
+    or for every card in the Factura list ({"all": true}). With {"gzip": true}
+    the file is sent gzip-compressed; with {"async": true} a background job is
+    queued instead and its ID returned. {"all": true, "mode": "incremental"}
+    only exports cards that changed since the last incremental export. Rows
+    failing validation are left out; X-Export-Rejects is the download URL of
+    their report, stored once the whole file was sent.
+    """
+    try:
+        data = request.json or {}
+        card_ids = data.get('cardIds')
+        if not card_ids and not data.get('all'):
+            logger.error("No card IDs provided in bulk export request")
+            return jsonify({'error': 'No card IDs provided'}), 400
+        
+        params = export_params(data)
+        if params is None:
+            return jsonify({'error': 'Incremental mode only applies to the whole Factura list'}), 400
+        if data.get('async'):
+            return queue_export_job(params)
+        
+        loader = BoardLoader(TRELLO_API_URL, os.getenv('TRELLO_API_KEY'), os.getenv('TRELLO_API_TOKEN'))
+        rows, total, sync_run, report = resolve_export_rows(params, loader, 'csv')
+        logger.info(f"Bulk vTiger export for {total} cards")
+        
+        # Streamed straight to the client, not stored: a timestamped attachment name
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"vtiger_import_{sanitize(export_name(params))}_{timestamp}.csv"
+        mimetype = 'text/csv'
+        headers = {'Content-Disposition': f'attachment; filename="{filename}"'}
+        chunks = iter_csv_rows(rows)
+        if validating(DEFAULT_MAPPING):
+            # Rows are validated as they stream, so the rejects report gets a
+            # name up front and is stored under it once the last row went out
+            tag = f"{timestamp}_{uuid.uuid4().hex[:8]}"
+            chunks = store_rejects_after(chunks, export_name(params), report, tag)
+            headers['X-Export-Rejects'] = f"/download-file/{rejects_filename(export_name(params), tag)}"
+        chunks = commit_after(chunks, report, sync_run)
+        if data.get('gzip'):
+            chunks = gzip_chunks(chunks)
+            filename += '.gz'
+            mimetype = 'application/gzip'
+        
+        return Response(
+            stream_with_context(chunks),
+            mimetype=mimetype,
+            headers=headers
+        )
+    
+    except TrelloError as e:
+        return jsonify({'error': str(e)}), e.status_code
+    except Exception as e:
+        logger.exception(f"Error generating bulk vTiger file: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+def resolve_export_cards(params, loader, board_target=None):
+    """
+    Return (cards, count) for an export request: one card, a list of card IDs
+    or the whole Factura list (of board_target's board and list, if given).
+    Cards carry the customFieldItems and decoded Amazing Fields the mapping reads.
+    """
+    if 'cardData' in params:
+        return [params['cardData']], 1
+    mapping = board_target.mapping if board_target is not None else DEFAULT_MAPPING
+    board_id = board_target.board_id if board_target is not None else os.getenv('TRELLO_BOARD_ID')
+    items = bool(mapping.custom_fields)
+    if params.get('cardIds'):
+        cards = loader.iter_cards(list(params['cardIds']), custom_field_items=items)
+        return with_amazing_fields(cards, mapping, loader, board_id), len(params['cardIds'])
+    if board_target is not None:
+        _, cards = loader.load_factura_cards(board_id, board_target.list_name, custom_fields=False,
+                                             custom_field_items=items)
+    elif board_mirror.ready and not reads_card_fields(mapping):
+        cards = board_mirror.cards()
+    else:
+        _, cards = loader.load_factura_cards(board_id, custom_fields=False, custom_field_items=items)
+    return with_amazing_fields(cards, mapping, loader, board_id), len(cards)
+
+def reads_card_fields(mapping):
+    """Whether mapping reads custom field or Amazing Fields sources, which the board mirror does not keep."""
+    return bool(mapping.custom_fields or mapping.amazing_fields)
+
+def with_amazing_fields(cards, mapping, loader, board_id, chunk_size=50):
+    """
+    Cards with their Amazing Fields decoded into card['customFields'] when
+    mapping reads them, chunk_size cards at a time. The plugin data of every
+    card comes with one board request.
+    """
+    if not mapping.amazing_fields:
+        return cards
+    resolver = get_resolver()
+    if resolver is None:
+        logger.warning("The field mapping reads Amazing Fields but the Amazing Fields token is not set")
+        return cards
+    plugin_entries = index_plugin_data(loader.get_board(board_id, plugin_data=True).get('cards', []))
+    
+    def resolved():
+        chunk = []
+        for card in cards:
+            chunk.append(card)
+            if len(chunk) >= chunk_size:
+                resolver.resolve(chunk, plugin_entries)
+                yield from chunk
+                chunk = []
+        if chunk:
+            resolver.resolve(chunk, plugin_entries)
+            yield from chunk
+    
+    return resolved()
+
+def export_params(data):
+    """
+    Normalize the card selection of an export request body. Returns None for an
+    incremental request that does not target the whole Factura list.
+    """
+    if data.get('cardData'):
+        params = {'cardData': data['cardData']}
+    elif data.get('cardIds'):
+        params = {'cardIds': list(data['cardIds'])}
+    else:
+        params = {'all': True}
+    if data.get('mode') == 'incremental':
+        if not params.get('all'):
+            return None
+        params['mode'] = 'incremental'
+    return params
+
+def resolve_export_rows(params, loader, target, board_target=None):
+    """
+    Return (rows, count, sync_run, report) for an export request. In
+    incremental mode only cards with activity since the last sync to target are
+    fetched and only rows whose content changed are returned; sync_run must
+    then be committed once the rows were delivered. Otherwise sync_run is None.
+    With a board_target the rows come from its board and list, built with its
+    mapping. Rows failing the mapping's validation are left out and end up in
+    report (a ValidationReport) once the rows were consumed.
+    """
+    mapping = board_target.mapping if board_target is not None else DEFAULT_MAPPING
+    report = ValidationReport()
+    if params.get('mode') != 'incremental':
+        cards, total = resolve_export_cards(params, loader, board_target)
+        rows = (mapping.transform(card) for card in cards)
+        return validated(rows, mapping, report), total, None, report
+    
+    board_id = board_target.board_id if board_target is not None else os.getenv('TRELLO_BOARD_ID')
+    if board_target is not None:
+        sync_run = IncrementalRun(get_sync_state(), board_target.sync_key(target))
+        factura_list = loader.find_factura_list(board_id, board_target.list_name)
+        changed = sync_run.cards_to_fetch(loader.get_list_card_summaries(factura_list['id']))
+        cards = loader.iter_cards(changed, custom_field_items=bool(mapping.custom_fields))
+    elif board_mirror.ready and not reads_card_fields(mapping):
+        sync_run = IncrementalRun(get_sync_state(), target)
+        changed = set(sync_run.cards_to_fetch(board_mirror.cards()))
+        cards = [card for card in board_mirror.cards() if card['id'] in changed]
+    else:
+        sync_run = IncrementalRun(get_sync_state(), target)
+        factura_list = loader.find_factura_list(board_id)
+        changed = sync_run.cards_to_fetch(loader.get_list_card_summaries(factura_list['id']))
+        cards = loader.iter_cards(changed, custom_field_items=bool(mapping.custom_fields))
+    cards = with_amazing_fields(cards, mapping, loader, board_id)
+    logger.info(f"Incremental {sync_run.target} sync: {len(changed)} of {sync_run.stats['seen']} cards changed")
+    rows = (row for _, row in sync_run.rows(cards, mapping.transform))
+    return validated(rows, mapping, report), len(changed), sync_run, report
+
+def validating(mapping):
+    """Whether exports with this mapping are validated (not with EXPORT_VALIDATION=0)."""
+    return mapping.validator is not None and os.getenv('EXPORT_VALIDATION', '1') != '0'
+
+def validated(rows, mapping, report):
+    """The rows that pass the mapping's validation (all of them with EXPORT_VALIDATION=0)."""
+    if not validating(mapping):
+        return rows
+    return iter_validated(rows, mapping.validator, report)
+
+def store_rejects(name, report, tag=None):
+    """
+    Validation summary of an export; rejected rows are saved as a CSV report
+    next to the exports. A tagged report (see rejects_filename) is saved even
+    without rejects, since its name was already handed out.
+    """
+    summary = report.summary()
+    if report.rejects or tag:
+        entry = get_export_store().put(f"{name}_rejects", report.to_csv(), tag)
+        summary.update(filename=entry.filename, download_url=f"/download-file/{entry.filename}")
+        logger.info(f"Saved {len(report.rejects)} rejected rows to {entry.filename}")
+    return summary
+
+def rejects_filename(name, tag):
+    """File name of the rejects report of an export, stored by store_rejects(name, report, tag)."""
+    return get_export_store().filename(f"{name}_rejects", tag)
+
+def store_rejects_after(chunks, name, report, tag):
+    """Pass chunks through; once all of them were sent, store the rejects report under its tag."""
+    yield from chunks
+    store_rejects(name, report, tag)
+
+def commit_after(chunks, report, sync_run=None):
+    """
+    Pass chunks through; once all of them were sent, commit the sync
+    watermarks (rejected rows are retried next time).
+    """
+    yield from chunks
+    if sync_run:
+        sync_run.commit(failed_card_ids=report.rejected_card_ids)
+
+def export_name(params, board_target=None):
+    """Name of an export file: the card (or target) for single-card (or target) exports, else 'bulk'."""
+    if 'cardData' in params:
+        return params['cardData'].get('name', 'card')
+    if board_target is not None:
+        return board_target.name
+    return 'bulk'
+
+def run_export_job(params, progress, board_target=None, loader=None):
+    """Job runner: write the vTiger CSV for an export request to static/exports."""
+    loader = loader or BoardLoader(TRELLO_API_URL, os.getenv('TRELLO_API_KEY'), os.getenv('TRELLO_API_TOKEN'))
+    rows, total, sync_run, report = resolve_export_rows(params, loader, 'csv', board_target)
+    progress.update(total=total)
+    
+    fetched = 0
+    def counted(rows):
+        nonlocal fetched
+        for row in rows:
+            fetched += 1
+            yield row
+    
+    headers = board_target.mapping.headers if board_target is not None else DEFAULT_MAPPING.headers
+    writing = SpanTotal('file_write')
+    with get_export_store().writer(export_name(params, board_target)) as writer:
+        for written, chunk in enumerate(iter_csv_rows(counted(rows), headers)):
+            with writing:
+                writer.write(chunk)
+            if written:
+                progress.update(fetched=fetched, transformed=written, written=written)
+        if 'cardData' in params and not fetched and report.rejects:
+            # Nothing to export: fail the job instead of storing a header-only file
+            raise ValueError(f"Card failed validation: {', '.join(report.by_reason())}")
+        entry = writer.commit()
+    writing.record()
+    
+    logger.info(f"Export job wrote {fetched} rows to {entry.path}")
+    result = {'filename': entry.filename, 'download_url': f"/download-file/{entry.filename}"}
+    result['validation'] = store_rejects(export_name(params, board_target), report)
+    if sync_run:
+        sync_run.commit(failed_card_ids=report.rejected_card_ids)
+        result['sync'] = sync_run.stats
+    return result
+
+def push_export_rows(params, progress=None, board_target=None, loader=None):
+    """Upsert the rows of an export request into vTiger and return the push report."""
+    client = get_vtiger_client()
+    if client is None:
+        raise RuntimeError('vTiger webservice not configured')
+    loader = loader or BoardLoader(TRELLO_API_URL, os.getenv('TRELLO_API_KEY'), os.getenv('TRELLO_API_TOKEN'))
+    rows, total, sync_run, validation = resolve_export_rows(params, loader, 'vtiger', board_target)
+    logger.info(f"Pushing {total} cards to vTiger")
+    if progress:
+        progress.update(total=total)
+    rows = list(rows)
+    if progress:
+        progress.update(fetched=len(rows), transformed=len(rows))
+    
+    mapping = board_target.mapping if board_target is not None else DEFAULT_MAPPING
+    report = client.push_accounts(rows, mapping.headers)
+    report['validation'] = store_rejects(export_name(params, board_target), validation)
+    if progress:
+        progress.update(written=report['succeeded'])
+    if sync_run:
+        failed = [result['card_id'] for result in report['results'] if not result['success']]
+        sync_run.commit(failed_card_ids=failed + validation.rejected_card_ids)
+        report['sync'] = sync_run.stats
+    logger.info(f"vTiger push: {report['succeeded']} ok, {report['failed']} failed, {report['records_per_sec']} records/sec")
+    return report
+
+def run_push_job(params, progress):
+    """Job runner: upsert the export rows for an export request into vTiger."""
+    return {'report': push_export_rows(params, progress)}
+
+def run_targets_job(params, progress):
+    """
+    Job runner: export (or, with "push", upsert into vTiger) the whole list of
+    every selected target at once, their Trello requests sharing one budget.
+    """
+    targets = [get_targets()[name] for name in params['targets']]
+    target_params = {'all': True}
+    if params.get('mode') == 'incremental':
+        target_params['mode'] = 'incremental'
+    
+    def run_one(board_target, gate, target_progress):
+        loader = BoardLoader(TRELLO_API_URL, os.getenv('TRELLO_API_KEY'), os.getenv('TRELLO_API_TOKEN'), gate=gate)
+        if params.get('push'):
+            result = {'report': push_export_rows(target_params, target_progress, board_target, loader)}
+        else:
+            result = run_export_job(target_params, target_progress, board_target, loader)
+        result['trello_requests'] = loader.request_count
+        return result
+    
+    outcomes = run_targets(targets, run_one, get_scheduler(), get_target_status(), progress, job_id=progress.job_id)
+    return {'targets': outcomes}
+
+_vtiger_client = None
+
+def get_vtiger_client():
+    """Return the shared vTiger webservice client, or None if it is not configured."""
+    global _vtiger_client
+    if _vtiger_client is None:
+        _vtiger_client = vtiger_client_from_env()
+    return _vtiger_client
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+def get_job_queue():
+    """Return the export job queue, starting it (and resuming unfinished jobs) on first use."""
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = job_queue_from_env({
+                'vtiger_export': run_export_job,
+                'vtiger_push': run_push_job,
+                'targets_export': run_targets_job,
+            })
+        return _job_queue
+
+def queue_export_job(params, kind='vtiger_export'):
+    job_id = get_job_queue().submit(kind, params)
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status_url': f"/jobs/{job_id}"
+    }), 202
+
+@app.route('/vtiger/push', methods=['POST'])
+def push_to_vtiger():
+    """
+    Upsert cards straight into vTiger Accounts through its webservice. Takes
+    {"cardData": {...}}, {"cardIds": [...]} or {"all": true} (optionally with
+    "mode": "incremental"), plus optional {"async": true}. Returns a
+    per-record success/failure report.
+    """
+    try:
+        if get_vtiger_client() is None:
+            return jsonify({'error': 'vTiger webservice not configured'}), 503
+        data = request.json or {}
+        if not (data.get('cardData') or data.get('cardIds') or data.get('all')):
+            return jsonify({'error': 'No cards provided'}), 400
+        params = export_params(data)
+        if params is None:
+            return jsonify({'error': 'Incremental mode only applies to the whole Factura list'}), 400
+        if data.get('async'):
+            return queue_export_job(params, kind='vtiger_push')
+        
+        return jsonify(push_export_rows(params))
+    
+    except TrelloError as e:
+        return jsonify({'error': str(e)}), e.status_code
+    except Exception as e:
+        logger.exception(f"Error pushing to vTiger: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/targets')
+def list_targets():
+    """
+    Configured export targets with the state, progress and last result of each
+    one, the summed progress and the shared scheduler's slot usage.
+    """
+    try:
+        targets = get_targets()
+        status = get_target_status()
+        snapshot = status.snapshot(list(targets))
+        return jsonify({
+            'targets': [dict(target.to_dict(), **snapshot[name]) for name, target in targets.items()],
+            'totals': status.totals(list(targets)),
+            'scheduler': get_scheduler().snapshot(),
+        })
+    except Exception as e:
+        logger.exception(f"Error reading export targets: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/targets/export', methods=['POST'])
+def export_targets():
+    """
+    Queue one background job exporting every target ({"targets": [...]} picks
+    some by name). {"push": true} upserts into vTiger instead of writing CSV
+    files and {"mode": "incremental"} only sends what changed.
+    """
+    try:
+        data = request.json or {}
+        targets = get_targets()
+        names = data.get('targets') or list(targets)
+        unknown = [name for name in names if name not in targets]
+        if unknown:
+            return jsonify({'error': f"Unknown targets: {', '.join(unknown)}"}), 400
+        if data.get('push') and get_vtiger_client() is None:
+            return jsonify({'error': 'vTiger webservice not configured'}), 503
+        params = {'targets': names, 'push': bool(data.get('push'))}
+        if data.get('mode') == 'incremental':
+            params['mode'] = 'incremental'
+        return queue_export_job(params, kind='targets_export')
+    except Exception as e:
+        logger.exception(f"Error queueing target export: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/jobs/<job_id>')
+def get_job(job_id):
+    """Status, progress and ETA of a background export job."""
+    job = get_job_queue().store.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job_status(job))
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a queued or running export job."""
+    job = get_job_queue().cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job_status(job))
+
+@app.route('/exports')
+def list_exports():
+    """Index of the stored export files (size, age, last use) and the retention limits."""
+    return jsonify(get_export_store().snapshot())
+
+@app.route('/exports/sweep', methods=['POST'])
+def sweep_exports():
+    """Apply the retention limits now."""
+    return jsonify(get_export_store().sweep())
+
+def export_store_sizes():
+    snapshot = get_export_store().snapshot()
+    return {('files',): snapshot['files'], ('bytes',): snapshot['bytes']}
+
+registry.register(Gauge('export_store_size', 'Stored export files in files and bytes', ('unit',), export_store_sizes))
+
 @app.route('/download-file/<filename>')
 def download_file(filename):
-    """Direct file download endpoint."""
+    """
+    Direct file download endpoint. Stored exports are sent with their content
+    digest as ETag, so conditional and Range requests are answered from it.
+    """
     try:
-        logger.info(f"Download request for file: {filename}")
-        file_path = os.path.join('static', 'exports', filename)
+        store = get_export_store()
+        entry = store.get(filename)
+        if entry is not None:
+            store.touch(entry)
+            response = send_file(
+                entry.path,
+                mimetype='text/csv',
+                as_attachment=True,
+                download_name=entry.filename,
+                etag=store.etag(entry),
+                conditional=True,
+                max_age=31536000 if entry.addressed else None
+            )
+            if entry.addressed:
+                response.cache_control.immutable = True
+            return response
         
+        file_path = os.path.join('static', 'exports', filename)
         if not os.path.exists(file_path):
             logger.error(f"File not found: {file_path}")
             return jsonify({'error': 'File not found'}), 404
         
-        logger.info(f"Serving file: {file_path}")
+        logger.debug("Serving file: %s", file_path)
         return send_from_directory(
             os.path.join(os.getcwd(), 'static', 'exports'),
             filename,
@@ -451,7 +935,7 @@ def test_direct_download():
     """Test direct file download"""
     try:
         filename = 'test.csv'
-        logger.info(f"Test direct download for file: {filename}")
+        logger.debug("Test direct download for file: %s", filename)
         
         return send_from_directory(
             os.path.join(os.getcwd(), 'static', 'exports'),
@@ -463,92 +947,6 @@ def test_direct_download():
         logger.exception(f"Error in test direct download: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
-def generate_vtiger_csv(card_data):
-    """Generate CSV content for vTiger import."""
-    logger.info("Starting CSV generation")
-    
-    # Define vTiger CSV headers
-    headers = ["accountname", "account_no", "phone", "email1", "website", 
-               "bill_street", "bill_city", "bill_state", "bill_code", "bill_country",
-               "description"]
-    
-    # Initialize data row with empty values
-    data_row = {header: "" for header in headers}
-    
-    # Extract card name for account name
-    data_row["accountname"] = card_data.get('name', '')
-    logger.info(f"Account name: {data_row['accountname']}")
-    
-    # Extract description
-    data_row["description"] = card_data.get('desc', '')
-    
-    # Process checklists to extract specific data
-    if 'checklists' in card_data:
-        logger.info(f"Processing {len(card_data['checklists'])} checklists")
-        for checklist in card_data['checklists']:
-            logger.info(f"Processing checklist: {checklist['name']}")
-            
-            if checklist['name'] == 'Cuenta':
-                # Extract account number from Cuenta checklist
-                for item in checklist['checkItems']:
-                    data_row["account_no"] = extract_value_from_checklist_item(item['name'])
-                    logger.info(f"Extracted account_no: {data_row['account_no']}")
-            
-            elif checklist['name'] == 'DNI':
-                # Could be used as account_no if not already set
-                if not data_row["account_no"]:
-                    for item in checklist['checkItems']:
-                        data_row["account_no"] = extract_value_from_checklist_item(item['name'])
-                        logger.info(f"Extracted account_no from DNI: {data_row['account_no']}")
-            
-            elif checklist['name'] == 'Dirección':
-                # Extract address
-                for item in checklist['checkItems']:
-                    data_row["bill_street"] = extract_value_from_checklist_item(item['name'])
-                    logger.info(f"Extracted bill_street: {data_row['bill_street']}")
-            
-            elif checklist['name'] == 'Código postal':
-                # Extract postal code
-                for item in checklist['checkItems']:
-                    data_row["bill_code"] = extract_value_from_checklist_item(item['name'])
-                    logger.info(f"Extracted bill_code: {data_row['bill_code']}")
-            
-            elif checklist['name'] == 'Población':
-                # Extract city
-                for item in checklist['checkItems']:
-                    data_row["bill_city"] = extract_value_from_checklist_item(item['name'])
-                    logger.info(f"Extracted bill_city: {data_row['bill_city']}")
-            
-            elif checklist['name'] == 'Provincia':
-                # Extract state/province
-                for item in checklist['checkItems']:
-                    data_row["bill_state"] = extract_value_from_checklist_item(item['name'])
-                    logger.info(f"Extracted bill_state: {data_row['bill_state']}")
-            
-            elif checklist['name'] == 'eMail':
-                # Extract email
-                for item in checklist['checkItems']:
-                    data_row["email1"] = extract_value_from_checklist_item(item['name'])
-                    logger.info(f"Extracted email1: {data_row['email1']}")
-    else:
-        logger.warning("No checklists found in card data")
-    
-    # Create CSV content
-    output = io.StringIO()
-    writer = csv.DictWriter(output, fieldnames=headers)
-    writer.writeheader()
-    writer.writerow(data_row)
-    
-    csv_content = output.getvalue()
-    logger.info("CSV generation complete")
-    return csv_content
-
-def extract_value_from_checklist_item(item_text):
-    """Extract value from checklist item text, assuming format like 'Field: Value'."""
-    if ':' in item_text:
-        return item_text.split(':', 1)[1].strip()
-    return item_text.strip()
-
 @app.route('/test-modal')
 def test_modal():
     """Test page for Bootstrap modal functionality"""
@@ -0,0 +1,219 @@
+"""
+ASGI entry point. The Trello proxy routes (/board, /board-data and
+/amazing-fields/<card_id>) are served by async handlers, so a request that is
+waiting on Trello does not hold a worker thread; every other route is the
+Flask app, mounted as WSGI.
+
+    python serve.py
+    uvicorn asgi:app --port 5002
+"""
+import os
+import json
+import logging
+import functools
+import contextlib
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+from amazing_fields import AmazingFieldsError, find_amazing_fields_data, get_resolver, index_plugin_data
+from app import (app as flask_app, board_cards_list, board_factura_list, board_header, full_board_page, is_full_load,
+                 page_card_fields, page_details, stored_board_page, trello_headers, TRELLO_API_URL)
+from board_loader import AsyncBoardLoader, TrelloError
+from board_pages import page_body, paginate, parse_page_args, wants
+from compression import MIN_SIZE, aiter_compressed, compress, negotiate
+from json_provider import NDJSON_MIMETYPE, json_bytes, wants_ndjson
+from metrics import annotate, begin_request, finish_request
+from trello_client import get_async_client
+
+logger = logging.getLogger(__name__)
+
+
+def compression_for(request):
+    if os.getenv('RESPONSE_COMPRESSION', '1') == '0':
+        return None
+    return negotiate(request.headers.get('accept-encoding'))
+
+
+def json_response(request, payload, status_code=200, headers=None):
+    """
+    JSON response encoded like Flask's jsonify, and compressed under the same
+    rules, so both serving modes return identical bodies.
+    """
+    body = json_bytes(flask_app, payload) + b'\n'
+    headers = dict(headers or {})
+    if 200 <= status_code < 300:
+        headers['Vary'] = 'Accept-Encoding'
+        encoding = compression_for(request)
+        if encoding and len(body) >= MIN_SIZE:
+            body = compress(body, encoding)
+            headers['Content-Encoding'] = encoding
+    return Response(body, status_code=status_code, headers=headers, media_type='application/json')
+
+
+def ndjson_response(request, lines, headers=None):
+    """Streamed NDJSON response; compressed pieces are flushed line by line."""
+    headers = dict(headers or {}, Vary='Accept-Encoding')
+    encoding = compression_for(request)
+    if encoding:
+        lines = aiter_compressed(lines, encoding)
+        headers['Content-Encoding'] = encoding
+    return StreamingResponse(lines, headers=headers, media_type=NDJSON_MIMETYPE)
+
+
+def instrumented(route):
+    """Record the handler's duration and spans like the Flask app does (Server-Timing with SERVER_TIMING=1)."""
+    def decorate(handler):
+        @functools.wraps(handler)
+        async def wrapper(request):
+            timings = begin_request()
+            response = await handler(request)
+            header = finish_request(timings, route, request.method, response.status_code)
+            if header:
+                response.headers['Server-Timing'] = header
+            return response
+        return wrapper
+    return decorate
+
+
+def make_loader():
+    return AsyncBoardLoader(TRELLO_API_URL, os.getenv('TRELLO_API_KEY'), os.getenv('TRELLO_API_TOKEN'))
+
+
+@instrumented('/amazing-fields/<card_id>')
+async def get_amazing_fields_data(request):
+    """Async /amazing-fields/<card_id>: same responses as the Flask route."""
+    card_id = request.path_params['card_id']
+    try:
+        resolver = get_resolver()
+        if resolver is None:
+            logger.warning("Amazing Fields token not found. You need a supporter account to access the Amazing Fields API.")
+            return json_response(request, {'error': 'Amazing Fields token not configured'}, 400)
+
+        plugin_data = await make_loader().get_json(f"/cards/{card_id}/pluginData", 'plugin data')
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Plugin data for card %s: %s", card_id, json.dumps(plugin_data, indent=2))
+
+        amazing_fields_data = find_amazing_fields_data(plugin_data)
+        if not amazing_fields_data:
+            logger.warning(f"No Amazing Fields data found for card {card_id}")
+            return json_response(request, {'error': 'No Amazing Fields data found for this card'}, 404)
+
+        try:
+            return json_response(request, await resolver.decode_async(card_id, amazing_fields_data))
+        except AmazingFieldsError as e:
+            return json_response(request, {
+                'error': str(e),
+                'raw_data': amazing_fields_data,
+                'status': e.status_code
+            }, 500)
+
+    except TrelloError as e:
+        return json_response(request, {'error': str(e)}, e.status_code)
+    except Exception as e:
+        logger.exception(f"Error processing Amazing Fields data for card {card_id}")
+        return json_response(request, {'error': str(e)}, 500)
+
+
+async def iter_board_lines(board, factura_list, cards, resolver, plugin_entries):
+    """Async counterpart of app.iter_board_lines."""
+    yield json_bytes(flask_app, board_header(board, factura_list)) + b'\n'
+    if resolver is None:
+        for card in cards:
+            yield json_bytes(flask_app, card) + b'\n'
+        return
+    async for card in resolver.iter_resolved_async(cards, plugin_entries):
+        yield json_bytes(flask_app, card) + b'\n'
+
+
+@instrumented('/board')
+async def get_board_data(request):
+    """Async /board: same payload as the Flask route."""
+    try:
+        board_id = os.getenv('TRELLO_BOARD_ID')
+        loader = make_loader()
+
+        resolver = get_resolver()
+        logger.debug("Fetching board data for board ID: %s", board_id)
+        board = await loader.get_board(board_id, plugin_data=resolver is not None)
+        plugin_entries = index_plugin_data(board.get('cards', []))
+
+        factura_list = board_factura_list(board)
+        if not factura_list:
+            return json_response(request, {'error': "Factura list not found"}, 404)
+
+        cards = await loader.get_list_cards(factura_list['id'], custom_field_items=True)
+        factura_list = board_cards_list(factura_list, cards)
+
+        if resolver is None:
+            logger.warning("Amazing Fields token not set")
+
+        if wants_ndjson(request.query_params, request.headers.get('accept')):
+            lines = iter_board_lines(board, factura_list, cards, resolver, plugin_entries)
+            return ndjson_response(request, lines, headers=trello_headers(loader))
+
+        if resolver is not None:
+            await resolver.resolve_async(cards, plugin_entries)
+
+        return json_response(request, {'board': board, 'factura_list': factura_list}, headers=trello_headers(loader))
+
+    except TrelloError as e:
+        return json_response(request, {'error': str(e)}, e.status_code)
+    except Exception as e:
+        logger.exception("Error getting board data")
+        return json_response(request, {'error': str(e)}, 500)
+
+
+@instrumented('/board-data')
+async def get_board_data_simplified(request):
+    """Async /board-data: same query args and payloads as the Flask route."""
+    try:
+        before, limit, fields = parse_page_args(request.query_params)
+    except ValueError as e:
+        return json_response(request, {'error': str(e)}, 400)
+
+    try:
+        body = stored_board_page(before, limit, fields)
+        if body is not None:
+            return json_response(request, body, headers={'X-Trello-Requests': '0'})
+
+        board_id = os.getenv('TRELLO_BOARD_ID')
+        loader = make_loader()
+        if is_full_load(before, limit, fields):
+            page, next_before = full_board_page(*await loader.load_factura_cards(board_id), before, limit)
+        else:
+            factura_list = await loader.find_factura_list(board_id)
+            checklists = limit is None and wants(fields, 'checklists')
+            cards = await loader.get_list_cards(factura_list['id'], checklists=checklists,
+                                                fields=page_card_fields(fields), before=before)
+            page, next_before = paginate(cards, before, limit)
+            await loader.attach_details(page, page_details(fields, limit))
+
+        annotate(cards=len(page))
+        return json_response(request, page_body(page, fields, before, limit, next_before),
+                             headers=trello_headers(loader))
+
+    except TrelloError as e:
+        return json_response(request, {'error': str(e)}, e.status_code)
+    except Exception as e:
+        logger.exception(f"Error in get_board_data_simplified: {str(e)}")
+        return json_response(request, {'error': str(e)}, 500)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    yield
+    await get_async_client().aclose()
+
+
+app = Starlette(
+    routes=[
+        Route('/board', get_board_data),
+        Route('/board-data', get_board_data_simplified),
+        Route('/amazing-fields/{card_id}', get_amazing_fields_data),
+        Mount('/', WSGIMiddleware(flask_app, workers=int(os.getenv('WSGI_THREADS', '10')))),
+    ],
+    lifespan=lifespan,
+)
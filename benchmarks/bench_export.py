@@ -0,0 +1,93 @@
+"""
+Throughput (rows/sec) and peak memory of the streamed vTiger CSV export.
+
+The transform is measured on lazily generated synthetic cards, so a flat
+peak memory across sizes shows the export runs in constant memory. The
+end-to-end run goes through /generate-vtiger-bulk against the stub server.
+
+    python benchmarks/bench_export.py --cards 1000 10000 50000
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_trello import start_stub_server, make_board, BOARD_ID
+
+
+def synthetic_cards(num_cards):
+    """Yield cards one at a time, reusing one template board so input memory stays flat."""
+    template = make_board(100)
+    checklists = template['checklists']
+    for n in range(num_cards):
+        card = dict(template['cards'][n % 100], name=f'Cliente {n}')
+        card['checklists'] = [checklists[cid] for cid in card['idChecklists']]
+        yield card
+
+
+def bench_transform(num_cards, use_gzip):
+    from vtiger_export import iter_vtiger_csv, gzip_chunks
+    chunks = iter_vtiger_csv(synthetic_cards(num_cards))
+    if use_gzip:
+        chunks = gzip_chunks(chunks)
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = sum(len(chunk) for chunk in chunks)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, size
+
+
+def bench_endpoint(num_cards, use_gzip):
+    server = start_stub_server(num_cards=num_cards)
+    os.environ.update({
+        'TRELLO_API_URL': f'{server.base_url}/1',
+        'AMAZING_FIELDS_API_URL': f'{server.base_url}/af',
+        'TRELLO_API_KEY': 'key',
+        'TRELLO_API_TOKEN': 'token',
+        'TRELLO_BOARD_ID': BOARD_ID,
+        'TRELLO_RATE_LIMIT': '0',
+        'CACHE_BACKEND': 'none',
+    })
+    sys.modules.pop('app', None)
+    sys.modules.pop('trello_client', None)
+    import app as app_module
+    logging.getLogger().setLevel(logging.WARNING)
+    client = app_module.app.test_client()
+    start = time.perf_counter()
+    response = client.post('/generate-vtiger-bulk', json={'all': True, 'gzip': use_gzip}, buffered=False)
+    size = sum(len(chunk) for chunk in response.response)
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+    server.server_close()
+    return elapsed, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cards', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--endpoint-cards', type=int, default=2000)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    print(f"{'cards':>7} {'gzip':>5} {'rows/sec':>10} {'peak KiB':>9} {'output KiB':>11}")
+    for num_cards in args.cards:
+        for use_gzip in (False, True):
+            elapsed, peak, size = bench_transform(num_cards, use_gzip)
+            print(f"{num_cards:>7} {str(use_gzip):>5} {num_cards / elapsed:>10.0f} {peak / 1024:>9.1f} {size / 1024:>11.1f}")
+
+    print()
+    print(f"End-to-end /generate-vtiger-bulk, {args.endpoint_cards} cards from the stub server")
+    for use_gzip in (False, True):
+        elapsed, size = bench_endpoint(args.endpoint_cards, use_gzip)
+        print(f"  gzip={use_gzip}: {args.endpoint_cards / elapsed:.0f} rows/sec, {size / 1024:.1f} KiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Wall-clock time of /board and /board-data against the stub Trello server,
+sequential (max in-flight 1) versus concurrent fan-out.
+
+    python benchmarks/bench_fanout.py --cards 10 100 500 --latency 0.02
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_trello import start_stub_server, BOARD_ID
+
+
+def run(app_module, path, max_in_flight):
+    os.environ['TRELLO_MAX_IN_FLIGHT'] = str(max_in_flight)
+    client = app_module.app.test_client()
+    start = time.perf_counter()
+    response = client.get(path)
+    elapsed = time.perf_counter() - start
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cards', type=int, nargs='+', default=[10, 100, 500])
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--max-in-flight', type=int, default=16)
+    args = parser.parse_args()
+
+    print(f"{'cards':>6} {'route':<12} {'sequential':>11} {'fan-out':>9} {'speedup':>8}")
+    for num_cards in args.cards:
+        server = start_stub_server(num_cards=num_cards, latency=args.latency)
+        os.environ.update({
+            'TRELLO_API_URL': f'{server.base_url}/1',
+            'AMAZING_FIELDS_API_URL': f'{server.base_url}/af',
+            'TRELLO_API_KEY': 'key',
+            'TRELLO_API_TOKEN': 'token',
+            'TRELLO_BOARD_ID': BOARD_ID,
+            'AMAZING_FIELDS_TOKEN': 'af-token',
+            'TRELLO_RATE_LIMIT': '0',
+            'CACHE_BACKEND': 'none',
+        })
+        sys.modules.pop('app', None)
+        sys.modules.pop('trello_client', None)
+        import app as app_module
+        logging.getLogger().setLevel(logging.WARNING)
+
+        for path in ('/board', '/board-data'):
+            sequential = run(app_module, path, 1)
+            concurrent = run(app_module, path, args.max_in_flight)
+            print(f"{num_cards:>6} {path:<12} {sequential:>10.2f}s {concurrent:>8.2f}s {sequential / concurrent:>7.1f}x")
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
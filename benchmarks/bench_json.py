@@ -0,0 +1,125 @@
+"""
+Serialization, compression and streaming of the /board payload on a synthetic
+board with 1k cards and long descriptions.
+
+  1. encode time of the payload with Flask's default provider vs orjson
+  2. raw / gzip / brotli size and compression time
+  3. against the latency-injecting stub: time until the full /board JSON is in
+     vs time until the first card arrives with ?format=ndjson
+
+    python benchmarks/bench_json.py --cards 1000 --desc-size 2000 --latency 0.05
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from bench_serving import start_wsgi
+from stub_trello import start_stub_server, make_board, BOARD_ID
+
+
+def board_payload(num_cards, desc_size):
+    """A /board-shaped payload built from the stub's synthetic board."""
+    data = make_board(num_cards)
+    cards = []
+    for card in data['cards']:
+        card = dict(card, desc=(card['desc'] + ' ') * (desc_size // (len(card['desc']) + 1) + 1))
+        card['checklists'] = [data['checklists'][checklist_id] for checklist_id in card['idChecklists']]
+        card['customFieldItems'] = []
+        card['customFields'] = {'Importe': str(len(cards) * 10), 'Forma de pago': 'Transferencia'}
+        cards.append(card)
+    factura_list = dict(data['lists'][1], cards=cards)
+    return {'board': dict(data['board'], lists=data['lists']), 'factura_list': factura_list}
+
+
+def timed(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def bench_encoding(payload, repeat):
+    from json_provider import OrjsonProvider, orjson
+    from compression import compress, brotli
+
+    app = Flask(__name__)
+    default = DefaultJSONProvider(app)
+    print(f"{'encoder':<10} {'time':>9} {'size':>10}")
+    elapsed, body = timed(lambda: default.dumps(payload, separators=(',', ':')).encode('utf-8'), repeat)
+    print(f"{'default':<10} {elapsed * 1000:>7.1f}ms {len(body):>10}")
+    if orjson is not None:
+        elapsed, body = timed(lambda: OrjsonProvider(app).dumps_bytes(payload), repeat)
+        print(f"{'orjson':<10} {elapsed * 1000:>7.1f}ms {len(body):>10}")
+
+    print(f"\n{'encoding':<10} {'time':>9} {'size':>10} {'ratio':>7}")
+    print(f"{'identity':<10} {0:>7.1f}ms {len(body):>10} {1:>7.2f}")
+    for encoding in ('gzip', 'br') if brotli is not None else ('gzip',):
+        elapsed, compressed = timed(lambda: compress(body, encoding), repeat)
+        print(f"{encoding:<10} {elapsed * 1000:>7.1f}ms {len(compressed):>10} {len(body) / len(compressed):>7.2f}")
+
+
+def bench_streaming(args):
+    server = start_stub_server(num_cards=args.cards, latency=args.latency, plugin_every=args.plugin_every)
+    os.environ.update({
+        'TRELLO_API_URL': f'{server.base_url}/1',
+        'AMAZING_FIELDS_API_URL': f'{server.base_url}/af',
+        'TRELLO_API_KEY': 'key',
+        'TRELLO_API_TOKEN': 'token',
+        'TRELLO_BOARD_ID': BOARD_ID,
+        'AMAZING_FIELDS_TOKEN': 'af-token',
+        'TRELLO_RATE_LIMIT': '0',
+        'CACHE_BACKEND': 'none',
+    })
+    import app as app_module
+    logging.getLogger().setLevel(logging.WARNING)
+    base_url, stop = start_wsgi(app_module.app, threads=4)
+
+    print(f"\n{args.cards} cards ({args.cards // args.plugin_every} with Amazing Fields), "
+          f"{args.latency * 1000:.0f} ms upstream latency")
+    print(f"{'mode':<10} {'first card':>11} {'complete':>10} {'wire bytes':>11}")
+    for mode, params in (('json', {}), ('ndjson', {'format': 'ndjson'})):
+        app_module.get_resolver()._decoded.clear()
+        start = time.perf_counter()
+        first = None
+        wire = 0
+        with requests.get(f'{base_url}/board', params=params, stream=True,
+                          headers={'Accept-Encoding': 'gzip'}) as response:
+            for line_number, line in enumerate(response.iter_lines()):
+                if first is None and (mode == 'json' or line_number == 1):
+                    first = time.perf_counter() - start
+            wire = response.raw.tell()
+        complete = time.perf_counter() - start
+        print(f"{mode:<10} {first * 1000:>9.0f}ms {complete * 1000:>8.0f}ms {wire:>11}")
+
+    stop()
+    server.shutdown()
+    server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cards', type=int, default=1000)
+    parser.add_argument('--desc-size', type=int, default=2000, help='characters of description per card')
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--plugin-every', type=int, default=4, help='every Nth card has Amazing Fields data')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    payload = board_payload(args.cards, args.desc_size)
+    print(f"/board payload: {args.cards} cards, {args.desc_size}-character descriptions\n")
+    bench_encoding(payload, args.repeat)
+    bench_streaming(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Logging overhead per card on the request thread, for the previous logging
+pattern (a logger.info f-string per card, checklist and custom field
+request, kept here as a reference) vs the current one (lazy logger.debug per
+item, one summary record per request).
+
+  1. legacy at INFO, written inline by a StreamHandler to a file
+  2. legacy at WARNING: nothing is written, the f-strings are still built
+  3. current at INFO through the QueueHandler/QueueListener of log_config
+  4. the same with LOG_FORMAT=json
+
+Each request logs --cards cards; the time reported is the logging time only
+(the card loop without logging is subtracted), divided by the card count.
+
+    python benchmarks/bench_logging.py --cards 1000 --requests 20
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_trello import make_board
+from metrics import annotate, begin_request, finish_request
+
+
+def legacy_request(logger, board, cards):
+    """The per-card logging of the previous /board loop."""
+    logger.info("Fetching board data...")
+    logger.info(f"Fetching board data for board ID: {board['board']['id']}")
+    logger.info(f"Board data fetched successfully: {board['board']['name']}")
+    logger.info(f"Found {len(cards)} cards in the Factura list")
+    for card in cards:
+        logger.info(f"Processing card: {card['name']} ({card['id']})")
+        logger.info(f"Card has {len(card['idChecklists'])} checklists")
+        for checklist_id in card['idChecklists']:
+            logger.info(f"Fetching checklist: {checklist_id}")
+            checklist = board['checklists'][checklist_id]
+            logger.info(f"Checklist fetched: {checklist['name']} with {len(checklist.get('checkItems', []))} items")
+        logger.info(f"Fetching custom fields for card: {card['id']}")
+        logger.info(f"Custom fields fetched: {len(card.get('customFieldItems', []))} fields found")
+    logger.info(f"Returning board data ({len(cards) + 3} Trello requests)")
+
+
+def current_request(logger, board, cards):
+    """Lazy per-item debug records and one summary record, as app.py and metrics.py do now."""
+    timings = begin_request()
+    logger.debug("Fetching board data for board ID: %s", board['board']['id'])
+    for card in cards:
+        logger.debug("Processing card: %s (%s)", card['name'], card['id'])
+        for checklist_id in card['idChecklists']:
+            logger.debug("Fetching checklist: %s", checklist_id)
+    annotate(cards=len(cards), trello_requests=len(cards) + 3)
+    finish_request(timings, '/board', 'GET', 200)
+
+
+def no_logging(logger, board, cards):
+    for card in cards:
+        for checklist_id in card['idChecklists']:
+            board['checklists'][checklist_id]
+
+
+def reset_logging():
+    from log_config import stop_logging
+    stop_logging()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    logging.getLogger('requests.summary').setLevel(logging.NOTSET)
+
+
+def measure(request, logger, board, cards, repeat, rounds=3):
+    """Best of rounds of repeat requests."""
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            request(logger, board, cards)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cards', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=20)
+    args = parser.parse_args()
+
+    import log_config
+    board = make_board(args.cards)
+    cards = board['cards']
+    logger = logging.getLogger('app')
+    log_path = os.path.join(tempfile.mkdtemp(prefix='bench-logging-'), 'app.log')
+    baseline = measure(no_logging, logger, board, cards, args.requests)
+
+    def run(label, request, level, env):
+        reset_logging()
+        os.environ.update(env)
+        os.environ['LOG_LEVEL'] = level
+        stream = open(log_path, 'w')
+        real_stderr, sys.stderr = sys.stderr, stream
+        try:
+            log_config.configure_logging()
+        finally:
+            sys.stderr = real_stderr
+        elapsed = measure(request, logger, board, cards, args.requests)
+        reset_logging()
+        stream.close()
+        per_card = (elapsed - baseline) / (args.requests * args.cards) * 1e6
+        print(f"{label:<28} {per_card:>8.2f} µs {os.path.getsize(log_path):>12}")
+
+    print(f"{args.requests} requests of {args.cards} cards, log file {log_path}")
+    print(f"{'pattern':<28} {'per card':>11} {'bytes logged':>12}")
+    run('legacy, INFO, inline', legacy_request, 'INFO', {'LOG_QUEUE': '0', 'LOG_FORMAT': 'text'})
+    run('legacy, WARNING', legacy_request, 'WARNING', {'LOG_QUEUE': '0', 'LOG_FORMAT': 'text'})
+    run('current, INFO, queue', current_request, 'INFO', {'LOG_QUEUE': '1', 'LOG_FORMAT': 'text'})
+    run('current, INFO, queue, json', current_request, 'INFO', {'LOG_QUEUE': '1', 'LOG_FORMAT': 'json'})
+
+
+if __name__ == '__main__':
+    main()
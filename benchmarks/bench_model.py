@@ -0,0 +1,107 @@
+"""
+Memory per card, serialization and transform cost of the raw Trello card
+dicts vs the board_model records, on a synthetic 10k-card Factura list.
+
+The raw cards are shaped like Trello's list-cards response with checklists
+and customFieldItems nested (full label objects, idChecklist/pos on items,
+idModel/modelType on custom field items); memory is what stays allocated
+once the list is built (tracemalloc), with the JSON text already freed.
+
+    python benchmarks/bench_model.py --cards 10000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_trello import make_board
+
+LABELS = [
+    {'id': f'label{n}', 'idBoard': 'stubboard', 'name': name, 'color': color, 'uses': 1000}
+    for n, (name, color) in enumerate([('Urgente', 'red'), ('Pagado', 'green'), ('Pendiente', 'yellow')])
+]
+
+
+def trello_cards(num_cards, checklists_per_card):
+    """JSON text of a list-cards response as Trello sends it."""
+    board = make_board(num_cards, checklists_per_card)
+    cards = []
+    for n, card in enumerate(board['cards']):
+        checklists = []
+        for checklist_id in card['idChecklists']:
+            checklist = board['checklists'][checklist_id]
+            checklists.append({
+                'id': checklist_id,
+                'name': checklist['name'],
+                'idCard': card['id'],
+                'checkItems': [dict(item, idChecklist=checklist_id, pos=16384 * (i + 1))
+                               for i, item in enumerate(checklist['checkItems'])],
+            })
+        cards.append(dict(
+            card,
+            labels=LABELS[:n % 3],
+            checklists=checklists,
+            customFieldItems=[{'id': f"{card['id']}-cf", 'value': {'number': str(n * 10)},
+                               'idCustomField': 'cf-importe', 'idModel': card['id'], 'modelType': 'card'}],
+            customFields={},
+        ))
+    return json.dumps(cards)
+
+
+def retained(build, payload):
+    """Bytes still allocated after build(payload) returns, and the result."""
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    result = build(payload)
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return after - before, result
+
+
+def timed(func, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cards', type=int, default=10000)
+    parser.add_argument('--checklists', type=int, default=7)
+    args = parser.parse_args()
+
+    from flask import Flask
+    from board_model import parse_cards
+    from json_provider import init_json, json_bytes
+    from vtiger_export import DEFAULT_MAPPING
+
+    payload = trello_cards(args.cards, args.checklists)
+    raw_bytes, raw = retained(json.loads, payload)
+    model_bytes, model = retained(lambda text: parse_cards(json.loads(text)), payload)
+    parse_time, _ = timed(lambda: parse_cards(raw))
+
+    app = Flask(__name__)
+    init_json(app)
+    raw_encode, raw_json = timed(lambda: json_bytes(app, raw))
+    model_encode, model_json = timed(lambda: json_bytes(app, model))
+    raw_transform, _ = timed(lambda: [DEFAULT_MAPPING.transform(card) for card in raw])
+    model_transform, _ = timed(lambda: [DEFAULT_MAPPING.transform(card) for card in model])
+
+    print(f"{args.cards} cards, {args.checklists} checklists each, parsed in {parse_time * 1000:.0f} ms")
+    print(f"{'':<8} {'memory':>10} {'per card':>9} {'encode':>8} {'json size':>10} {'transform':>10}")
+    for label, memory, encode, body, transform in (
+            ('raw', raw_bytes, raw_encode, raw_json, raw_transform),
+            ('model', model_bytes, model_encode, model_json, model_transform)):
+        print(f"{label:<8} {memory / 1e6:>8.1f}MB {memory / args.cards:>8.0f}B {encode * 1000:>6.0f}ms "
+              f"{len(body) / 1e6:>8.1f}MB {transform * 1000:>8.0f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Upstream request counts for /board and /board-data as the Factura list grows.
+/board is loaded twice: the second load shows the Amazing Fields decode cache
+(unchanged cards are not decoded again).
+
+    python benchmarks/bench_request_count.py --cards 10 100 500 --plugin-every 2
+"""
+import argparse
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_trello import start_stub_server, BOARD_ID
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cards', type=int, nargs='+', default=[10, 100, 500])
+    parser.add_argument('--plugin-every', type=int, default=1, help='every Nth card has Amazing Fields data')
+    args = parser.parse_args()
+
+    print(f"{'cards':>6} {'route':<14} {'trello':>7} {'af':>5} {'total':>7}")
+    for num_cards in args.cards:
+        server = start_stub_server(num_cards=num_cards, plugin_every=args.plugin_every)
+        os.environ.update({
+            'TRELLO_API_URL': f'{server.base_url}/1',
+            'AMAZING_FIELDS_API_URL': f'{server.base_url}/af',
+            'TRELLO_API_KEY': 'key',
+            'TRELLO_API_TOKEN': 'token',
+            'TRELLO_BOARD_ID': BOARD_ID,
+            'AMAZING_FIELDS_TOKEN': 'af-token',
+            'TRELLO_RATE_LIMIT': '0',
+            'CACHE_BACKEND': 'none',
+        })
+        sys.modules.pop('app', None)
+        sys.modules.pop('amazing_fields', None)
+        import app as app_module
+        logging.getLogger().setLevel(logging.WARNING)
+        client = app_module.app.test_client()
+
+        for path, label in (('/board', '/board'), ('/board', '/board again'), ('/board-data', '/board-data')):
+            before = server.request_count
+            af_before = server.af_request_count
+            response = client.get(path)
+            assert response.status_code == 200, response.get_data(as_text=True)
+            total = server.request_count - before
+            af = server.af_request_count - af_before
+            print(f"{num_cards:>6} {label:<14} {response.headers['X-Trello-Requests']:>7} {af:>5} {total:>7}")
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""
+Load test of the sync (Flask/WSGI) and async (ASGI) serving paths against the
+latency-injecting stub Trello server: requests/sec and p50/p95 latency with
+many clients loading the dashboard at once.
+
+Three servers are compared on the same routes:
+  sync-dev    Flask's threaded development server (what app.run uses)
+  sync-pool   the Flask app on a fixed pool of worker threads, like a
+              threaded WSGI server in production
+  async       asgi:app under uvicorn
+
+    python benchmarks/bench_serving.py --cards 50 --latency 0.05 --concurrency 32 --requests 300
+"""
+import argparse
+import asyncio
+import functools
+import logging
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aiohttp
+
+from stub_trello import start_stub_server, BOARD_ID
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class PooledWSGIServer(WSGIServer):
+    """WSGI server that handles requests on a fixed number of threads."""
+
+    request_queue_size = 512
+
+    def __init__(self, *args, threads=8, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = ThreadPoolExecutor(max_workers=threads)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+    request_queue_size = 512
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_wsgi(app, threads):
+    port = free_port()
+    if threads:
+        server_class = functools.partial(PooledWSGIServer, threads=threads)
+        server = make_server('127.0.0.1', port, app, server_class=server_class, handler_class=QuietHandler)
+    else:
+        server = make_server('127.0.0.1', port, app, server_class=ThreadingWSGIServer, handler_class=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{port}', server.shutdown
+
+
+def start_asgi(app):
+    import uvicorn
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=port, log_level='warning', backlog=512))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+
+    def stop():
+        server.should_exit = True
+    return f'http://127.0.0.1:{port}', stop
+
+
+async def load(base_url, path, concurrency, total):
+    """Issue total GETs with concurrency clients; return (elapsed, latencies, errors)."""
+    latencies = []
+    errors = 0
+    remaining = iter(range(total))
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(base_url, connector=connector) as client:
+        async def worker():
+            nonlocal errors
+            for _ in remaining:
+                start = time.perf_counter()
+                async with client.get(path) as response:
+                    await response.read()
+                latencies.append(time.perf_counter() - start)
+                if response.status != 200:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return time.perf_counter() - start, latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cards', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--sync-threads', type=int, default=8, help='worker threads of the sync-pool server')
+    parser.add_argument('--paths', nargs='+', default=['/board-data', '/board'])
+    args = parser.parse_args()
+
+    server = start_stub_server(num_cards=args.cards, latency=args.latency)
+    os.environ.update({
+        'TRELLO_API_URL': f'{server.base_url}/1',
+        'AMAZING_FIELDS_API_URL': f'{server.base_url}/af',
+        'TRELLO_API_KEY': 'key',
+        'TRELLO_API_TOKEN': 'token',
+        'TRELLO_BOARD_ID': BOARD_ID,
+        'AMAZING_FIELDS_TOKEN': 'af-token',
+        'TRELLO_RATE_LIMIT': '0',
+        'CACHE_BACKEND': 'none',
+        'HTTP_POOL_SIZE': '100',
+    })
+    import app as app_module
+    import asgi
+    logging.getLogger().setLevel(logging.WARNING)
+
+    servers = [
+        ('sync-dev', lambda: start_wsgi(app_module.app, threads=0)),
+        ('sync-pool', lambda: start_wsgi(app_module.app, threads=args.sync_threads)),
+        ('async', lambda: start_asgi(asgi.app)),
+    ]
+
+    print(f"{args.cards} cards, {args.latency * 1000:.0f} ms upstream latency, "
+          f"{args.concurrency} concurrent clients, {args.requests} requests per run")
+    print(f"{'route':<12} {'server':<10} {'req/s':>8} {'p50':>8} {'p95':>8} {'errors':>7}")
+    for path in args.paths:
+        for name, start in servers:
+            base_url, stop = start()
+            asyncio.run(load(base_url, path, 4, 8))
+            elapsed, latencies, errors = asyncio.run(load(base_url, path, args.concurrency, args.requests))
+            stop()
+            p95 = statistics.quantiles(latencies, n=20)[-1]
+            print(f"{path:<12} {name:<10} {args.requests / elapsed:>8.1f} "
+                  f"{statistics.median(latencies) * 1000:>6.0f}ms {p95 * 1000:>6.0f}ms {errors:>7}")
+
+    server.shutdown()
+    server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""
+End-to-end benchmark suite for the Trello pipeline, fully offline.
+
+For every board size the app is pointed at the latency-injecting stub (or,
+with --cassette, at a recorded cassette replayed by benchmarks/cassette.py)
+and measures:
+
+  board load   best wall-clock time of a cold GET /board (Amazing Fields decode cache cleared)
+  trello / af  upstream calls made by one /board, retries of injected 429s/503s included
+  peak mem     tracemalloc peak while serving one /board
+  csv rows/s   rows per second of the streamed {"all": true} bulk CSV export
+
+--json saves the results; --baseline compares against a saved run and exits
+with status 1 if any metric regressed by more than --tolerance (call counts
+must not grow at all).
+
+    python benchmarks/bench_suite.py --cards 100 1000 5000 --latency 0.02 --json bench.json
+    python benchmarks/bench_suite.py --cards 100 1000 5000 --latency 0.02 --baseline bench.json
+    python benchmarks/bench_suite.py --cassette fixtures/cassettes/stub_board.json --throttle-rate 0.1
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cassette import load_cassette, start_cassette_server
+from stub_trello import start_stub_server, BOARD_ID
+
+# metric: (label, format, True if higher is better, relative tolerance applies)
+METRICS = {
+    'board_load_ms': ('board load', '{:>9.0f}ms', False, True),
+    'trello_calls': ('trello', '{:>7}', False, False),
+    'af_calls': ('af', '{:>5}', False, False),
+    'peak_mb': ('peak mem', '{:>7.1f}MB', False, True),
+    'csv_rows_per_sec': ('csv rows/s', '{:>10.0f}', True, True),
+}
+
+
+def start_server(args, num_cards):
+    faults = {'error_rate': args.error_rate, 'throttle_rate': args.throttle_rate, 'retry_after': 0.01, 'seed': 1}
+    if args.cassette:
+        return start_cassette_server(args.cassette, latency=args.latency, **faults)
+    return start_stub_server(num_cards=num_cards, latency=args.latency, plugin_every=args.plugin_every, **faults)
+
+
+def load_app(server, board_id):
+    os.environ.update({
+        'TRELLO_API_URL': f'{server.base_url}/1',
+        'AMAZING_FIELDS_API_URL': f'{server.base_url}/af',
+        'TRELLO_API_KEY': 'key',
+        'TRELLO_API_TOKEN': 'token',
+        'TRELLO_BOARD_ID': board_id,
+        'AMAZING_FIELDS_TOKEN': 'af-token',
+        'TRELLO_RATE_LIMIT': '0',
+        'CACHE_BACKEND': 'none',
+        'BOARD_MIRROR': '0',
+        'HTTP_MAX_RETRIES': '8',
+    })
+    sys.modules.pop('app', None)
+    sys.modules.pop('amazing_fields', None)
+    import app as app_module
+    logging.getLogger().setLevel(logging.ERROR)
+    return app_module
+
+
+def cold_board(app_module, client):
+    resolver = app_module.get_resolver()
+    if resolver is not None:
+        resolver._decoded.clear()
+    response = client.get('/board')
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response
+
+
+def run_size(args, num_cards):
+    server = start_server(args, num_cards)
+    app_module = load_app(server, args.board_id)
+    client = app_module.app.test_client()
+
+    before, af_before = server.request_count, server.af_request_count
+    response = cold_board(app_module, client)
+    cards = len(response.get_json()['factura_list']['cards'])
+    af_calls = server.af_request_count - af_before
+    trello_calls = server.request_count - before - af_calls
+
+    best = float('inf')
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        cold_board(app_module, client)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    cold_board(app_module, client)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    response = client.post('/generate-vtiger-bulk', json={'all': True})
+    rows = response.get_data().count(b'\n') - 1
+    elapsed = time.perf_counter() - start
+    assert response.status_code == 200, response.get_data(as_text=True)
+
+    server.shutdown()
+    server.server_close()
+    return {
+        'cards': cards,
+        'board_load_ms': round(best * 1000, 1),
+        'trello_calls': trello_calls,
+        'af_calls': af_calls,
+        'peak_mb': round(peak / 1e6, 2),
+        'csv_rows_per_sec': round(rows / elapsed, 1),
+    }
+
+
+def regressions(results, baseline, tolerance):
+    """Metrics worse than the baseline run of the same size, as printable lines."""
+    found = []
+    for size, result in results.items():
+        previous = baseline.get(size)
+        if previous is None:
+            continue
+        for metric, (label, _, higher_is_better, relative) in METRICS.items():
+            old, new = previous.get(metric), result.get(metric)
+            if old is None or new is None:
+                continue
+            slack = tolerance * old if relative else 0
+            worse = new < old - slack if higher_is_better else new > old + slack
+            if worse:
+                found.append(f"{size}: {label} {old} -> {new}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cards', type=int, nargs='+', default=[100, 1000, 5000])
+    parser.add_argument('--cassette', help='replay this cassette instead of the synthetic stub board')
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--plugin-every', type=int, default=4, help='every Nth card has Amazing Fields data')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of upstream responses replaced by 503s')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='fraction of upstream responses replaced by 429s')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--baseline', help='results file of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative slowdown')
+    args = parser.parse_args()
+
+    if args.cassette:
+        args.board_id = load_cassette(args.cassette).get('board_id') or os.getenv('TRELLO_BOARD_ID', '')
+        sizes = [os.path.basename(args.cassette)]
+    else:
+        args.board_id = BOARD_ID
+        sizes = args.cards
+
+    print(f"{args.latency * 1000:.0f} ms upstream latency, {args.error_rate:.0%} 503s, {args.throttle_rate:.0%} 429s")
+    print(f"{'board':>16} {'cards':>6} " + ' '.join(f"{label:>{len(fmt.format(0))}}"
+                                                   for label, fmt, _, _ in METRICS.values()))
+    results = {}
+    for size in sizes:
+        result = results[str(size)] = run_size(args, size)
+        print(f"{size:>16} {result['cards']:>6} " + ' '.join(fmt.format(result[metric])
+                                                            for metric, (_, fmt, _, _) in METRICS.items()))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}")
+        if found:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Wall-clock time of exporting several targets one after another vs all at once
+through the shared FairScheduler, against the latency-injecting stub server.
+
+Every target is an incremental CSV export of the whole stub list starting from
+an empty sync state, so each one makes 2 + N Trello requests. With the targets
+running at once the total time should grow far slower than the target count.
+
+    python benchmarks/bench_targets.py --targets 1 2 4 8 --cards 100 --latency 0.05
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_trello import start_stub_server, BOARD_ID
+
+
+class BenchProgress:
+    job_id = None
+
+    def update(self, **counts):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--targets', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--cards', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--per-target', type=int, default=8, help='TRELLO_MAX_IN_FLIGHT of each target')
+    parser.add_argument('--max-in-flight', type=int, default=32, help='global slots shared by all targets')
+    args = parser.parse_args()
+
+    server = start_stub_server(num_cards=args.cards, latency=args.latency)
+    workdir = tempfile.mkdtemp(prefix='bench-targets-')
+    names = [f'board{n}' for n in range(max(args.targets))]
+    with open(os.path.join(workdir, 'targets.json'), 'w') as f:
+        json.dump({'max_in_flight': args.max_in_flight,
+                   'targets': [{'name': name, 'board_id': BOARD_ID} for name in names]}, f)
+    os.environ.update({
+        'TRELLO_API_URL': f'{server.base_url}/1',
+        'TRELLO_API_KEY': 'key',
+        'TRELLO_API_TOKEN': 'token',
+        'TRELLO_BOARD_ID': BOARD_ID,
+        'TRELLO_RATE_LIMIT': '0',
+        'CACHE_BACKEND': 'none',
+        'TRELLO_MAX_IN_FLIGHT': str(args.per_target),
+        'HTTP_POOL_SIZE': str(args.max_in_flight),
+        'TARGETS_PATH': os.path.join(workdir, 'targets.json'),
+        'SYNC_DB': os.path.join(workdir, 'sync.sqlite3'),
+    })
+    import app as app_module
+    from sync_state import get_sync_state
+    logging.getLogger().setLevel(logging.WARNING)
+
+    def export(selected):
+        for name in selected:
+            get_sync_state().reset(f'csv:{name}')
+        start = time.perf_counter()
+        result = app_module.run_targets_job({'targets': selected, 'mode': 'incremental'}, BenchProgress())
+        elapsed = time.perf_counter() - start
+        assert all(outcome['status'] == 'done' for outcome in result['targets'].values()), result
+        return elapsed
+
+    print(f"{args.cards} cards per target, {args.latency * 1000:.0f} ms upstream latency, "
+          f"{args.per_target} requests in flight per target, {args.max_in_flight} shared slots")
+    print(f"{'targets':>8} {'sequential':>11} {'concurrent':>11} {'speedup':>8}")
+    for count in args.targets:
+        selected = names[:count]
+        sequential = sum(export([name]) for name in selected)
+        concurrent = export(selected)
+        print(f"{count:>8} {sequential:>10.2f}s {concurrent:>10.2f}s {sequential / concurrent:>7.1f}x")
+
+    for path in glob.glob(os.path.join('static', 'exports', 'vtiger_import_board*_*.csv')):
+        os.remove(path)
+    server.shutdown()
+    server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Cards/sec through the vTiger field-mapping transformer, compared with the
+previous if/elif implementation (kept here as a reference). Logging runs at
+WARNING, so the legacy numbers show the cost of its eagerly formatted
+logger.info calls even when nothing is printed.
+
+    python benchmarks/bench_transform.py --cards 20000
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+logger = logging.getLogger('legacy')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_trello import make_board
+
+
+def legacy_row(card_data, log=True):
+    """The previous if/elif transformer, including its per-field logger.info calls."""
+    from field_mapping import extract_value_from_checklist_item as extract
+    info = logger.info if log else (lambda message: None)
+    headers = ["accountname", "account_no", "phone", "email1", "website",
+               "bill_street", "bill_city", "bill_state", "bill_code", "bill_country",
+               "description"]
+    data_row = {header: "" for header in headers}
+    data_row["accountname"] = card_data.get('name', '')
+    info(f"Account name: {data_row['accountname']}")
+    data_row["description"] = card_data.get('desc', '')
+    simple = {'Dirección': 'bill_street', 'Código postal': 'bill_code', 'Población': 'bill_city',
+              'Provincia': 'bill_state', 'eMail': 'email1'}
+    info(f"Processing {len(card_data['checklists'])} checklists")
+    for checklist in card_data['checklists']:
+        info(f"Processing checklist: {checklist['name']}")
+        if checklist['name'] == 'Cuenta':
+            for item in checklist['checkItems']:
+                data_row["account_no"] = extract(item['name'])
+                info(f"Extracted account_no: {data_row['account_no']}")
+        elif checklist['name'] == 'DNI':
+            if not data_row["account_no"]:
+                for item in checklist['checkItems']:
+                    data_row["account_no"] = extract(item['name'])
+                    info(f"Extracted account_no from DNI: {data_row['account_no']}")
+        elif checklist['name'] in simple:
+            for item in checklist['checkItems']:
+                column = simple[checklist['name']]
+                data_row[column] = extract(item['name'])
+                info(f"Extracted {column}: {data_row[column]}")
+    return data_row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cards', type=int, default=20000)
+    parser.add_argument('--checklists', type=int, default=7)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    from vtiger_export import DEFAULT_MAPPING
+
+    board = make_board(args.cards, args.checklists)
+    cards = board['cards']
+    for card in cards:
+        card['checklists'] = [board['checklists'][cid] for cid in card['idChecklists']]
+
+    variants = (
+        ('legacy if/elif', legacy_row),
+        ('legacy, no logging', lambda card: legacy_row(card, log=False)),
+        ('compiled mapping', DEFAULT_MAPPING.transform),
+    )
+    for label, transform in variants:
+        start = time.perf_counter()
+        for card in cards:
+            transform(card)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<20} {len(cards) / elapsed:>10.0f} cards/sec")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Records/sec of the vTiger webservice push against the fake vTiger server,
+for increasing worker pool sizes. Half of the rows already exist in vTiger
+(and are revised), the rest are created.
+
+    python benchmarks/bench_vtiger_push.py --rows 500 --latency 0.02 --workers 1 4 16
+"""
+import argparse
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_vtiger import start_stub_vtiger
+from vtiger_client import VtigerClient
+
+
+def make_rows(num_rows):
+    return [{
+        'accountname': f'Cliente {n}',
+        'account_no': f'ES{n:08d}',
+        'email1': f'cliente{n}@example.com',
+        'bill_city': 'Madrid',
+    } for n in range(num_rows)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 16])
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    rows = make_rows(args.rows)
+    print(f"{'workers':>7} {'records/sec':>12} {'created':>8} {'updated':>8} {'failed':>7} {'logins':>7}")
+    for workers in args.workers:
+        server = start_stub_vtiger(latency=args.latency)
+        client = VtigerClient(server.base_url, 'admin', 'secret', max_workers=workers)
+        client.push_accounts(rows[:args.rows // 2])
+        report = client.push_accounts(rows)
+        print(f"{workers:>7} {report['records_per_sec']:>12} {report['created']:>8} {report['updated']:>8} "
+              f"{report['failed']:>7} {server.logins:>7}")
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
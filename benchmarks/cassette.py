@@ -0,0 +1,221 @@
+"""
+Record and replay the Trello and Amazing Fields API responses the app uses.
+
+In record mode a local proxy forwards every GET to the real APIs and stores
+the responses in a cassette (a JSON file) while /board, /board-data,
+/board-data/<card_id>, /amazing-fields/<card_id> and the bulk CSV export are
+run in-process; in replay mode the proxy serves the responses from the
+cassette, so the same routes run without network access or credentials, with
+the stub's latency, error and 429 injection on top.
+
+    python benchmarks/cassette.py record fixtures/cassettes/board.json    # credentials from .env
+    python benchmarks/cassette.py replay fixtures/cassettes/board.json --latency 0.05 --port 8766
+
+While replaying, point the app at the proxy:
+
+    TRELLO_API_URL=http://127.0.0.1:8766/1
+    AMAZING_FIELDS_API_URL=http://127.0.0.1:8766/af
+
+Requests are matched on path and query string without the key and token
+parameters. Neither those nor the Authorization header are written to the
+cassette.
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import sys
+import threading
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_trello import FaultInjectingServer, StubTrelloHandler
+
+logger = logging.getLogger(__name__)
+
+CASSETTE_VERSION = 1
+SECRET_PARAMS = {'key', 'token'}
+
+
+def interaction_key(path):
+    """'GET <path>?<query>' with the query sorted and the key/token parameters dropped."""
+    parsed = urlparse(path)
+    query = sorted((name, value) for name, value in parse_qsl(parsed.query, keep_blank_values=True)
+                   if name not in SECRET_PARAMS)
+    return f"GET {parsed.path}?{urlencode(query)}" if query else f"GET {parsed.path}"
+
+
+def load_cassette(path):
+    with open(path, encoding='utf-8') as f:
+        cassette = json.load(f)
+    if cassette.get('version') != CASSETTE_VERSION:
+        raise ValueError(f"Unsupported cassette version in {path}: {cassette.get('version')}")
+    return cassette
+
+
+def save_cassette(path, interactions, meta=None):
+    """Write the cassette with one interaction per line, sorted, so re-recordings diff cleanly."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    header = dict(meta or {}, version=CASSETTE_VERSION,
+                  recorded_at=datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'))
+    lines = [f" {json.dumps(key)}: {json.dumps(interaction, ensure_ascii=False)}"
+             for key, interaction in sorted(interactions.items())]
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(header, ensure_ascii=False)[:-1] + ', "interactions": {\n')
+        f.write(',\n'.join(lines))
+        f.write('\n}}\n')
+
+
+class CassetteServer(FaultInjectingServer):
+    """
+    Proxy on /1/... (Trello) and /af/... (Amazing Fields). With upstreams it
+    records what the real APIs answer; without, it replays interactions.
+    """
+
+    def __init__(self, address, interactions=None, upstreams=None, **options):
+        super().__init__(address, CassetteHandler, **options)
+        self.interactions = dict(interactions or {})
+        self.upstreams = upstreams
+        self.misses = []
+        self._session = requests.Session() if upstreams else None
+
+    @property
+    def recording(self):
+        return self.upstreams is not None
+
+    def forward(self, path, headers):
+        prefix, _, rest = path.lstrip('/').partition('/')
+        upstream = self.upstreams[prefix]
+        response = self._session.get(f"{upstream}/{rest}", headers=headers, timeout=60)
+        try:
+            body = response.json()
+        except ValueError:
+            body = response.text
+        interaction = {'status': response.status_code, 'body': body}
+        if response.status_code < 500 and response.status_code != 429:
+            with self._lock:
+                self.interactions[interaction_key(path)] = interaction
+        return interaction
+
+
+class CassetteHandler(StubTrelloHandler):
+    def do_GET(self):
+        if self.delay_or_fail():
+            return
+        if self.server.recording:
+            headers = {'Authorization': self.headers['Authorization']} if self.headers.get('Authorization') else {}
+            interaction = self.server.forward(self.path, headers)
+        else:
+            interaction = self.server.interactions.get(interaction_key(self.path))
+            if interaction is None:
+                logger.warning(f"Not in cassette: {interaction_key(self.path)}")
+                with self.server._lock:
+                    self.server.misses.append(interaction_key(self.path))
+                interaction = {'status': 404, 'body': {'error': 'not recorded'}}
+        body = interaction['body']
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+            self.send_response(interaction['status'])
+            self.send_header('Content-Type', 'text/plain; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self.send_json(interaction['status'], body)
+
+
+def start_cassette_server(path=None, upstreams=None, port=0, **options):
+    """
+    Start a cassette proxy in a daemon thread: replaying the cassette at path,
+    or, given upstreams ({'1': trello_url, 'af': amazing_fields_url}),
+    recording. options are the stub's latency, error_rate, throttle_rate,
+    retry_after and seed.
+    """
+    interactions = load_cassette(path)['interactions'] if path and not upstreams else None
+    server = CassetteServer(('127.0.0.1', port), interactions, upstreams, **options)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def exercise(client, detail_cards=5, amazing_fields_cards=5):
+    """Run the routes a cassette should cover through a Flask test client; returns {route: status}."""
+    statuses = {}
+
+    def get(path):
+        response = client.get(path)
+        statuses[path] = response.status_code
+        return response
+
+    board = get('/board').get_json() or {}
+    get('/board-data')
+    page = get('/board-data?limit=20&fields=name,labels,due').get_json() or {}
+    get('/board-data?limit=20&fields=name,labels,due,checklists,customFields')
+    cards = page.get('cards', []) if isinstance(page, dict) else []
+    for card in cards[:detail_cards]:
+        get(f"/board-data/{card['id']}")
+    af_cards = [card['id'] for card in board.get('factura_list', {}).get('cards', []) if card.get('customFields')]
+    for card_id in af_cards[:amazing_fields_cards]:
+        get(f"/amazing-fields/{card_id}")
+    response = client.post('/generate-vtiger-bulk', json={'all': True})
+    response.get_data()
+    statuses['/generate-vtiger-bulk'] = response.status_code
+    return statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('mode', choices=('record', 'replay'))
+    parser.add_argument('cassette')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--trello-url', help='Trello API to record from (default: TRELLO_API_URL or the real API)')
+    parser.add_argument('--amazing-fields-url', help='Amazing Fields API to record from')
+    parser.add_argument('--detail-cards', type=int, default=5, help='cards whose /board-data/<card_id> is recorded')
+    parser.add_argument('--amazing-fields-cards', type=int, default=5,
+                        help='cards whose /amazing-fields/<card_id> is recorded')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every replayed response')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of responses replaced by 503s')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='fraction of responses replaced by 429s')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.mode == 'replay':
+        server = start_cassette_server(args.cassette, port=args.port, latency=args.latency,
+                                       error_rate=args.error_rate, throttle_rate=args.throttle_rate)
+        logger.info(f"Replaying {len(server.interactions)} interactions on {server.base_url}/1 "
+                    f"(Amazing Fields on {server.base_url}/af)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+        return
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    upstreams = {
+        '1': args.trello_url or os.getenv('TRELLO_API_URL', 'https://api.trello.com/1'),
+        'af': args.amazing_fields_url or os.getenv('AMAZING_FIELDS_API_URL', 'https://api.amazingfields.com/api/v1'),
+    }
+    server = start_cassette_server(upstreams=upstreams, port=args.port)
+    os.environ.update({
+        'TRELLO_API_URL': f'{server.base_url}/1',
+        'AMAZING_FIELDS_API_URL': f'{server.base_url}/af',
+        'CACHE_BACKEND': 'none',
+        'BOARD_MIRROR': '0',
+    })
+    import app as app_module
+    statuses = exercise(app_module.app.test_client(), args.detail_cards, args.amazing_fields_cards)
+    server.shutdown()
+    server.server_close()
+    save_cassette(args.cassette, server.interactions, {'board_id': os.getenv('TRELLO_BOARD_ID')})
+    for route, status in statuses.items():
+        logger.info(f"{status} {route}")
+    logger.info(f"Recorded {len(server.interactions)} interactions to {args.cassette}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,309 @@
+"""
+Local stub of the Trello and Amazing Fields APIs with injected latency,
+errors and rate limiting.
+
+Serves a synthetic board whose 'Factura' list holds a configurable number of
+cards. Point the app at it with TRELLO_API_URL / AMAZING_FIELDS_API_URL.
+A fraction of the responses can be replaced by 503 errors (--error-rate) or
+429 responses with a Retry-After header (--throttle-rate).
+
+    python benchmarks/stub_trello.py --cards 100 --latency 0.05 --port 8765
+    python benchmarks/stub_trello.py --cards 100 --error-rate 0.05 --throttle-rate 0.1
+"""
+import argparse
+import hashlib
+import json
+import random
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+logger = logging.getLogger(__name__)
+
+BOARD_ID = 'stubboard'
+FACTURA_LIST_ID = 'list-factura'
+OTHER_LIST_ID = 'list-otra'
+AMAZING_FIELDS_PLUGIN_ID = '5d2cac7c242c7d3a3a5588b6'
+CUSTOM_FIELD_ID = 'cf-referencia'
+
+DNI_LETTERS = 'TRWAGMYFPDXBNJZSQVHLCKE'
+
+CHECKLIST_TEMPLATES = [
+    ('Cuenta', 'Cuenta: ES{n:08d}'),
+    ('DNI', 'DNI: {n:08d}{dni_letter}'),
+    ('Dirección', 'Dirección: Calle Mayor {n}'),
+    ('Código postal', 'Código postal: 28{postal:03d}'),
+    ('Población', 'Población: Madrid'),
+    ('Provincia', 'Provincia: Madrid'),
+    ('eMail', 'eMail: cliente{n}@example.com'),
+]
+
+
+def make_board(num_cards, checklists_per_card=2):
+    """Build a synthetic board with num_cards cards in the Factura list."""
+    cards = []
+    checklists = {}
+    for n in range(num_cards):
+        card_id = f'card{n:05d}'
+        card_checklists = []
+        values = {'n': n, 'dni_letter': DNI_LETTERS[n % 23], 'postal': n % 1000}
+        for c in range(checklists_per_card):
+            name, item = CHECKLIST_TEMPLATES[(n + c) % len(CHECKLIST_TEMPLATES)]
+            checklist_id = f'{card_id}-cl{c}'
+            checklists[checklist_id] = {
+                'id': checklist_id,
+                'idCard': card_id,
+                'name': name,
+                'checkItems': [{'id': f'{checklist_id}-i0', 'name': item.format(**values), 'state': 'incomplete'}],
+            }
+            card_checklists.append(checklist_id)
+        cards.append({
+            'id': card_id,
+            'name': f'Cliente {n}',
+            'desc': f'Tarjeta sintética número {n}',
+            'labels': [],
+            'due': None,
+            'idList': FACTURA_LIST_ID,
+            'idChecklists': card_checklists,
+            'dateLastActivity': '2025-01-01T00:00:00.000Z',
+        })
+    return {
+        'board': {'id': BOARD_ID, 'name': 'Stub board', 'url': 'http://stub/board'},
+        'lists': [
+            {'id': OTHER_LIST_ID, 'name': 'Pendiente'},
+            {'id': FACTURA_LIST_ID, 'name': 'Factura'},
+        ],
+        'cards': cards,
+        'checklists': checklists,
+    }
+
+
+class FaultInjectingServer(ThreadingHTTPServer):
+    """
+    HTTP server that delays every response by latency seconds and replaces a
+    random error_rate fraction of them with 503s and a throttle_rate fraction
+    with 429s carrying Retry-After: retry_after.
+    """
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, address, handler, latency=0.0, error_rate=0.0, throttle_rate=0.0, retry_after=0.05,
+                 seed=None):
+        super().__init__(address, handler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.request_count = 0
+        self.af_request_count = 0
+        self.faults = {'errors': 0, 'throttled': 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def count_request(self, amazing_fields=False):
+        with self._lock:
+            self.request_count += 1
+            if amazing_fields:
+                self.af_request_count += 1
+
+    def pick_fault(self):
+        """503, 429 or None for the next response."""
+        with self._lock:
+            roll = self._random.random()
+            if roll < self.error_rate:
+                self.faults['errors'] += 1
+                return 503
+            if roll < self.error_rate + self.throttle_rate:
+                self.faults['throttled'] += 1
+                return 429
+        return None
+
+
+class StubTrelloServer(FaultInjectingServer):
+    def __init__(self, address, num_cards=10, latency=0.0, checklists_per_card=2, plugin_every=1, **faults):
+        super().__init__(address, StubTrelloHandler, latency, **faults)
+        self.plugin_every = plugin_every
+        self.data = make_board(num_cards, checklists_per_card)
+        self.cards_by_id = {card['id']: card for card in self.data['cards']}
+
+
+class StubTrelloHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+    def delay_or_fail(self):
+        """Apply the server's latency; send an injected 503/429 and return True if this response fails."""
+        self.server.count_request(amazing_fields=self.path.startswith('/af/'))
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        fault = self.server.pick_fault()
+        if fault is None:
+            return False
+        body = json.dumps({'error': 'injected', 'status': fault}).encode('utf-8')
+        self.send_response(fault)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if fault == 429:
+            self.send_header('Retry-After', str(self.server.retry_after))
+        self.end_headers()
+        self.wfile.write(body)
+        return True
+
+    def do_GET(self):
+        if self.delay_or_fail():
+            return
+        parsed = urlparse(self.path)
+        params = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+        parts = [p for p in parsed.path.split('/') if p]
+        try:
+            status, payload = self.route(parts, params)
+        except (KeyError, IndexError):
+            status, payload = 404, {'error': 'not found'}
+        self.send_json(status, payload)
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        if status == 200 and self.headers.get('If-None-Match') == etag:
+            status, body = 304, b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def route(self, parts, params):
+        data = self.server.data
+        if parts[0] == 'af' and parts[1] == 'card':
+            card_id = parts[2]
+            return 200, {'card': card_id, 'fields': {'Importe': '100'}}
+        if parts[0] != '1':
+            return 404, {'error': 'not found'}
+        resource = parts[1]
+
+        if resource == 'batch':
+            results = []
+            for url in params.get('urls', '').split(','):
+                sub_url = urlparse(url)
+                sub_params = {k: v[-1] for k, v in parse_qs(sub_url.query).items()}
+                sub_parts = ['1'] + [p for p in sub_url.path.split('/') if p and p != '1']
+                try:
+                    status, payload = self.route(sub_parts, sub_params)
+                except (KeyError, IndexError):
+                    status, payload = 404, 'not found'
+                results.append({str(status): payload} if status == 200 else
+                               {'statusCode': status, 'name': 'NotFound', 'message': payload})
+            return 200, results
+
+        if resource == 'boards':
+            if len(parts) == 3:
+                board = dict(data['board'])
+                if params.get('lists'):
+                    board['lists'] = [dict(lst) for lst in data['lists']]
+                if params.get('cards'):
+                    board['cards'] = data['cards']
+                    if params.get('card_pluginData') == 'true':
+                        board['cards'] = [dict(card, pluginData=self.plugin_data(card)) for card in data['cards']]
+                return 200, board
+            if parts[3] == 'lists':
+                lists = []
+                for lst in data['lists']:
+                    lst = dict(lst)
+                    if params.get('cards'):
+                        lst['cards'] = self.cards_in(lst['id'], params)
+                    lists.append(lst)
+                return 200, lists
+            if parts[3] == 'cards':
+                return 200, self.cards_in(None, params)
+
+        if resource == 'lists' and parts[3] == 'cards':
+            return 200, self.cards_in(parts[2], params)
+
+        if resource == 'checklists':
+            return 200, data['checklists'][parts[2]]
+
+        if resource == 'cards':
+            card = self.server.cards_by_id[parts[2]]
+            if len(parts) == 3:
+                return 200, self.expand_card(card, params)
+            sub = parts[3]
+            if sub == 'customFieldItems':
+                return 200, self.custom_field_items(card)
+            if sub == 'customFields':
+                return 200, []
+            if sub == 'checklists':
+                return 200, [data['checklists'][cid] for cid in card['idChecklists']]
+            if sub == 'pluginData':
+                return 200, self.plugin_data(card)
+
+        return 404, {'error': 'not found'}
+
+    def cards_in(self, list_id, params):
+        before = params.get('before')
+        return [
+            self.expand_card(card, params)
+            for card in self.server.data['cards']
+            if (list_id is None or card['idList'] == list_id) and (before is None or card['id'] < before)
+        ]
+
+    def expand_card(self, card, params):
+        fields = params.get('fields')
+        if fields and fields != 'all':
+            expanded = {key: value for key, value in card.items() if key == 'id' or key in fields.split(',')}
+        else:
+            expanded = dict(card)
+        if params.get('checklists') == 'all':
+            expanded['checklists'] = [self.server.data['checklists'][cid] for cid in card['idChecklists']]
+        if params.get('customFieldItems') == 'true':
+            expanded['customFieldItems'] = self.custom_field_items(card)
+        if params.get('pluginData') == 'true':
+            expanded['pluginData'] = self.plugin_data(card)
+        return expanded
+
+    def custom_field_items(self, card):
+        return [{'id': f"{card['id']}-cf", 'idCustomField': CUSTOM_FIELD_ID, 'idModel': card['id'],
+                 'value': {'text': f"REF-{card['id'][4:]}"}}]
+
+    def plugin_data(self, card):
+        if int(card['id'][4:]) % self.server.plugin_every:
+            return []
+        return [{'id': f"{card['id']}-pd", 'idPlugin': AMAZING_FIELDS_PLUGIN_ID,
+                 'scope': 'card', 'idModel': card['id'], 'value': '{"fields":{}}'}]
+
+
+def start_stub_server(num_cards=10, latency=0.0, port=0, checklists_per_card=2, plugin_every=1, **faults):
+    """
+    Start a stub server in a daemon thread and return it. Every plugin_every-th
+    card has Amazing Fields data; faults are error_rate, throttle_rate,
+    retry_after and seed (see FaultInjectingServer).
+    """
+    server = StubTrelloServer(('127.0.0.1', port), num_cards, latency, checklists_per_card, plugin_every, **faults)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cards', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds added to every response')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of responses replaced by 503s')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='fraction of responses replaced by 429s')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    server = StubTrelloServer(('127.0.0.1', args.port), args.cards, args.latency,
+                              error_rate=args.error_rate, throttle_rate=args.throttle_rate)
+    logger.info(f"Stub Trello API on {server.base_url}/1 (Amazing Fields on {server.base_url}/af)")
+    server.serve_forever()
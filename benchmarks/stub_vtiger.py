@@ -0,0 +1,133 @@
+"""
+Local fake of the vTiger webservice (webservice.php) with injected latency.
+
+Supports getchallenge, login, query (SELECT ... FROM Accounts WHERE account_no
+or accountname IN (...)), create and revise, which is what vtiger_client uses.
+
+    python benchmarks/stub_vtiger.py --latency 0.05 --port 8766
+"""
+import argparse
+import json
+import logging
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+logger = logging.getLogger(__name__)
+
+IN_PATTERN = re.compile(r"(account_no|accountname)\s+IN\s*\((.*)\)", re.IGNORECASE)
+VALUE_PATTERN = re.compile(r"'((?:[^'\\]|\\.)*)'")
+
+
+class StubVtigerServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, address, latency=0.0, fail_every=0):
+        super().__init__(address, StubVtigerHandler)
+        self.latency = latency
+        self.fail_every = fail_every
+        self.accounts = {}
+        self.sessions = set()
+        self.request_count = 0
+        self.logins = 0
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+
+class StubVtigerHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+    def do_GET(self):
+        self.handle_operation({k: v[-1] for k, v in parse_qs(urlparse(self.path).query).items()})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length).decode('utf-8')
+        self.handle_operation({k: v[-1] for k, v in parse_qs(body).items()})
+
+    def handle_operation(self, params):
+        server = self.server
+        with server._lock:
+            server.request_count += 1
+            count = server.request_count
+        if server.latency:
+            time.sleep(server.latency)
+        operation = params.get('operation')
+        if operation == 'getchallenge':
+            return self.ok({'token': uuid.uuid4().hex, 'serverTime': int(time.time()), 'expireTime': int(time.time()) + 300})
+        if operation == 'login':
+            session_name = uuid.uuid4().hex
+            with server._lock:
+                server.sessions.add(session_name)
+                server.logins += 1
+            return self.ok({'sessionName': session_name, 'userId': '19x1'})
+        if params.get('sessionName') not in server.sessions:
+            return self.error('INVALID_SESSIONID', 'Session Identifier provided is Invalid')
+        if server.fail_every and count % server.fail_every == 0 and operation in ('create', 'revise'):
+            return self.error('ACCESS_DENIED', 'Injected failure')
+
+        if operation == 'query':
+            match = IN_PATTERN.search(params.get('query', ''))
+            field = match.group(1).lower() if match else 'account_no'
+            wanted = [v.replace("\\'", "'").replace('\\\\', '\\') for v in VALUE_PATTERN.findall(match.group(2))] if match else []
+            with server._lock:
+                by_value = {account.get(field): account for account in server.accounts.values()}
+                records = [{'id': by_value[value]['id'], field: value} for value in wanted if value in by_value]
+            return self.ok(records)
+        if operation in ('create', 'revise'):
+            element = json.loads(params['element'])
+            with server._lock:
+                if operation == 'create':
+                    element['id'] = f"11x{len(server.accounts) + 1}"
+                else:
+                    existing = next((a for a in server.accounts.values() if a['id'] == element['id']), None)
+                    if existing is None:
+                        return self.error('RECORD_NOT_FOUND', 'Record you are trying to access is not found')
+                    element = dict(existing, **element)
+                server.accounts[element.get('account_no') or element['id']] = element
+            return self.ok(element)
+        return self.error('INVALID_OPERATION', f'Unknown operation {operation}')
+
+    def ok(self, result):
+        self.send_json({'success': True, 'result': result})
+
+    def error(self, code, message):
+        self.send_json({'success': False, 'error': {'code': code, 'message': message}})
+
+    def send_json(self, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_stub_vtiger(latency=0.0, port=0, fail_every=0):
+    """Start a fake vTiger server in a daemon thread and return it."""
+    server = StubVtigerServer(('127.0.0.1', port), latency, fail_every)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--port', type=int, default=8766)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    server = StubVtigerServer(('127.0.0.1', args.port), args.latency)
+    logger.info(f"Fake vTiger webservice on {server.base_url}/webservice.php")
+    server.serve_forever()
@@ -0,0 +1,304 @@
+"""
+Loads the Factura list with as few Trello requests as possible.
+
+Checklists and customFieldItems come nested in a single list-cards query, and
+the remaining per-card resources are fetched through /1/batch, ten URLs per
+call. Each loader counts the upstream requests it made. AsyncBoardLoader
+issues the same requests from coroutines for the ASGI routes.
+"""
+import logging
+import threading
+import contextlib
+
+from board_model import parse_card, parse_cards, parse_checklists
+from fetcher import fan_out, fan_out_async
+from trello_client import get_client, get_async_client
+
+logger = logging.getLogger(__name__)
+
+TRELLO_BATCH_SIZE = 10
+
+CARD_FIELDS = 'name,desc,labels,due,idChecklists,dateLastActivity'
+
+BOARD_PARAMS = {'lists': 'open', 'cards': 'open', 'card_fields': CARD_FIELDS, 'fields': 'name,url'}
+
+CHECKLIST_PARAMS = {'checklists': 'all', 'checklist_fields': 'name', 'checkItem_fields': 'name,state'}
+
+# Per-card resources of the /board-data detail fields, fetched through /1/batch
+DETAIL_RESOURCES = ('checklists', 'customFields')
+
+
+class TrelloError(Exception):
+    """Raised when a Trello request the loader cannot do without fails."""
+
+    def __init__(self, message, status_code=500):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class BoardLoader:
+    def __init__(self, api_url, api_key, token, client=None, gate=None):
+        """gate, if given, is a zero-argument context manager factory every request runs inside."""
+        self.api_url = api_url
+        self.api_key = api_key
+        self.token = token
+        self.client = client or get_client()
+        self.gate = gate or contextlib.nullcontext
+        self.request_count = 0
+        self._lock = threading.Lock()
+
+    def get(self, path, use_cache=True, **params):
+        """GET a Trello path with credentials, counting requests that reach Trello."""
+        with self.gate():
+            response = self.client.get(
+                f"{self.api_url}{path}",
+                params={'key': self.api_key, 'token': self.token, **params},
+                use_cache=use_cache
+            )
+        if not getattr(response, 'from_cache', False):
+            with self._lock:
+                self.request_count += 1
+        return response
+
+    def get_json(self, path, what, use_cache=True, **params):
+        response = self.get(path, use_cache=use_cache, **params)
+        if response.status_code != 200:
+            logger.error(f"Error getting {what}: {response.status_code}")
+            raise TrelloError(f"Error getting {what}: {response.status_code}", 404 if response.status_code == 404 else 500)
+        return response.json()
+
+    def get_board(self, board_id, plugin_data=False):
+        """Board name/url with its open lists and cards (optionally with their pluginData), in one request."""
+        params = dict(BOARD_PARAMS, card_pluginData='true') if plugin_data else BOARD_PARAMS
+        return self.get_json(f"/boards/{board_id}", 'board data', **params)
+
+    def get_lists(self, board_id):
+        return self.get_json(f"/boards/{board_id}/lists", 'lists', filter='open', fields='name,id')
+
+    def get_list_cards(self, list_id, custom_field_items=False, checklists=True, fields=CARD_FIELDS, before=None):
+        """
+        Cards (board_model.Card) of a list with their checklists (and
+        customFieldItems) nested. fields is Trello's card field projection and
+        before only returns the cards older than that card ID.
+        """
+        params = dict(CHECKLIST_PARAMS, fields=fields) if checklists else {'fields': fields}
+        if custom_field_items:
+            params['customFieldItems'] = 'true'
+        if before:
+            params['before'] = before
+        return parse_cards(self.get_json(f"/lists/{list_id}/cards", 'cards', **params))
+
+    def get_card(self, card_id, use_cache=True, custom_fields=True, custom_field_items=False):
+        """A single card in the /board-data shape: checklists (and customFieldItems) nested, customFields attached."""
+        params = dict(CHECKLIST_PARAMS, customFieldItems='true') if custom_field_items else CHECKLIST_PARAMS
+        card = parse_card(self.get_json(
+            f"/cards/{card_id}", 'card', use_cache=use_cache,
+            fields=CARD_FIELDS + ',idList,closed',
+            **params
+        ))
+        if custom_fields:
+            response = self.get(f"/cards/{card_id}/customFields", use_cache=use_cache)
+            card['customFields'] = response.json() if response.status_code == 200 else []
+        return card
+
+    def iter_cards(self, card_ids, chunk_size=50, custom_fields=False, custom_field_items=False):
+        """
+        Yield cards by ID, fetching chunk_size cards concurrently at a time so
+        memory stays bounded. Cards that fail to load are logged and skipped.
+        """
+        def fetch(card_id):
+            try:
+                return self.get_card(card_id, custom_fields=custom_fields, custom_field_items=custom_field_items)
+            except TrelloError as e:
+                logger.warning(f"Skipping card {card_id}: {e}")
+                return None
+            except Exception:
+                logger.exception(f"Error getting card {card_id}")
+                return None
+
+        for start in range(0, len(card_ids), chunk_size):
+            for card in fan_out(fetch, card_ids[start:start + chunk_size]):
+                if card is not None:
+                    yield card
+
+    def find_factura_list(self, board_id, list_name='Factura'):
+        """The open list whose name contains list_name. Raises TrelloError(404) if it is missing."""
+        return require_list(self.get_lists(board_id), list_name)
+
+    def get_list_card_summaries(self, list_id):
+        """Just id and dateLastActivity for every card in a list, for change detection."""
+        return self.get_json(f"/lists/{list_id}/cards", 'cards', use_cache=False, fields='id,dateLastActivity')
+
+    def load_factura_cards(self, board_id, list_name='Factura', custom_fields=True, custom_field_items=False):
+        """
+        Find the Factura list (case-insensitive substring match) and return it with
+        its cards in the /board-data shape. Raises TrelloError(404) if it is missing.
+        """
+        factura_list = self.find_factura_list(board_id, list_name)
+        cards = self.get_list_cards(factura_list['id'], custom_field_items=custom_field_items)
+        logger.debug("Found %d cards in Factura list", len(cards))
+
+        if custom_fields:
+            # Get custom fields for all cards in batches
+            attach_custom_fields(cards, self.batch_by_card(cards, 'customFields'))
+        return factura_list, cards
+
+    def batch(self, paths):
+        """
+        Fetch many Trello GET paths via /1/batch, TRELLO_BATCH_SIZE per call.
+        Returns one entry per path: the parsed body, or None if that URL failed.
+        """
+        chunks = [paths[i:i + TRELLO_BATCH_SIZE] for i in range(0, len(paths), TRELLO_BATCH_SIZE)]
+
+        def fetch_chunk(chunk):
+            try:
+                response = self.get('/batch', urls=','.join(chunk))
+            except Exception:
+                logger.exception("Error calling Trello batch endpoint")
+                return [None] * len(chunk)
+            return batch_results(response, chunk)
+
+        results = []
+        for chunk_results in fan_out(fetch_chunk, chunks):
+            results.extend(chunk_results)
+        return results
+
+    def batch_by_card(self, cards, resource):
+        """Fetch /cards/{id}/{resource} for every card, keyed by card ID."""
+        paths = [f"/cards/{card['id']}/{resource}" for card in cards]
+        return {card['id']: result for card, result in zip(cards, self.batch(paths))}
+
+    def attach_details(self, cards, resources=DETAIL_RESOURCES):
+        """
+        Nest the checklists and attach the custom fields of a page of cards
+        loaded without them, all through /1/batch.
+        """
+        attach_details(cards, resources, self.batch(detail_paths(cards, resources)))
+
+
+class AsyncBoardLoader:
+    """The BoardLoader requests the ASGI routes need, as coroutines on the shared AsyncApiClient."""
+
+    def __init__(self, api_url, api_key, token, client=None):
+        self.api_url = api_url
+        self.api_key = api_key
+        self.token = token
+        self.client = client or get_async_client()
+        self.request_count = 0
+
+    async def get(self, path, use_cache=True, **params):
+        response = await self.client.get(
+            f"{self.api_url}{path}",
+            params={'key': self.api_key, 'token': self.token, **params},
+            use_cache=use_cache
+        )
+        if not getattr(response, 'from_cache', False):
+            self.request_count += 1
+        return response
+
+    async def get_json(self, path, what, use_cache=True, **params):
+        response = await self.get(path, use_cache=use_cache, **params)
+        if response.status_code != 200:
+            logger.error(f"Error getting {what}: {response.status_code}")
+            raise TrelloError(f"Error getting {what}: {response.status_code}", 404 if response.status_code == 404 else 500)
+        return response.json()
+
+    async def get_board(self, board_id, plugin_data=False):
+        params = dict(BOARD_PARAMS, card_pluginData='true') if plugin_data else BOARD_PARAMS
+        return await self.get_json(f"/boards/{board_id}", 'board data', **params)
+
+    async def get_lists(self, board_id):
+        return await self.get_json(f"/boards/{board_id}/lists", 'lists', filter='open', fields='name,id')
+
+    async def get_list_cards(self, list_id, custom_field_items=False, checklists=True, fields=CARD_FIELDS, before=None):
+        params = dict(CHECKLIST_PARAMS, fields=fields) if checklists else {'fields': fields}
+        if custom_field_items:
+            params['customFieldItems'] = 'true'
+        if before:
+            params['before'] = before
+        return parse_cards(await self.get_json(f"/lists/{list_id}/cards", 'cards', **params))
+
+    async def find_factura_list(self, board_id, list_name='Factura'):
+        return require_list(await self.get_lists(board_id), list_name)
+
+    async def load_factura_cards(self, board_id, list_name='Factura', custom_fields=True, custom_field_items=False):
+        factura_list = await self.find_factura_list(board_id, list_name)
+        cards = await self.get_list_cards(factura_list['id'], custom_field_items=custom_field_items)
+        logger.debug("Found %d cards in Factura list", len(cards))
+
+        if custom_fields:
+            attach_custom_fields(cards, await self.batch_by_card(cards, 'customFields'))
+        return factura_list, cards
+
+    async def batch(self, paths):
+        chunks = [paths[i:i + TRELLO_BATCH_SIZE] for i in range(0, len(paths), TRELLO_BATCH_SIZE)]
+
+        async def fetch_chunk(chunk):
+            try:
+                response = await self.get('/batch', urls=','.join(chunk))
+            except Exception:
+                logger.exception("Error calling Trello batch endpoint")
+                return [None] * len(chunk)
+            return batch_results(response, chunk)
+
+        results = []
+        for chunk_results in await fan_out_async(fetch_chunk, chunks):
+            results.extend(chunk_results)
+        return results
+
+    async def batch_by_card(self, cards, resource):
+        paths = [f"/cards/{card['id']}/{resource}" for card in cards]
+        return {card['id']: result for card, result in zip(cards, await self.batch(paths))}
+
+    async def attach_details(self, cards, resources=DETAIL_RESOURCES):
+        attach_details(cards, resources, await self.batch(detail_paths(cards, resources)))
+
+
+def batch_results(response, chunk):
+    """Unpack a /1/batch response into one parsed body (or None) per requested URL."""
+    if response.status_code != 200:
+        logger.warning(f"Error in Trello batch request: {response.status_code}")
+        return [None] * len(chunk)
+    return [item.get('200') if isinstance(item, dict) else None for item in response.json()]
+
+
+def detail_paths(cards, resources):
+    return [f"/cards/{card['id']}/{resource}" for resource in resources for card in cards]
+
+
+def attach_details(cards, resources, results):
+    """Set the detail resources of cards from the batch results of detail_paths(cards, resources)."""
+    results = iter(results)
+    for resource in resources:
+        for card in cards:
+            result = next(results)
+            if result is None:
+                result = []
+            card[resource] = parse_checklists(result) if resource == 'checklists' else result
+
+
+def attach_custom_fields(cards, custom_fields_by_card):
+    for card in cards:
+        custom_fields = custom_fields_by_card.get(card['id'])
+        card['customFields'] = custom_fields if custom_fields is not None else []
+
+
+def require_list(lists, list_name='Factura'):
+    """The list whose name contains list_name. Raises TrelloError(404) if it is missing."""
+    logger.debug("Found %d lists", len(lists))
+    factura_list = find_list(lists, list_name, exact=False)
+    if not factura_list:
+        logger.error("Factura list not found")
+        raise TrelloError(f"Lista '{list_name}' no encontrada", 404)
+    logger.debug("Found Factura list: %s", factura_list['name'])
+    return factura_list
+
+
+def find_list(lists, name='Factura', exact=True):
+    """Return the first list whose name matches, exactly or as a case-insensitive substring."""
+    for list_item in lists:
+        if exact and list_item['name'] == name:
+            return list_item
+        if not exact and name.lower() in list_item['name'].lower():
+            return list_item
+    return None
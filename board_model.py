@@ -0,0 +1,144 @@
+"""
+Compact model of the cards the app loads, keeps and exports.
+
+Trello returns every card as a dict carrying more than the UI and the vTiger
+export use. parse_cards() turns the list-cards JSON into __slots__ Card
+records in a single pass, keeping only what is consumed: the card's name,
+description, labels, due date, checklist IDs and last activity, its checklists
+with the name and state of their items, its custom field values and the
+decoded Amazing Fields. Checklist names and item states are interned, so the
+handful of distinct values ('Cuenta', 'DNI', 'complete', ...) are stored once
+per process, and a label used on many cards is one shared dict.
+
+Checklists, their items and custom field values stay plain dicts with just
+those keys: they are most of the objects in a card, and orjson encodes dicts
+natively, while every record costs a to_dict() callback.
+
+Records read like the dicts they replace (card['name'], card.get('checklists'),
+'customFields' in card), so pagination, projection and the field mapping take
+either, and to_dict() gives the same JSON shape back.
+"""
+import sys
+
+_MISSING = object()
+
+
+class Record:
+    """Dict-style access to the slots of a record; unset slots read as missing keys."""
+    __slots__ = ()
+    FIELDS = frozenset()
+
+    def __getitem__(self, key):
+        if key in self.FIELDS:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                pass
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key not in self.FIELDS:
+            raise KeyError(f"{type(self).__name__} has no field '{key}'")
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self.FIELDS and hasattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default) if key in self.FIELDS else default
+
+    def setdefault(self, key, default=None):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            self[key] = value = default
+        return value
+
+    def keys(self):
+        return [key for key in self.__slots__ if hasattr(self, key)]
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in self.keys()}
+
+
+class Card(Record):
+    # idList and closed are only set on cards fetched one by one (the board mirror needs them)
+    __slots__ = ('id', 'name', 'desc', 'labels', 'due', 'idChecklists', 'dateLastActivity', 'idList', 'closed',
+                 'checklists', 'customFieldItems', 'customFields')
+    FIELDS = frozenset(__slots__)
+
+    def __init__(self, id, name='', desc='', labels=(), due=None, idChecklists=(), dateLastActivity=None):
+        self.id = id
+        self.name = name
+        self.desc = desc
+        self.labels = labels
+        self.due = due
+        self.idChecklists = idChecklists
+        self.dateLastActivity = dateLastActivity
+
+    def to_dict(self):
+        data = {'id': self.id, 'name': self.name, 'desc': self.desc, 'labels': self.labels, 'due': self.due,
+                'idChecklists': self.idChecklists, 'dateLastActivity': self.dateLastActivity}
+        for key in OPTIONAL_CARD_FIELDS:
+            value = getattr(self, key, _MISSING)
+            if value is not _MISSING:
+                data[key] = value
+        return data
+
+
+OPTIONAL_CARD_FIELDS = ('idList', 'closed', 'checklists', 'customFieldItems', 'customFields')
+
+
+def _label(label, labels):
+    shared = labels.get(label.get('id'))
+    if shared is None:
+        shared = labels[label.get('id')] = {'id': label.get('id'), 'name': label.get('name'),
+                                            'color': label.get('color')}
+    return shared
+
+
+def parse_card(raw, labels=None):
+    """
+    Card from a Trello card dict (with checklists and customFieldItems nested,
+    if requested). labels maps label ID -> label dict shared between cards.
+    """
+    labels = {} if labels is None else labels
+    card = Card(
+        raw['id'],
+        raw.get('name', ''),
+        raw.get('desc', ''),
+        [_label(label, labels) for label in raw.get('labels') or ()],
+        raw.get('due'),
+        raw.get('idChecklists') or [],
+        raw.get('dateLastActivity'),
+    )
+    if 'idList' in raw:
+        card.idList = raw['idList']
+    if 'closed' in raw:
+        card.closed = raw['closed']
+    if 'checklists' in raw:
+        card.checklists = parse_checklists(raw['checklists'])
+    if 'customFieldItems' in raw:
+        card.customFieldItems = [
+            {'idCustomField': item.get('idCustomField'), 'value': item.get('value'), 'idValue': item.get('idValue')}
+            for item in raw['customFieldItems']
+        ]
+    if 'customFields' in raw:
+        card.customFields = raw['customFields']
+    return card
+
+
+def parse_checklists(raw_checklists):
+    """Checklists from a Trello checklists array (nested in a card or from /cards/{id}/checklists)."""
+    return [
+        {'id': checklist['id'], 'name': sys.intern(checklist.get('name') or ''), 'checkItems': [
+            {'id': item['id'], 'name': item.get('name', ''), 'state': sys.intern(item.get('state') or 'incomplete')}
+            for item in checklist.get('checkItems') or ()
+        ]}
+        for checklist in raw_checklists
+    ]
+
+
+def parse_cards(raw_cards):
+    """Cards from a Trello list-cards response, in order."""
+    labels = {}
+    return [parse_card(raw, labels) for raw in raw_cards]
@@ -0,0 +1,82 @@
+"""
+Cursor pagination and field projection for /board-data.
+
+Pages follow Trello's own before/limit convention: cards are ordered newest
+first by ID (a Trello ID starts with its creation timestamp), `before` is the
+ID of the last card already received and `limit` is the page size.
+"""
+import heapq
+
+MAX_LIMIT = 1000
+
+# Card fields a client can ask for with fields=; 'id' is always included.
+CARD_DATA_FIELDS = ('name', 'desc', 'labels', 'due', 'idChecklists', 'dateLastActivity', 'checklists',
+                    'customFields')
+
+
+def parse_page_args(args):
+    """
+    Read before, limit and fields from request args. Returns (before, limit,
+    fields) with None for anything not given; raises ValueError on bad values.
+    """
+    before = args.get('before') or None
+    limit = args.get('limit')
+    if limit is not None:
+        if not limit.isdigit() or not 1 <= int(limit) <= MAX_LIMIT:
+            raise ValueError(f"limit must be between 1 and {MAX_LIMIT}")
+        limit = int(limit)
+
+    fields = args.get('fields')
+    if fields is not None:
+        fields = [field for field in fields.split(',') if field and field != 'id']
+        unknown = [field for field in fields if field not in CARD_DATA_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return before, limit, fields
+
+
+def paginate(cards, before=None, limit=None):
+    """
+    One page of cards, newest first, older than the before ID. Returns
+    (page, next_before); next_before is None on the last page. Without before
+    and limit the cards are returned as they are, in list order.
+    """
+    if before is None and limit is None:
+        return cards, None
+    if before:
+        cards = [card for card in cards if card['id'] < before]
+    if limit is None:
+        return sorted(cards, key=card_id, reverse=True), None
+    # Only the page (and one more card, to know whether there is a next page) is put in order
+    ordered = heapq.nlargest(limit + 1, cards, key=card_id)
+    if len(ordered) <= limit:
+        return ordered, None
+    page = ordered[:limit]
+    return page, page[-1]['id']
+
+
+def card_id(card):
+    return card['id']
+
+
+def project(card, fields):
+    """The card reduced to its ID plus the requested fields (all of them when fields is None)."""
+    if fields is None:
+        return card
+    projected = {'id': card['id']}
+    for field in fields:
+        if field in card:
+            projected[field] = card[field]
+    return projected
+
+
+def wants(fields, field):
+    return fields is None or field in fields
+
+
+def page_body(page, fields, before, limit, next_before):
+    """The /board-data response body for a page; next_before is only included when paginating."""
+    body = {'cards': page if fields is None else [project(card, fields) for card in page]}
+    if before is not None or limit is not None:
+        body['next_before'] = next_before
+    return body
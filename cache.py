@@ -0,0 +1,355 @@
+"""
+Response cache in front of the upstream HTTP client.
+
+Entries are keyed by URL + params (credentials hashed), expire after a TTL
+that depends on the kind of resource, and are revalidated with If-None-Match
+when the upstream sent an ETag. Backends are an in-process LRU dict and an
+on-disk SQLite store, both bounded by total body size.
+"""
+import os
+import re
+import time
+import json
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from urllib.parse import urlencode, urlsplit
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTLS = {
+    'board': 60,
+    'list': 30,
+    'card': 60,
+    'plugin': 300,
+    'amazing_fields': 300,
+}
+
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+
+CREDENTIAL_PARAMS = ('key', 'token')
+
+_ID_PATTERN = re.compile(r'/(boards|lists|cards|checklists)/([^/?,]+)')
+
+
+class CacheEntry:
+    __slots__ = ('status', 'body', 'etag', 'content_type', 'expires_at', 'tags')
+
+    def __init__(self, status, body, etag, content_type, expires_at, tags):
+        self.status = status
+        self.body = body
+        self.etag = etag
+        self.content_type = content_type
+        self.expires_at = expires_at
+        self.tags = tags
+
+    @property
+    def size(self):
+        return len(self.body)
+
+
+class MemoryBackend:
+    """In-process LRU store bounded by the total size of cached bodies."""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        """Store an entry and return how many entries were evicted to make room."""
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old.size
+            self._entries[key] = entry
+            self.size += entry.size
+            evicted = 0
+            while self.size > self.max_bytes and len(self._entries) > 1:
+                _, dropped = self._entries.popitem(last=False)
+                self.size -= dropped.size
+                evicted += 1
+            return evicted
+
+    def delete_tagged(self, tags):
+        with self._lock:
+            keys = [key for key, entry in self._entries.items() if entry.tags & tags]
+            for key in keys:
+                self.size -= self._entries.pop(key).size
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteBackend:
+    """
+    On-disk store so a restarted process does not start with a cold cache.
+    Hits only note their access time in memory; the times are written in one
+    transaction before an eviction, or once flush_every hits or flush_interval
+    seconds have piled up, so a hit does not cost a disk sync.
+    """
+
+    def __init__(self, path='cache.sqlite3', max_bytes=DEFAULT_MAX_BYTES, flush_every=256, flush_interval=30):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._touched = {}
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                status INTEGER,
+                body BLOB,
+                etag TEXT,
+                content_type TEXT,
+                expires_at REAL,
+                tags TEXT,
+                size INTEGER,
+                accessed_at REAL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+        self._db.commit()
+
+    @property
+    def size(self):
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT status, body, etag, content_type, expires_at, tags FROM entries WHERE key = ?",
+                (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._touched[key] = time.time()
+            if (len(self._touched) >= self.flush_every
+                    or time.monotonic() - self._last_flush >= self.flush_interval):
+                self._flush_access_times()
+                self._db.commit()
+        status, body, etag, content_type, expires_at, tags = row
+        return CacheEntry(status, bytes(body), etag, content_type, expires_at, set(json.loads(tags)))
+
+    def _flush_access_times(self):
+        """Write the pending access times; the caller holds the lock and commits."""
+        if self._touched:
+            self._db.executemany("UPDATE entries SET accessed_at = ? WHERE key = ?",
+                                 [(accessed_at, key) for key, accessed_at in self._touched.items()])
+            self._touched.clear()
+        self._last_flush = time.monotonic()
+
+    def set(self, key, entry):
+        with self._lock:
+            self._touched.pop(key, None)
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, entry.status, entry.body, entry.etag, entry.content_type, entry.expires_at,
+                 json.dumps(sorted(entry.tags)), entry.size, time.time())
+            )
+            evicted = 0
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total > self.max_bytes:
+                # Evict by up-to-date access times
+                self._flush_access_times()
+                for old_key, size in self._db.execute(
+                        "SELECT key, size FROM entries WHERE key != ? ORDER BY accessed_at", (key,)).fetchall():
+                    self._db.execute("DELETE FROM entries WHERE key = ?", (old_key,))
+                    total -= size
+                    evicted += 1
+                    if total <= self.max_bytes:
+                        break
+            self._db.commit()
+            return evicted
+
+    def delete_tagged(self, tags):
+        with self._lock:
+            keys = [
+                key for key, entry_tags in self._db.execute("SELECT key, tags FROM entries")
+                if set(json.loads(entry_tags)) & tags
+            ]
+            self._db.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key in keys])
+            self._db.commit()
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._touched.clear()
+            self._db.execute("DELETE FROM entries")
+            self._db.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+
+def resource_kind(url, params):
+    """Classify a request URL into one of the DEFAULT_TTLS resource kinds."""
+    params = params or {}
+    path = urlsplit(url).path
+    if 'key' not in params:
+        return 'amazing_fields'
+    if path.endswith('/pluginData') or 'pluginData' in params.get('urls', ''):
+        return 'plugin'
+    if '/lists/' in path or path.endswith('/lists'):
+        return 'list'
+    if '/boards/' in path:
+        return 'board'
+    return 'card'
+
+
+def resource_tags(url, params):
+    """Tags used for invalidation: 'card:<id>', 'board:<id>', 'list:<id>', plus the kind."""
+    text = urlsplit(url).path + ',' + (params or {}).get('urls', '')
+    tags = {resource_kind(url, params)}
+    for kind, value in _ID_PATTERN.findall(text):
+        if kind == 'checklists':
+            continue
+        tags.add(f"{kind[:-1]}:{value}")
+    return tags
+
+
+def entry_response(entry, url):
+    """Rebuild a requests.Response from a cache entry."""
+    response = requests.Response()
+    response.status_code = entry.status
+    response._content = entry.body
+    response.headers['Content-Type'] = entry.content_type
+    if entry.etag:
+        response.headers['ETag'] = entry.etag
+    response.url = url
+    response.encoding = 'utf-8'
+    response.from_cache = True
+    return response
+
+
+class ResponseCache:
+    def __init__(self, backend=None, ttls=None):
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.stats = {'hits': 0, 'misses': 0, 'revalidated': 0, 'evictions': 0, 'invalidations': 0}
+        self._lock = threading.Lock()
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.stats[name] += amount
+
+    @staticmethod
+    def make_key(url, params=None):
+        params = params or {}
+        public = sorted((k, v) for k, v in params.items() if k not in CREDENTIAL_PARAMS)
+        credentials = '|'.join(str(params.get(k, '')) for k in CREDENTIAL_PARAMS)
+        digest = hashlib.sha1(credentials.encode('utf-8')).hexdigest()[:12]
+        return f"{url}?{urlencode(public)}#{digest}"
+
+    def fetch(self, url, params, fetch):
+        """
+        Return a requests.Response for url+params, served from the cache when fresh.
+        fetch(extra_headers) performs the upstream request; it is only called on
+        a miss or to revalidate. Responses carry a from_cache attribute.
+        """
+        key, entry, hit = self._lookup(url, params)
+        if hit is not None:
+            return hit
+        extra_headers = {'If-None-Match': entry.etag} if entry is not None and entry.etag else {}
+        return self._store(key, entry, url, params, fetch(extra_headers))
+
+    async def fetch_async(self, url, params, fetch):
+        """fetch() for coroutines: fetch(extra_headers) is awaited on a miss or to revalidate."""
+        key, entry, hit = self._lookup(url, params)
+        if hit is not None:
+            return hit
+        extra_headers = {'If-None-Match': entry.etag} if entry is not None and entry.etag else {}
+        return self._store(key, entry, url, params, await fetch(extra_headers))
+
+    def _lookup(self, url, params):
+        """Return (key, cached entry or None, response if the entry is still fresh)."""
+        key = self.make_key(url, params)
+        entry = self.backend.get(key)
+        if entry is not None and entry.expires_at > time.time():
+            self._count('hits')
+            return key, entry, entry_response(entry, url)
+        return key, entry, None
+
+    def _store(self, key, entry, url, params, response):
+        """Record an upstream response (or a 304 revalidating entry) and return what to serve."""
+        kind = resource_kind(url, params)
+        expires_at = time.time() + self.ttls.get(kind, 0)
+
+        if response.status_code == 304 and entry is not None:
+            self._count('revalidated')
+            entry.expires_at = expires_at
+            self._count('evictions', self.backend.set(key, entry))
+            return entry_response(entry, url)
+
+        self._count('misses')
+        if response.status_code == 200 and self.ttls.get(kind, 0) > 0:
+            entry = CacheEntry(
+                response.status_code,
+                response.content,
+                response.headers.get('ETag'),
+                response.headers.get('Content-Type', 'application/json'),
+                expires_at,
+                resource_tags(url, params),
+            )
+            self._count('evictions', self.backend.set(key, entry))
+        response.from_cache = False
+        return response
+
+    def invalidate_card(self, card_id):
+        """Drop everything cached for a card, plus list/board payloads that embed cards."""
+        count = self.backend.delete_tagged({f"card:{card_id}", 'list', 'board'})
+        self._count('invalidations', count)
+        return count
+
+    def invalidate_board(self, board_id):
+        """Drop the board and every list/card payload cached for it."""
+        count = self.backend.delete_tagged({f"board:{board_id}", 'list', 'card', 'plugin', 'amazing_fields'})
+        self._count('invalidations', count)
+        return count
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats.update(entries=len(self.backend), bytes=self.backend.size, max_bytes=self.backend.max_bytes)
+        return stats
+
+
+def cache_from_env():
+    """Build the cache configured by CACHE_BACKEND (memory, sqlite or none)."""
+    backend_name = os.getenv('CACHE_BACKEND', 'memory').lower()
+    if backend_name == 'none':
+        return None
+    max_bytes = int(os.getenv('CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+    if backend_name == 'sqlite':
+        backend = SQLiteBackend(os.getenv('CACHE_PATH', 'cache.sqlite3'), max_bytes)
+    else:
+        backend = MemoryBackend(max_bytes)
+    ttls = {
+        kind: int(os.getenv(f'CACHE_TTL_{kind.upper()}', ttl))
+        for kind, ttl in DEFAULT_TTLS.items()
+    }
+    logger.info(f"Response cache enabled ({backend_name}, {max_bytes} bytes)")
+    return ResponseCache(backend, ttls)
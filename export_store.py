@@ -0,0 +1,274 @@
+"""
+Content-addressed storage for the generated vTiger CSV files.
+
+Export files are named after their card (or target) and a hash of their
+content, vtiger_import_<name>_<digest>.csv, so exporting an unchanged card
+again reuses the file already on disk instead of writing a new one. The store
+keeps an index of the files with their size, age and last use (a reuse or a
+download), and a sweeper removes files unused for longer than EXPORT_MAX_AGE
+seconds and then, least recently used first, files over EXPORT_MAX_BYTES in
+total. The digest doubles as a strong ETag when the files are served.
+"""
+import os
+import re
+import time
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+EXPORTS_DIR = os.path.join('static', 'exports')
+PREFIX = 'vtiger_import_'
+DIGEST_LENGTH = 16
+
+# vtiger_import_<name>_<16 hex digits>.csv; older exports carry a timestamp instead
+ADDRESSED_NAME = re.compile(r'^vtiger_import_.*_([0-9a-f]{%d})\.csv$' % DIGEST_LENGTH)
+
+
+def sanitize(name):
+    return ''.join(c if c.isalnum() else '_' for c in name)
+
+
+def content_digest(content):
+    return hashlib.sha256(content).hexdigest()[:DIGEST_LENGTH]
+
+
+class ExportEntry:
+    def __init__(self, filename, path, size, created, last_used, digest=None):
+        self.filename = filename
+        self.path = path
+        self.size = size
+        self.created = created
+        self.last_used = last_used
+        self.digest = digest
+
+    @property
+    def addressed(self):
+        """True if the file name carries the content digest (and the content never changes)."""
+        return ADDRESSED_NAME.match(self.filename) is not None
+
+    def to_dict(self, now=None):
+        now = now or time.time()
+        return {
+            'filename': self.filename,
+            'download_url': f"/download-file/{self.filename}",
+            'size': self.size,
+            'created_at': self.created,
+            'last_used_at': self.last_used,
+            'age': round(now - self.created, 1),
+        }
+
+
+class ExportWriter:
+    """
+    Writes an export chunk by chunk to a temporary file while hashing it;
+    commit() moves it to its content-addressed name, or drops it if a file
+    with the same content is already stored. With a tag the file is named
+    after the tag instead, so its name can be handed out before it is written.
+    """
+
+    def __init__(self, store, name, tag=None):
+        self.store = store
+        self.name = name
+        self.tag = tag
+        part_name = f"{PREFIX}{sanitize(name)}.{os.getpid()}.{threading.get_ident()}.part"
+        self.part_path = os.path.join(store.root, part_name)
+        self.entry = None
+        self._hash = hashlib.sha256()
+        self._file = None
+
+    def __enter__(self):
+        os.makedirs(self.store.root, exist_ok=True)
+        self._file = open(self.part_path, 'wb')
+        return self
+
+    def write(self, chunk):
+        data = chunk.encode('utf-8') if isinstance(chunk, str) else chunk
+        self._hash.update(data)
+        self._file.write(data)
+
+    def commit(self):
+        self._file.close()
+        digest = self._hash.hexdigest()[:DIGEST_LENGTH]
+        self.entry = self.store._add(self.name, digest, self.part_path, self.tag)
+        return self.entry
+
+    def __exit__(self, *exc):
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self.part_path):
+            os.remove(self.part_path)
+
+
+class ExportStore:
+    def __init__(self, root=EXPORTS_DIR, max_age=None, max_bytes=None, sweep_interval=300, min_age=60):
+        # Absolute, so entry paths do not depend on how Flask's send_file resolves relative ones
+        self.root = os.path.abspath(root)
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        # Files used this recently are never swept, so a fresh download link keeps working
+        self.min_age = min_age
+        self._lock = threading.Lock()
+        self._entries = None
+        self._last_sweep = 0.0
+        self.stats = {'writes': 0, 'reused': 0, 'swept': 0, 'swept_bytes': 0}
+
+    def _load(self):
+        if self._entries is not None:
+            return
+        self._entries = {}
+        if not os.path.isdir(self.root):
+            return
+        for item in os.scandir(self.root):
+            if item.is_file() and item.name.startswith(PREFIX) and item.name.endswith('.csv'):
+                stat = item.stat()
+                self._entries[item.name] = ExportEntry(item.name, item.path, stat.st_size, stat.st_mtime,
+                                                       stat.st_mtime)
+        logger.info(f"Indexed {len(self._entries)} export files in {self.root}")
+
+    def filename(self, name, tag):
+        """File name of the export stored under name and tag (its content digest, unless tagged)."""
+        return f"{PREFIX}{sanitize(name)}_{tag}.csv"
+
+    def _add(self, name, digest, part_path, tag=None):
+        filename = self.filename(name, tag or digest)
+        path = os.path.join(self.root, filename)
+        now = time.time()
+        with self._lock:
+            self._load()
+            entry = self._entries.get(filename)
+            if entry is not None and os.path.exists(path):
+                os.utime(path, (now, now))
+                entry.last_used = now
+                self.stats['reused'] += 1
+                return entry
+            os.replace(part_path, path)
+            entry = self._entries[filename] = ExportEntry(filename, path, os.path.getsize(path), now, now, digest)
+            self.stats['writes'] += 1
+        self.maybe_sweep()
+        return entry
+
+    def writer(self, name, tag=None):
+        """Context manager for writing an export named after name (and tag); see ExportWriter."""
+        return ExportWriter(self, name, tag)
+
+    def put(self, name, content, tag=None):
+        """Store content (str or bytes) under name (and tag) and return its ExportEntry."""
+        with self.writer(name, tag) as writer:
+            writer.write(content)
+            return writer.commit()
+
+    def get(self, filename):
+        """The stored export with this file name, or None."""
+        with self._lock:
+            self._load()
+            entry = self._entries.get(filename)
+            if entry is not None and not os.path.exists(entry.path):
+                del self._entries[filename]
+                return None
+            return entry
+
+    def touch(self, entry):
+        """Mark entry as just used, so the size-cap sweep keeps it over older files."""
+        now = time.time()
+        try:
+            os.utime(entry.path, (now, now))
+        except FileNotFoundError:
+            return
+        entry.last_used = now
+
+    def etag(self, entry):
+        """Content digest of entry; hashed from disk once for files stored before content addressing."""
+        if entry.digest is None:
+            hasher = hashlib.sha256()
+            with open(entry.path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 16), b''):
+                    hasher.update(block)
+            entry.digest = hasher.hexdigest()[:DIGEST_LENGTH]
+        return entry.digest
+
+    def sweep(self, now=None):
+        """
+        Remove files unused for longer than max_age, then the least recently
+        used ones until the total size is under max_bytes.
+        """
+        now = now or time.time()
+        removed = []
+        with self._lock:
+            self._load()
+            entries = sorted(self._entries.values(), key=lambda entry: entry.last_used)
+            total = sum(entry.size for entry in entries)
+            for entry in entries:
+                idle = now - entry.last_used
+                if idle < self.min_age:
+                    break
+                expired = self.max_age is not None and idle > self.max_age
+                over_cap = self.max_bytes is not None and total > self.max_bytes
+                if not expired and not over_cap:
+                    continue
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+                del self._entries[entry.filename]
+                total -= entry.size
+                removed.append(entry)
+            self._last_sweep = now
+            self.stats['swept'] += len(removed)
+            self.stats['swept_bytes'] += sum(entry.size for entry in removed)
+        if removed:
+            logger.info(f"Export sweep removed {len(removed)} files ({sum(entry.size for entry in removed)} bytes)")
+        return {'removed': [entry.filename for entry in removed], 'freed_bytes': sum(entry.size for entry in removed)}
+
+    def maybe_sweep(self):
+        """Sweep if the last sweep was more than sweep_interval seconds ago."""
+        if time.time() - self._last_sweep >= self.sweep_interval:
+            self.sweep()
+
+    def snapshot(self):
+        now = time.time()
+        with self._lock:
+            self._load()
+            entries = sorted(self._entries.values(), key=lambda entry: -entry.last_used)
+            return {
+                'files': len(entries),
+                'bytes': sum(entry.size for entry in entries),
+                'max_age': self.max_age,
+                'max_bytes': self.max_bytes,
+                'stats': dict(self.stats),
+                'exports': [entry.to_dict(now) for entry in entries],
+            }
+
+
+def _optional_number(name, default):
+    value = os.getenv(name, default)
+    return int(value) if value and int(value) > 0 else None
+
+
+def export_store_from_env():
+    """
+    ExportStore configured from EXPORT_MAX_AGE (seconds, default 30 days),
+    EXPORT_MAX_BYTES (default 1 GB) and EXPORT_SWEEP_INTERVAL (seconds);
+    0 disables a limit.
+    """
+    return ExportStore(
+        EXPORTS_DIR,
+        max_age=_optional_number('EXPORT_MAX_AGE', str(30 * 24 * 3600)),
+        max_bytes=_optional_number('EXPORT_MAX_BYTES', str(1024 ** 3)),
+        sweep_interval=int(os.getenv('EXPORT_SWEEP_INTERVAL', '300')),
+    )
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_export_store():
+    """Return the process-wide ExportStore."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = export_store_from_env()
+        return _store
@@ -0,0 +1,89 @@
+"""
+Bounded-concurrency fan-out used for the per-card Trello requests.
+"""
+import os
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from metrics import in_current_context
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_IN_FLIGHT = 8
+
+
+def get_max_in_flight():
+    """Read the max number of concurrent upstream calls from TRELLO_MAX_IN_FLIGHT."""
+    try:
+        return max(1, int(os.getenv('TRELLO_MAX_IN_FLIGHT', DEFAULT_MAX_IN_FLIGHT)))
+    except ValueError:
+        logger.warning("Invalid TRELLO_MAX_IN_FLIGHT value, using default")
+        return DEFAULT_MAX_IN_FLIGHT
+
+
+def fan_out(func, items, max_in_flight=None):
+    """
+    Call func(item) for every item with at most max_in_flight calls running at once.
+    Results are returned in the same order as items. func is expected to handle
+    its own errors and return a fallback value.
+    """
+    items = list(items)
+    if not items:
+        return []
+
+    workers = min(max_in_flight or get_max_in_flight(), len(items))
+    if workers <= 1:
+        return [func(item) for item in items]
+
+    # Worker threads run in the caller's context so upstream calls count towards its request timings
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='trello-fetch') as pool:
+        return list(pool.map(in_current_context(func), items))
+
+
+def fan_out_iter(func, items, max_in_flight=None):
+    """Like fan_out, but yields each result as soon as its call finishes (completion order)."""
+    items = list(items)
+    if not items:
+        return
+
+    workers = min(max_in_flight or get_max_in_flight(), len(items))
+    if workers <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    func = in_current_context(func)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='trello-fetch') as pool:
+        for future in as_completed([pool.submit(func, item) for item in items]):
+            yield future.result()
+
+
+async def fan_out_async(func, items, max_in_flight=None):
+    """
+    Awaitable fan-out: await func(item) for every item with at most
+    max_in_flight coroutines in flight. Results keep the order of items.
+    """
+    items = list(items)
+    if not items:
+        return []
+
+    semaphore = asyncio.Semaphore(max_in_flight or get_max_in_flight())
+
+    async def bounded(item):
+        async with semaphore:
+            return await func(item)
+
+    return await asyncio.gather(*(bounded(item) for item in items))
+
+
+async def fan_out_async_iter(func, items, max_in_flight=None):
+    """Like fan_out_async, but yields each result as soon as it is ready (completion order)."""
+    semaphore = asyncio.Semaphore(max_in_flight or get_max_in_flight())
+
+    async def bounded(item):
+        async with semaphore:
+            return await func(item)
+
+    for next_done in asyncio.as_completed([bounded(item) for item in items]):
+        yield await next_done
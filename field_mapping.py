@@ -0,0 +1,183 @@
+"""
+Declarative mapping from Trello card data to vTiger columns.
+
+The mapping (field_mapping.json by default, or VTIGER_MAPPING_PATH) lists, for
+each vTiger column, its sources in order of precedence:
+
+    {"source": "card", "field": "name"}                 card attribute
+    {"source": "checklist", "name": "DNI"}              last item of a checklist
+    {"source": "custom_field", "id": "<idCustomField>"} Trello customFieldItems
+    {"source": "amazing_field", "name": "Importe"}      decoded Amazing Fields
+
+The first source with a non-empty value wins. Checklist and Amazing Fields
+names are matched ignoring case and accents. The mapping is compiled once into
+dict lookups so each card is transformed in a single pass.
+
+An optional "validate" object names the columns whose values are checked and
+normalized before export, e.g. {"email1": "email", "bill_code": "postal_code"};
+see row_validation.py. A rule that only applies to the values of one source
+goes on that source instead, e.g. {"source": "checklist", "name": "DNI",
+"validate": "dni"} for a column that otherwise takes an account number.
+"""
+import os
+import json
+import logging
+import unicodedata
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAPPING_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'field_mapping.json')
+
+SOURCES = ('card', 'checklist', 'custom_field', 'amazing_field')
+
+
+@lru_cache(maxsize=4096)
+def normalize_key(name):
+    """Lower-case, strip accents and collapse whitespace: 'Código  Postal' -> 'codigo postal'."""
+    decomposed = unicodedata.normalize('NFKD', name)
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(stripped.casefold().split())
+
+
+def extract_value_from_checklist_item(item_text):
+    """Extract value from checklist item text, assuming format like 'Field: Value'."""
+    if ':' in item_text:
+        return item_text.split(':', 1)[1].strip()
+    return item_text.strip()
+
+
+def custom_field_value(item):
+    """Plain value of a Trello customFieldItem (text, number, date, checkbox or list option)."""
+    value = item.get('value')
+    if value:
+        for kind in ('text', 'number', 'date', 'checked'):
+            if kind in value:
+                return str(value[kind])
+    return item.get('idValue') or ''
+
+
+class Row(dict):
+    """
+    A vTiger row; card_id is the Trello card it was built from and sources
+    maps each filled column to the index of the source its value came from.
+    """
+    __slots__ = ('card_id', 'sources')
+
+
+class FieldMapping:
+    """A mapping compiled into per-source dispatch tables."""
+
+    def __init__(self, headers, columns, validate=None):
+        self.headers = list(headers)
+        self.validator = None
+        self.card_fields = {}
+        self.checklists = {}
+        self.custom_fields = {}
+        self.amazing_fields = {}
+        self.source_rules = {}
+        self._checklist_lookup = {}
+
+        for column, sources in columns.items():
+            if column not in self.headers:
+                raise ValueError(f"Mapped column '{column}' is not in headers")
+            for priority, source in enumerate(sources):
+                kind = source.get('source')
+                if kind == 'card':
+                    table, key = self.card_fields, source['field']
+                elif kind == 'checklist':
+                    table, key = self.checklists, normalize_key(source['name'])
+                elif kind == 'custom_field':
+                    table, key = self.custom_fields, source['id']
+                elif kind == 'amazing_field':
+                    table, key = self.amazing_fields, normalize_key(source['name'])
+                else:
+                    raise ValueError(f"Unknown source '{kind}' for column '{column}', expected one of {SOURCES}")
+                table.setdefault(key, []).append((column, priority))
+                if source.get('validate'):
+                    self.source_rules.setdefault(column, {})[priority] = source['validate']
+
+        if validate:
+            unknown = [column for column in validate if column not in self.headers]
+            if unknown:
+                raise ValueError(f"Validated columns not in headers: {', '.join(unknown)}")
+        if validate or self.source_rules:
+            from row_validation import RowValidator
+            self.validator = RowValidator(validate or {}, self.source_rules)
+
+    def _checklist_targets(self, name):
+        """Targets for a raw checklist name, memoized so each name is normalized once."""
+        targets = self._checklist_lookup.get(name)
+        if targets is None:
+            targets = self._checklist_lookup[name] = self.checklists.get(normalize_key(name), ())
+        return targets
+
+    def transform(self, card_data):
+        """Build the vTiger row (a dict keyed by headers) for one card."""
+        row = Row.fromkeys(self.headers, '')
+        # Lower priority wins; on a tie the later source (e.g. a repeated checklist) wins.
+        best = {}
+
+        for field, targets in self.card_fields.items():
+            value = card_data.get(field)
+            if value:
+                for column, priority in targets:
+                    if priority <= best.get(column, priority):
+                        best[column] = priority
+                        row[column] = value
+
+        if self.checklists:
+            lookup = self._checklist_lookup
+            for checklist in card_data.get('checklists') or ():
+                name = checklist['name']
+                targets = lookup.get(name)
+                if targets is None:
+                    targets = self._checklist_targets(name)
+                items = checklist['checkItems']
+                if targets and items:
+                    value = extract_value_from_checklist_item(items[-1]['name'])
+                    if value:
+                        for column, priority in targets:
+                            if priority <= best.get(column, priority):
+                                best[column] = priority
+                                row[column] = value
+
+        if self.custom_fields:
+            for item in card_data.get('customFieldItems') or ():
+                targets = self.custom_fields.get(item.get('idCustomField'))
+                value = custom_field_value(item) if targets else None
+                if value:
+                    for column, priority in targets:
+                        if priority <= best.get(column, priority):
+                            best[column] = priority
+                            row[column] = value
+
+        if self.amazing_fields:
+            amazing_fields = card_data.get('customFields')
+            if isinstance(amazing_fields, dict):
+                amazing_fields = amazing_fields.get('fields', amazing_fields)
+            if isinstance(amazing_fields, dict):
+                for name, value in amazing_fields.items():
+                    targets = self.amazing_fields.get(normalize_key(name))
+                    value = str(value) if targets and value is not None else None
+                    if value:
+                        for column, priority in targets:
+                            if priority <= best.get(column, priority):
+                                best[column] = priority
+                                row[column] = value
+
+        row.card_id = card_data.get('id')
+        row.sources = best
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Row for card %s: %s", card_data.get('id'), row)
+        return row
+
+
+def load_mapping(path=None):
+    """Load and compile a mapping file (VTIGER_MAPPING_PATH or field_mapping.json)."""
+    path = path or os.getenv('VTIGER_MAPPING_PATH', DEFAULT_MAPPING_PATH)
+    with open(path, encoding='utf-8') as f:
+        config = json.load(f)
+    mapping = FieldMapping(config['headers'], config['columns'], config.get('validate'))
+    logger.info(f"Loaded vTiger field mapping from {path}: {len(config['columns'])} columns")
+    return mapping
@@ -0,0 +1,203 @@
+"""
+Background jobs for long-running exports.
+
+Jobs are persisted in a small SQLite store so they survive a restart (queued
+and interrupted jobs are re-run on startup), run on a local worker pool, report
+progress while they work and can be cancelled.
+"""
+import os
+import json
+import time
+import uuid
+import logging
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+PROGRESS_FIELDS = ('total', 'fetched', 'transformed', 'written')
+
+
+class JobCancelled(Exception):
+    """Raised inside a job runner when the job has been cancelled."""
+
+
+class JobStore:
+    def __init__(self, path='jobs.sqlite3'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT,
+                params TEXT,
+                status TEXT,
+                total INTEGER,
+                fetched INTEGER DEFAULT 0,
+                transformed INTEGER DEFAULT 0,
+                written INTEGER DEFAULT 0,
+                result TEXT,
+                error TEXT,
+                cancel_requested INTEGER DEFAULT 0,
+                created_at REAL,
+                started_at REAL,
+                finished_at REAL
+            )
+        """)
+        self._db.commit()
+
+    def create(self, kind, params):
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, kind, params, status, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(params), QUEUED, time.time())
+            )
+            self._db.commit()
+        return job_id
+
+    def update(self, job_id, **fields):
+        if 'result' in fields:
+            fields['result'] = json.dumps(fields['result'])
+        columns = ', '.join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._db.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+            self._db.commit()
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['params'] = json.loads(job['params'])
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    def unfinished(self):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY created_at", (QUEUED, RUNNING)
+            ).fetchall()
+        return [row['id'] for row in rows]
+
+
+class Progress:
+    """Progress reporter handed to job runners; writes to the store at most every interval seconds."""
+
+    def __init__(self, store, job_id, interval=0.5):
+        self.store = store
+        self.job_id = job_id
+        self.interval = interval
+        self.counts = dict.fromkeys(PROGRESS_FIELDS, 0)
+        self.counts['total'] = None
+        self._flushed_at = 0.0
+
+    def update(self, **counts):
+        self.counts.update(counts)
+        now = time.monotonic()
+        if now - self._flushed_at >= self.interval:
+            self.flush()
+            self._flushed_at = now
+            if self.store.get(self.job_id)['cancel_requested']:
+                raise JobCancelled()
+
+    def flush(self):
+        self.store.update(self.job_id, **self.counts)
+
+
+class JobQueue:
+    def __init__(self, store, runners, max_workers=2):
+        """runners maps a job kind to runner(params, progress) -> result dict."""
+        self.store = store
+        self.runners = runners
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='export-job')
+
+    def resume(self):
+        """Re-enqueue jobs that were queued or running when the process stopped."""
+        job_ids = self.store.unfinished()
+        for job_id in job_ids:
+            if self.store.get(job_id)['cancel_requested']:
+                self.store.update(job_id, status=CANCELLED, finished_at=time.time())
+                continue
+            self.store.update(job_id, status=QUEUED)
+            self._executor.submit(self._run, job_id)
+        if job_ids:
+            logger.info(f"Resumed {len(job_ids)} unfinished jobs")
+
+    def submit(self, kind, params):
+        if kind not in self.runners:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = self.store.create(kind, params)
+        self._executor.submit(self._run, job_id)
+        logger.info(f"Queued {kind} job {job_id}")
+        return job_id
+
+    def cancel(self, job_id):
+        """Cancel a job. Queued jobs stop immediately, running ones at their next progress update."""
+        job = self.store.get(job_id)
+        if job is None or job['status'] in FINISHED_STATES:
+            return job
+        if job['status'] == QUEUED:
+            self.store.update(job_id, cancel_requested=1, status=CANCELLED, finished_at=time.time())
+        else:
+            self.store.update(job_id, cancel_requested=1)
+        return self.store.get(job_id)
+
+    def _run(self, job_id):
+        job = self.store.get(job_id)
+        if job is None or job['status'] != QUEUED:
+            return
+        progress = Progress(self.store, job_id)
+        self.store.update(job_id, status=RUNNING, started_at=time.time(), error=None)
+        try:
+            result = self.runners[job['kind']](job['params'], progress)
+        except JobCancelled:
+            progress.flush()
+            self.store.update(job_id, status=CANCELLED, finished_at=time.time())
+            logger.info(f"Job {job_id} cancelled")
+        except Exception as e:
+            logger.exception(f"Job {job_id} failed")
+            progress.flush()
+            self.store.update(job_id, status=FAILED, error=str(e), finished_at=time.time())
+        else:
+            progress.flush()
+            self.store.update(job_id, status=DONE, result=result, finished_at=time.time())
+            logger.info(f"Job {job_id} finished")
+
+
+def job_status(job):
+    """Public view of a job: status, progress counts, ETA and result."""
+    status = {
+        'id': job['id'],
+        'kind': job['kind'],
+        'status': job['status'],
+        'progress': {name: job[name] for name in PROGRESS_FIELDS},
+        'eta_seconds': None,
+        'error': job['error'],
+    }
+    if job['status'] == RUNNING and job['total'] and job['written'] and job['started_at']:
+        elapsed = time.time() - job['started_at']
+        status['eta_seconds'] = round(elapsed / job['written'] * (job['total'] - job['written']), 1)
+    if job['status'] == DONE and job['result']:
+        status.update(job['result'])
+    return status
+
+
+def job_queue_from_env(runners):
+    """Create the job queue configured by JOBS_DB and EXPORT_WORKERS and resume pending jobs."""
+    store = JobStore(os.getenv('JOBS_DB', 'jobs.sqlite3'))
+    queue = JobQueue(store, runners, max_workers=int(os.getenv('EXPORT_WORKERS', '2')))
+    queue.resume()
+    return queue
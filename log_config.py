@@ -0,0 +1,71 @@
+"""
+Logging setup.
+
+LOG_LEVEL sets the level (INFO by default) and LOG_FORMAT=json switches to
+structured logging, one JSON object per line with any extra fields of the
+record (e.g. the per-request summary under "request"). Records go through a
+QueueHandler and are written by a QueueListener thread, so request threads
+never block on the console or a log file; LOG_QUEUE=0 writes them inline.
+Set LOG_REQUESTS=0 to drop the per-request summary records.
+"""
+import os
+import json
+import queue
+import atexit
+import logging
+import datetime
+from logging.handlers import QueueHandler, QueueListener
+
+# Attributes every LogRecord has; anything else on a record came from extra=
+STANDARD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in STANDARD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def configure_logging():
+    """Configure the root logger from LOG_LEVEL, LOG_FORMAT, LOG_QUEUE and LOG_REQUESTS."""
+    global _listener
+    root = logging.getLogger()
+    if root.handlers:
+        return
+    root.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+    if os.getenv('LOG_REQUESTS', '1') == '0':
+        logging.getLogger('requests.summary').setLevel(logging.WARNING)
+
+    handler = logging.StreamHandler()
+    if os.getenv('LOG_FORMAT', 'text').lower() == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+
+    if os.getenv('LOG_QUEUE', '1') != '0':
+        log_queue = queue.SimpleQueue()
+        _listener = QueueListener(log_queue, handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+        handler = QueueHandler(log_queue)
+    root.addHandler(handler)
+
+
+def stop_logging():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,325 @@
+"""
+Timing spans and counters, exposed in Prometheus text format at /metrics.
+
+Every upstream call is timed under a category (board, lists, cards, card,
+checklists, customFields, customFieldItems, pluginData, amazing_fields, ...)
+with its status, 429s and connection errors counted, and response cache hits
+and misses counted per category. Local work (CSV generation, file writes) is
+recorded as named spans. Spans are also collected per request; with
+SERVER_TIMING=1 each response carries them in a Server-Timing header, e.g.
+
+    Server-Timing: board;dur=48.2;desc="1 call", cards;dur=51.0;desc="1 call", total;dur=612.4
+"""
+import os
+import time
+import bisect
+import logging
+import threading
+import contextlib
+import contextvars
+from urllib.parse import urlsplit
+
+from flask import g, request
+
+logger = logging.getLogger(__name__)
+
+# One summary record per request: route, status, duration, upstream calls and annotations
+request_logger = logging.getLogger('requests.summary')
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+TRELLO_RESOURCES = ('boards', 'lists', 'cards', 'checklists', 'batch', 'members', 'actions')
+
+
+def _label_text(labels, values):
+    return ','.join(f'{name}="{str(value)}"' for name, value in zip(labels, values))
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.type = 'counter'
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_values, value in values:
+            yield self.name, _label_text(self.labels, label_values), value
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.type = 'histogram'
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, *label_values):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += seconds
+            series[2] += 1
+
+    def samples(self):
+        with self._lock:
+            series = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items())
+        for label_values, (counts, total, count) in series:
+            labels = _label_text(self.labels, label_values)
+            prefix = labels + ',' if labels else ''
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f'{self.name}_bucket', f'{prefix}le="{bound}"', cumulative
+            yield f'{self.name}_bucket', f'{prefix}le="+Inf"', count
+            yield f'{self.name}_sum', labels, round(total, 6)
+            yield f'{self.name}_count', labels, count
+
+
+class Gauge:
+    """Value(s) read at scrape time from collect() -> {label values tuple: value}."""
+
+    def __init__(self, name, help, labels=(), collect=None):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.type = 'gauge'
+        self.collect = collect
+
+    def samples(self):
+        try:
+            values = self.collect() or {}
+        except Exception:
+            logger.exception(f"Error collecting {self.name}")
+            return
+        for label_values, value in sorted(values.items()):
+            yield self.name, _label_text(self.labels, label_values), value
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{{{labels}}} {value}' if labels else f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+UPSTREAM_DURATION = registry.register(Histogram(
+    'trello_upstream_request_duration_seconds', 'Upstream request latency by category', ('category',)))
+UPSTREAM_REQUESTS = registry.register(Counter(
+    'trello_upstream_requests_total', 'Upstream requests by category and status', ('category', 'status')))
+UPSTREAM_ERRORS = registry.register(Counter(
+    'trello_upstream_errors_total', 'Upstream connection errors and 5xx responses by category', ('category',)))
+UPSTREAM_THROTTLED = registry.register(Counter(
+    'trello_upstream_throttled_total', 'Upstream 429 responses by category', ('category',)))
+CACHE_LOOKUPS = registry.register(Counter(
+    'trello_cache_lookups_total', 'Response cache lookups by category and result (hit or miss)',
+    ('category', 'result')))
+SPAN_DURATION = registry.register(Histogram(
+    'app_span_duration_seconds', 'Duration of local work (CSV generation, file writes)', ('span',)))
+HTTP_DURATION = registry.register(Histogram(
+    'http_request_duration_seconds', 'Time to build a response, by route, method and status',
+    ('route', 'method', 'status')))
+
+
+def upstream_category(url, params=None):
+    """
+    Category of an upstream call: the Amazing Fields API, or the Trello
+    resource it reads ('board', 'lists', 'cards', 'checklists', 'pluginData',
+    ...). Batch calls are categorized by the resource of the URLs they carry.
+    """
+    params = params or {}
+    if 'key' not in params:
+        return 'amazing_fields'
+    parts = [part for part in urlsplit(url).path.split('/') if part]
+    for index, part in enumerate(parts):
+        if part in TRELLO_RESOURCES:
+            parts = parts[index:]
+            break
+    else:
+        return 'other'
+    if parts[0] == 'batch':
+        first = params.get('urls', '').split(',')[0]
+        return upstream_category(first, {'key': True}) if first else 'batch'
+    if len(parts) >= 3:
+        return parts[2]
+    if len(parts) == 2:
+        return parts[0][:-1] if parts[0] in ('boards', 'cards') else parts[0]
+    return parts[0]
+
+
+class RequestTimings:
+    """Time and call count per span name for one incoming request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = {}
+        self.fields = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            total, count = self.spans.get(name, (0.0, 0))
+            self.spans[name] = (total + seconds, count + 1)
+
+    def header(self):
+        """Server-Timing header value; spans that ran concurrently can add up to more than total."""
+        with self._lock:
+            spans = sorted(self.spans.items(), key=lambda item: -item[1][0])
+        parts = [
+            f'{name};dur={total * 1000:.1f};desc="{count} call{"s" if count != 1 else ""}"'
+            for name, (total, count) in spans
+        ]
+        parts.append(f'total;dur={(time.perf_counter() - self.started) * 1000:.1f}')
+        return ', '.join(parts)
+
+    def summary(self, route, method, status, duration):
+        with self._lock:
+            spans = {name: {'ms': round(total * 1000, 1), 'calls': count} for name, (total, count) in self.spans.items()}
+            fields = dict(self.fields)
+        return dict(fields, route=route, method=method, status=status, duration_ms=round(duration * 1000, 1),
+                    spans=spans)
+
+
+_current = contextvars.ContextVar('request_timings', default=None)
+
+
+def begin_request():
+    """Start collecting spans for the request running in the current context."""
+    timings = RequestTimings()
+    _current.set(timings)
+    return timings
+
+
+def finish_request(timings, route, method, status):
+    """
+    Record the request duration and log its summary record; returns the
+    Server-Timing value when SERVER_TIMING=1.
+    """
+    duration = time.perf_counter() - timings.started
+    HTTP_DURATION.observe(duration, route, method, status)
+    _current.set(None)
+    if request_logger.isEnabledFor(logging.INFO):
+        summary = timings.summary(route, method, status, duration)
+        request_logger.info('%s %s %s %.1fms %s', method, route, status, summary['duration_ms'],
+                            ' '.join(f"{key}={value}" for key, value in timings.fields.items()),
+                            extra={'request': summary})
+    if os.getenv('SERVER_TIMING', '0') == '1':
+        return timings.header()
+    return None
+
+
+def annotate(**fields):
+    """Add fields (card counts, Trello requests, ...) to the current request's summary record."""
+    timings = _current.get()
+    if timings is not None:
+        timings.fields.update(fields)
+
+
+def _add_to_request(name, seconds):
+    timings = _current.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+def observe_upstream(category, seconds, status):
+    """Record one upstream call; status is the HTTP status or 'error' for a connection error."""
+    UPSTREAM_DURATION.observe(seconds, category)
+    UPSTREAM_REQUESTS.inc(category, status)
+    if status == 'error' or status >= 500:
+        UPSTREAM_ERRORS.inc(category)
+    elif status == 429:
+        UPSTREAM_THROTTLED.inc(category)
+    _add_to_request(category, seconds)
+
+
+def observe_cache(category, hit):
+    CACHE_LOOKUPS.inc(category, 'hit' if hit else 'miss')
+
+
+def observe_span(name, seconds):
+    SPAN_DURATION.observe(seconds, name)
+    _add_to_request(name, seconds)
+
+
+@contextlib.contextmanager
+def span(name):
+    """Time the enclosed block as one observation of span name."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_span(name, time.perf_counter() - started)
+
+
+class SpanTotal:
+    """
+    Adds up many short sections (one per row, one per chunk written) and
+    records them as a single span observation when done.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.elapsed = 0.0
+        self._started = None
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed += time.perf_counter() - self._started
+
+    def record(self):
+        observe_span(self.name, self.elapsed)
+
+
+def in_current_context(func):
+    """Wrap func so calls from worker threads run in (a copy of) the caller's context."""
+    context = contextvars.copy_context()
+    return lambda *args: context.copy().run(func, *args)
+
+
+def init_metrics(app):
+    """Time every request of a Flask app and add Server-Timing headers when SERVER_TIMING=1."""
+    @app.before_request
+    def _begin():
+        g.request_timings = begin_request()
+
+    @app.after_request
+    def _finish(response):
+        timings = g.pop('request_timings', None)
+        if timings is not None:
+            route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            header = finish_request(timings, route, request.method, response.status_code)
+            if header:
+                response.headers['Server-Timing'] = header
+        return response
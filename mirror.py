@@ -0,0 +1,136 @@
+"""
+In-memory mirror of the Factura list kept current by Trello webhooks.
+
+The mirror is seeded by one full load and then updated from webhook actions:
+only the card an action touches is re-fetched, and reads return the
+prebuilt card list without calling Trello.
+"""
+import hmac
+import base64
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Actions after which the card may now be in the Factura list.
+CARD_CREATE_ACTIONS = {'createCard', 'copyCard', 'convertToCardFromCheckItem', 'moveCardToBoard', 'emailCard'}
+
+# Actions that change a card's checklists or custom fields.
+CARD_CONTENT_ACTIONS = {
+    'addChecklistToCard', 'removeChecklistFromCard', 'updateChecklist',
+    'createCheckItem', 'updateCheckItem', 'deleteCheckItem', 'updateCheckItemStateOnCard',
+    'updateCustomFieldItem',
+}
+
+CARD_REMOVE_ACTIONS = {'deleteCard', 'moveCardFromBoard'}
+
+
+def verify_signature(body, callback_url, secret, signature):
+    """Check Trello's X-Trello-Webhook header: base64(HMAC-SHA1(secret, body + callbackURL))."""
+    if not secret or not signature:
+        return False
+    digest = hmac.new(secret.encode('utf-8'), body + callback_url.encode('utf-8'), hashlib.sha1).digest()
+    return hmac.compare_digest(base64.b64encode(digest).decode('ascii'), signature)
+
+
+class BoardMirror:
+    def __init__(self, fetch_card, enabled=False):
+        """fetch_card(card_id) returns a fresh card in the /board-data shape."""
+        self.fetch_card = fetch_card
+        self.enabled = enabled
+        self.list_id = None
+        self.stats = {'actions': 0, 'refetched': 0, 'removed': 0, 'ignored': 0}
+        self._cards = {}
+        self._card_list = []
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self.enabled and self.list_id is not None
+
+    def seed(self, factura_list, cards):
+        """Replace the mirror contents with the result of a full load."""
+        with self._lock:
+            self.list_id = factura_list['id']
+            self._cards = {card['id']: card for card in cards}
+            self._card_list = list(self._cards.values())
+        logger.info(f"Board mirror seeded with {len(cards)} cards")
+
+    def cards(self):
+        return self._card_list
+
+    def get_card(self, card_id):
+        return self._cards.get(card_id)
+
+    def _store(self, card):
+        with self._lock:
+            self._cards[card['id']] = card
+            self._card_list = list(self._cards.values())
+
+    def _remove(self, card_id):
+        with self._lock:
+            if self._cards.pop(card_id, None) is None:
+                return False
+            self._card_list = list(self._cards.values())
+        self.stats['removed'] += 1
+        return True
+
+    def _refetch(self, card_id):
+        card = self.fetch_card(card_id)
+        self.stats['refetched'] += 1
+        if card.get('closed') or card.get('idList') != self.list_id:
+            self._remove(card_id)
+            return 'removed'
+        self._store(card)
+        return 'updated'
+
+    def _card_for_checklist(self, checklist_id):
+        for card in self._card_list:
+            if checklist_id in card.get('idChecklists', []):
+                return card['id']
+        return None
+
+    def apply_action(self, action):
+        """
+        Apply one webhook action to the mirror. Returns 'updated', 'removed'
+        or 'ignored'.
+        """
+        if not self.ready:
+            return 'ignored'
+        self.stats['actions'] += 1
+        action_type = action.get('type')
+        data = action.get('data', {})
+        card_id = data.get('card', {}).get('id')
+
+        if action_type in CARD_CREATE_ACTIONS:
+            if data.get('list', {}).get('id') == self.list_id:
+                return self._refetch(card_id)
+
+        elif action_type in CARD_REMOVE_ACTIONS:
+            if card_id and self._remove(card_id):
+                return 'removed'
+
+        elif action_type == 'updateCard':
+            if 'listAfter' in data:
+                if data['listAfter'].get('id') == self.list_id:
+                    return self._refetch(card_id)
+                if self._remove(card_id):
+                    return 'removed'
+            elif card_id in self._cards:
+                if data.get('card', {}).get('closed'):
+                    self._remove(card_id)
+                    return 'removed'
+                return self._refetch(card_id)
+
+        elif action_type in CARD_CONTENT_ACTIONS:
+            if not card_id and 'checklist' in data:
+                card_id = self._card_for_checklist(data['checklist'].get('id'))
+            if card_id in self._cards:
+                return self._refetch(card_id)
+
+        self.stats['ignored'] += 1
+        return 'ignored'
+
+    def snapshot(self):
+        return dict(self.stats, enabled=self.enabled, ready=self.ready, cards=len(self._card_list))
@@ -0,0 +1,63 @@
+"""
+Pre-warm the Factura list: load every card with its checklists and custom
+fields from Trello and write the snapshot the app serves /board-data from
+at startup (BOARD_SNAPSHOT=1, see snapshot.py).
+
+    python prewarm.py
+    python prewarm.py --output snapshots/factura.json.gz --list Factura
+    python prewarm.py --every 300    # keep refreshing, e.g. as a sidecar next to several workers
+
+Credentials and the board come from .env like the app; the file is replaced
+atomically, so a running app picks up the new snapshot on its next refresh.
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+
+from dotenv import load_dotenv
+
+from board_loader import BoardLoader
+from snapshot import DEFAULT_SNAPSHOT_PATH, build_snapshot, write_snapshot
+
+logger = logging.getLogger('prewarm')
+
+
+def prewarm(args):
+    start = time.perf_counter()
+    loader = BoardLoader(os.getenv('TRELLO_API_URL', 'https://api.trello.com/1'),
+                         os.getenv('TRELLO_API_KEY'), os.getenv('TRELLO_API_TOKEN'))
+    snapshot = build_snapshot(loader, args.board_id, args.list)
+    size = write_snapshot(args.output, snapshot)
+    logger.info(f"Wrote {args.output}: {len(snapshot.cards)} cards from '{snapshot.factura_list['name']}', "
+                f"{size} bytes, {loader.request_count} Trello requests in {time.perf_counter() - start:.1f}s")
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', default=os.getenv('SNAPSHOT_PATH', DEFAULT_SNAPSHOT_PATH))
+    parser.add_argument('--board-id', default=os.getenv('TRELLO_BOARD_ID'))
+    parser.add_argument('--list', default='Factura', help='list to load (case-insensitive substring match)')
+    parser.add_argument('--every', type=float, default=0, help='refresh every this many seconds instead of once')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    if not args.board_id:
+        parser.error('a board is required (--board-id or TRELLO_BOARD_ID)')
+
+    while True:
+        try:
+            prewarm(args)
+        except Exception:
+            logger.exception("Could not pre-warm the board snapshot")
+            if not args.every:
+                sys.exit(1)
+        if not args.every:
+            return
+        time.sleep(args.every)
+
+
+if __name__ == '__main__':
+    main()
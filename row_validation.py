@@ -0,0 +1,280 @@
+"""
+Validation and normalization of vTiger rows before they are exported.
+
+The field mapping names the columns to check ("validate" in
+field_mapping.json) and how:
+
+    email        syntax check; 'mailto:' and surrounding spaces dropped, domain lower-cased
+    postal_code  Spanish postal code: 5 digits with a province prefix 01-52 ('28.001' -> '28001',
+                 '8001' -> '08001')
+    dni          DNI/NIE control letter ('12345678-z' -> '12345678Z'); other IDs (CIF, passport)
+                 pass through unchanged. A column that also takes account numbers should only
+                 check the values of its DNI source (see field_mapping.py)
+    province     looked up by normalized name in a table of the 52 provinces and their usual
+                 spellings ('gerona', 'Girona', 'GIRONA' -> 'Girona'); filled from the postal
+                 code when empty
+
+Rows are validated in batches, one column at a time: the distinct values of
+a column in the batch are normalized once and memoized for the whole export,
+so the provinces and postal codes repeated across a large board cost a dict
+lookup each. A row with any invalid value is not exported;
+it goes to the ValidationReport with the reasons.
+"""
+import io
+import re
+import csv
+import logging
+
+from field_mapping import normalize_key
+
+logger = logging.getLogger(__name__)
+
+VALIDATION_BATCH_SIZE = 500
+
+# INE province codes, which are also the first two digits of their postal codes
+PROVINCES_BY_CODE = {
+    '01': 'Araba/Álava', '02': 'Albacete', '03': 'Alicante', '04': 'Almería', '05': 'Ávila',
+    '06': 'Badajoz', '07': 'Illes Balears', '08': 'Barcelona', '09': 'Burgos', '10': 'Cáceres',
+    '11': 'Cádiz', '12': 'Castellón', '13': 'Ciudad Real', '14': 'Córdoba', '15': 'A Coruña',
+    '16': 'Cuenca', '17': 'Girona', '18': 'Granada', '19': 'Guadalajara', '20': 'Gipuzkoa',
+    '21': 'Huelva', '22': 'Huesca', '23': 'Jaén', '24': 'León', '25': 'Lleida',
+    '26': 'La Rioja', '27': 'Lugo', '28': 'Madrid', '29': 'Málaga', '30': 'Murcia',
+    '31': 'Navarra', '32': 'Ourense', '33': 'Asturias', '34': 'Palencia', '35': 'Las Palmas',
+    '36': 'Pontevedra', '37': 'Salamanca', '38': 'Santa Cruz de Tenerife', '39': 'Cantabria',
+    '40': 'Segovia', '41': 'Sevilla', '42': 'Soria', '43': 'Tarragona', '44': 'Teruel',
+    '45': 'Toledo', '46': 'Valencia', '47': 'Valladolid', '48': 'Bizkaia', '49': 'Zamora',
+    '50': 'Zaragoza', '51': 'Ceuta', '52': 'Melilla',
+}
+
+# Other spellings in use (Spanish, co-official and older names), by province code
+PROVINCE_ALIASES = {
+    '01': ('Álava', 'Araba', 'Alava'), '03': ('Alacant', 'Alicante/Alacant'),
+    '07': ('Baleares', 'Islas Baleares', 'Balears', 'Illes Balears/Islas Baleares'),
+    '12': ('Castelló', 'Castellón de la Plana', 'Castellón/Castelló'), '15': ('La Coruña', 'Coruña', 'A Coruna'),
+    '17': ('Gerona',), '20': ('Guipúzcoa', 'Guipuzcoa'), '25': ('Lérida',), '26': ('Rioja',),
+    '30': ('Región de Murcia',), '31': ('Nafarroa', 'Comunidad Foral de Navarra'), '32': ('Orense',),
+    '33': ('Principado de Asturias', 'Oviedo'), '35': ('Gran Canaria',), '38': ('Tenerife', 'Santa Cruz'),
+    '39': ('Santander',), '46': ('València', 'Valencia/València'), '48': ('Vizcaya', 'Biscay'),
+}
+
+# Normalized name -> canonical province name, built once
+PROVINCES = {normalize_key(name): name for name in PROVINCES_BY_CODE.values()}
+PROVINCES.update((normalize_key(alias), PROVINCES_BY_CODE[code])
+                 for code, aliases in PROVINCE_ALIASES.items() for alias in aliases)
+
+EMAIL_PATTERN = re.compile(
+    r"^(?!\.)(?!.*\.\.)[A-Za-z0-9.!#$%&'*+/=?^_`{|}~-]{1,64}(?<!\.)"
+    r"@(?=.{1,253}$)(?:[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?\.)+[A-Za-z]{2,63}$"
+)
+DNI_PATTERN = re.compile(r'^([XYZ]?)(\d{7,8})([A-Z]?)$')
+DNI_LETTERS = 'TRWAGMYFPDXBNJZSQVHLCKE'
+ID_SEPARATORS = str.maketrans('', '', ' .-_/')
+
+
+def normalize_email(value):
+    """(normalized email, error or None)."""
+    email = value.strip()
+    if email[:7].lower() == 'mailto:':
+        email = email[7:].strip()
+    if not EMAIL_PATTERN.match(email):
+        return value, 'invalid email'
+    local, _, domain = email.rpartition('@')
+    return f"{local}@{domain.lower()}", None
+
+
+def normalize_postal_code(value):
+    """(5-digit postal code, error or None); a code that lost its leading zero ('8001') gets it back."""
+    code = value if len(value) == 5 and value.isdigit() else value.translate(ID_SEPARATORS)
+    if len(code) == 4:
+        code = '0' + code
+    if not code.isdigit() or len(code) != 5:
+        return value, 'postal code must have 5 digits'
+    if code[:2] not in PROVINCES_BY_CODE:
+        return value, 'unknown province prefix in postal code'
+    return code, None
+
+
+def normalize_dni(value):
+    """(DNI/NIE with checked control letter, error or None); values of any other shape pass as they are."""
+    match = DNI_PATTERN.match(value)
+    if match is None:
+        match = DNI_PATTERN.match(value.translate(ID_SEPARATORS).upper())
+    if match is None:
+        return value.strip(), None
+    prefix, digits, letter = match.groups()
+    if prefix and len(digits) != 7:
+        return value, 'NIE must have 7 digits'
+    if not letter:
+        return value, 'DNI/NIE without control letter'
+    if not prefix:
+        digits = digits.zfill(8)
+    # An NIE is checked like a DNI with X, Y, Z read as 0, 1, 2
+    number = int(f"{'XYZ'.index(prefix)}{digits}") if prefix else int(digits)
+    if DNI_LETTERS[number % 23] != letter:
+        return value, 'DNI/NIE control letter does not match'
+    return f"{prefix}{digits}{letter}", None
+
+
+def normalize_province(value):
+    """(canonical province name, error or None)."""
+    key = normalize_key(value)
+    if key.startswith('provincia de '):
+        key = key[len('provincia de '):]
+    province = PROVINCES.get(key)
+    if province is None:
+        return value, 'unknown province'
+    return province, None
+
+
+VALIDATORS = {
+    'email': normalize_email,
+    'postal_code': normalize_postal_code,
+    'dni': normalize_dni,
+    'province': normalize_province,
+}
+
+
+def _validator(column, kind):
+    if kind not in VALIDATORS:
+        raise ValueError(f"Unknown validator '{kind}' for column '{column}', expected one of {tuple(VALIDATORS)}")
+    return VALIDATORS[kind]
+
+
+class ValidationReport:
+    """Counts of one export's validation and the rejected rows with their reasons."""
+
+    def __init__(self):
+        self.rows = 0
+        self.accepted = 0
+        self.normalized = 0
+        self.rejects = []
+
+    @property
+    def rejected_rows(self):
+        return [row for _, row, _ in self.rejects]
+
+    @property
+    def rejected_card_ids(self):
+        """Trello card ids of the rejected rows (those built by a FieldMapping)."""
+        return [row.card_id for _, row, _ in self.rejects if getattr(row, 'card_id', None)]
+
+    def reasons(self):
+        """The rejected values, one {'row', 'column', 'value', 'reason'} dict each."""
+        return [
+            {'row': number, 'column': column, 'value': value, 'reason': reason}
+            for number, _, errors in self.rejects
+            for column, value, reason in errors
+        ]
+
+    def by_reason(self):
+        counts = {}
+        for _, _, errors in self.rejects:
+            for column, _, reason in errors:
+                key = f"{column}: {reason}"
+                counts[key] = counts.get(key, 0) + 1
+        return counts
+
+    def summary(self):
+        return {
+            'rows': self.rows,
+            'accepted': self.accepted,
+            'rejected': len(self.rejects),
+            'normalized': self.normalized,
+            'by_reason': self.by_reason(),
+        }
+
+    def to_csv(self):
+        """One line per invalid value: export row number, account, column, value and reason."""
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(['row', 'accountname', 'account_no', 'column', 'value', 'reason'])
+        for number, row, errors in self.rejects:
+            for column, value, reason in errors:
+                writer.writerow([number, row.get('accountname', ''), row.get('account_no', ''), column, value, reason])
+        return output.getvalue()
+
+
+class RowValidator:
+    """
+    Compiled {column: validator name} rules of a field mapping, plus
+    source_rules {column: {source index: validator name}} that only check the
+    values a row took from those sources (Row.sources, see field_mapping.py).
+    """
+
+    def __init__(self, rules, source_rules=None):
+        self.rules = []
+        for column, kind in rules.items():
+            self.rules.append((column, kind, _validator(column, kind), None))
+        by_kind = {}
+        for column, sources in (source_rules or {}).items():
+            for index, kind in sources.items():
+                by_kind.setdefault((column, kind), set()).add(index)
+        for (column, kind), indexes in by_kind.items():
+            self.rules.append((column, kind, _validator(column, kind), frozenset(indexes)))
+        # An empty province is filled from a valid postal code
+        kinds = {kind: column for column, kind, _, indexes in self.rules if indexes is None}
+        self.fill_province = None
+        if 'province' in kinds and 'postal_code' in kinds:
+            self.fill_province = (kinds['province'], kinds['postal_code'])
+
+    def validate(self, rows, report, memo):
+        """
+        Normalize a batch of rows in place and return the valid ones; invalid
+        rows are left as they were and recorded in report. memo maps each
+        validator name to {raw value: result} across batches.
+        """
+        errors = {}
+        changes = []
+        for column, kind, normalize, indexes in self.rules:
+            seen = memo.setdefault(kind, {})
+            for i, row in enumerate(rows):
+                raw = row.get(column)
+                if not raw:
+                    continue
+                if indexes is not None:
+                    # Rows that do not record their sources are checked
+                    sources = getattr(row, 'sources', None)
+                    if sources is not None and sources.get(column) not in indexes:
+                        continue
+                result = seen.get(raw)
+                if result is None:
+                    result = seen[raw] = normalize(raw)
+                value, error = result
+                if error is not None:
+                    errors.setdefault(i, []).append((column, raw, error))
+                elif value != raw:
+                    changes.append((i, column, value))
+
+        first = report.rows + 1
+        report.rows += len(rows)
+        for i, row_errors in sorted(errors.items()):
+            report.rejects.append((first + i, rows[i], row_errors))
+        for i, column, value in changes:
+            if i not in errors:
+                rows[i][column] = value
+                report.normalized += 1
+        accepted = [row for i, row in enumerate(rows) if i not in errors] if errors else rows
+
+        if self.fill_province:
+            province_column, postal_column = self.fill_province
+            for row in accepted:
+                if not row.get(province_column) and row.get(postal_column):
+                    row[province_column] = PROVINCES_BY_CODE[row[postal_column][:2]]
+                    report.normalized += 1
+        report.accepted += len(accepted)
+        return accepted
+
+
+def iter_validated(rows, validator, report, batch_size=VALIDATION_BATCH_SIZE):
+    """Yield the valid rows of a row stream, validated batch_size at a time; see RowValidator.validate."""
+    memo = {}
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield from validator.validate(batch, report, memo)
+            batch = []
+    if batch:
+        yield from validator.validate(batch, report, memo)
+    if report.rejects:
+        logger.warning(f"Export validation rejected {len(report.rejects)} of {report.rows} rows: {report.by_reason()}")
@@ -0,0 +1,39 @@
+"""
+Production launcher: serves asgi:app under uvicorn instead of Flask's
+development server.
+
+    python serve.py
+    python serve.py --host 0.0.0.0 --port 8000
+
+HOST, PORT, WEB_WORKERS and LOG_LEVEL set the defaults. Background jobs, the
+board mirror and the response cache live in the worker process, so keep one
+worker unless the cache is shared (CACHE_BACKEND=sqlite) and the mirror is off.
+"""
+import os
+import argparse
+
+import uvicorn
+from dotenv import load_dotenv
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default=os.getenv('HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('PORT', '5002')))
+    parser.add_argument('--workers', type=int, default=int(os.getenv('WEB_WORKERS', '1')))
+    parser.add_argument('--log-level', default=os.getenv('LOG_LEVEL', 'info'))
+    args = parser.parse_args()
+
+    uvicorn.run(
+        'asgi:app',
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        log_level=args.log_level,
+        proxy_headers=True,
+    )
+
+
+if __name__ == '__main__':
+    main()
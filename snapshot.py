@@ -0,0 +1,212 @@
+"""
+Pre-warmed snapshot of the Factura list.
+
+prewarm.py (or the app itself) loads the configured list with every card's
+checklists and custom fields, the same data a full /board-data load returns,
+and writes it as gzip-compressed JSON. With BOARD_SNAPSHOT=1 the app reads
+the file at startup and serves /board-data and /board-data/<card_id> from it
+straight away; a background thread rebuilds it every
+SNAPSHOT_REFRESH_INTERVAL seconds and swaps the new one in, so requests never
+wait on Trello. Files are replaced atomically (written aside, then renamed),
+so a reader never sees half a snapshot, and a newer file written by another
+worker or by a cron-run prewarm.py is picked up instead of fetching again.
+"""
+import os
+import gzip
+import json
+import time
+import logging
+import threading
+
+from board_model import parse_cards
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+DEFAULT_SNAPSHOT_PATH = os.path.join('snapshots', 'factura.json.gz')
+
+
+def _to_dict(obj):
+    return obj.to_dict()
+
+
+def _dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data, default=_to_dict)
+    return json.dumps(data, default=_to_dict, separators=(',', ':')).encode('utf-8')
+
+
+def _loads(content):
+    return orjson.loads(content) if orjson is not None else json.loads(content)
+
+
+class Snapshot:
+    """One immutable generation of the Factura list; replaced whole, never updated in place."""
+
+    def __init__(self, board_id, factura_list, cards, created_at):
+        self.board_id = board_id
+        self.factura_list = factura_list
+        self.cards = cards
+        self.created_at = created_at
+        self.by_id = {card['id']: card for card in cards}
+
+    @property
+    def age(self):
+        return time.time() - self.created_at
+
+    def to_dict(self):
+        return {
+            'version': SNAPSHOT_VERSION,
+            'board_id': self.board_id,
+            'list': self.factura_list,
+            'created_at': self.created_at,
+            'cards': self.cards,
+        }
+
+
+def write_snapshot(path, snapshot, compresslevel=6):
+    """Write snapshot to path atomically; returns the file size."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    part_path = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+    try:
+        with gzip.open(part_path, 'wb', compresslevel=compresslevel) as f:
+            f.write(_dumps(snapshot.to_dict()))
+        os.replace(part_path, path)
+    finally:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+    return os.path.getsize(path)
+
+
+def read_snapshot(path):
+    """The Snapshot stored at path. Raises ValueError if its format version is not this one."""
+    with gzip.open(path, 'rb') as f:
+        data = _loads(f.read())
+    if data.get('version') != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version in {path}: {data.get('version')}")
+    return Snapshot(data['board_id'], data['list'], parse_cards(data['cards']), data['created_at'])
+
+
+def build_snapshot(loader, board_id, list_name='Factura'):
+    """Load the list and its cards with checklists and custom fields from Trello."""
+    factura_list, cards = loader.load_factura_cards(board_id, list_name)
+    return Snapshot(board_id, factura_list, cards, time.time())
+
+
+class BoardSnapshot:
+    """
+    The snapshot the app serves from. load_snapshot() builds a fresh Snapshot
+    from Trello; refresh_interval 0 disables the background refresh.
+    """
+
+    def __init__(self, load_snapshot, board_id, path=DEFAULT_SNAPSHOT_PATH, refresh_interval=300, enabled=False):
+        self.load_snapshot = load_snapshot
+        self.board_id = board_id
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self.enabled = enabled
+        self.stats = {'loaded': 0, 'refreshed': 0, 'failed': 0}
+        self.last_error = None
+        self._current = None
+        self._file_mtime = None
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def ready(self):
+        return self.enabled and self._current is not None
+
+    def cards(self):
+        return self._current.cards
+
+    def get_card(self, card_id):
+        return self._current.by_id.get(card_id)
+
+    def _file_time(self):
+        try:
+            return os.path.getmtime(self.path)
+        except OSError:
+            return None
+
+    def load(self):
+        """Swap in the snapshot on disk if it changed, is for this board and is newer than the one in memory."""
+        current = self._current
+        mtime = self._file_time()
+        if mtime is None or mtime == self._file_mtime:
+            return False
+        self._file_mtime = mtime
+        try:
+            snapshot = read_snapshot(self.path)
+        except Exception as e:
+            logger.warning(f"Could not read board snapshot {self.path}: {e}")
+            return False
+        if snapshot.board_id != self.board_id:
+            logger.warning(f"Ignoring board snapshot {self.path} of board {snapshot.board_id}")
+            return False
+        if current is not None and snapshot.created_at <= current.created_at:
+            return False
+        self._current = snapshot
+        self.stats['loaded'] += 1
+        logger.info(f"Loaded board snapshot with {len(snapshot.cards)} cards, {snapshot.age:.0f}s old")
+        return True
+
+    def refresh(self, force=False):
+        """
+        Rebuild the snapshot from Trello, write it and swap it in. Unless
+        forced, a file written by someone else within the refresh interval is
+        loaded instead.
+        """
+        with self._refresh_lock:
+            if not force and self.load() and self._current.age < self.refresh_interval:
+                return self._current
+            start = time.perf_counter()
+            try:
+                snapshot = self.load_snapshot()
+                size = write_snapshot(self.path, snapshot)
+                self._file_mtime = self._file_time()
+            except Exception as e:
+                self.stats['failed'] += 1
+                self.last_error = str(e)
+                raise
+            self._current = snapshot
+            self.stats['refreshed'] += 1
+            self.last_error = None
+            logger.info(f"Board snapshot refreshed: {len(snapshot.cards)} cards, {size} bytes, "
+                        f"{time.perf_counter() - start:.1f}s")
+            return snapshot
+
+    def _run(self):
+        current = self._current
+        wait = max(0.0, self.refresh_interval - current.age) if current is not None else 0.0
+        while not self._stop.wait(wait):
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Error refreshing board snapshot")
+            wait = self.refresh_interval
+
+    def start(self):
+        """Load the snapshot on disk and start the background refresh."""
+        if not self.enabled:
+            return
+        self.load()
+        if self.refresh_interval and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='board-snapshot', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def snapshot(self):
+        current = self._current
+        status = dict(self.stats, enabled=self.enabled, ready=self.ready, path=self.path,
+                      refresh_interval=self.refresh_interval, last_error=self.last_error)
+        if current is not None:
+            status.update(cards=len(current.cards), created_at=current.created_at, age=round(current.age, 1))
+        return status
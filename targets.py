@@ -0,0 +1,335 @@
+"""
+Export targets: several (board, list, field mapping) combinations loaded and
+exported side by side.
+
+Targets are configured in targets.json (or TARGETS_PATH):
+
+    {
+      "max_in_flight": 8,
+      "targets": [
+        {"name": "madrid", "board_id": "abc123", "list": "Factura"},
+        {"name": "sevilla", "board_id": "def456", "list": "Facturar",
+         "mapping": "mapping_sevilla.json", "max_in_flight": 2}
+      ]
+    }
+
+Without the file there is a single 'default' target for TRELLO_BOARD_ID and
+its Factura list. All targets draw on one budget of in-flight Trello
+requests; FairScheduler hands out free slots round-robin among the targets
+that are waiting, so a large board cannot starve a small one, and each target
+can be capped below the global budget.
+"""
+import os
+import json
+import time
+import logging
+import threading
+import contextlib
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from fetcher import get_max_in_flight
+from field_mapping import load_mapping
+from jobs import JobCancelled, PROGRESS_FIELDS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TARGETS_PATH = 'targets.json'
+
+IDLE = 'idle'
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+
+class Target:
+    """One board/list to export, with the field mapping its rows are built with."""
+
+    def __init__(self, name, board_id, list_name='Factura', mapping_path=None, max_in_flight=None):
+        self.name = name
+        self.board_id = board_id
+        self.list_name = list_name
+        self.mapping_path = mapping_path
+        self.max_in_flight = max_in_flight
+        self._mapping = None
+
+    @property
+    def mapping(self):
+        """The compiled field mapping; the default vTiger mapping unless the target has its own."""
+        if self._mapping is None:
+            if self.mapping_path:
+                self._mapping = load_mapping(self.mapping_path)
+            else:
+                from vtiger_export import DEFAULT_MAPPING
+                self._mapping = DEFAULT_MAPPING
+        return self._mapping
+
+    def sync_key(self, destination):
+        """Incremental sync watermark key for this target and destination ('csv' or 'vtiger')."""
+        return f"{destination}:{self.name}"
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'board_id': self.board_id,
+            'list': self.list_name,
+            'mapping': self.mapping_path,
+            'max_in_flight': self.max_in_flight,
+        }
+
+
+def load_targets(path=None):
+    """
+    Read the target configuration. Returns (targets, max_in_flight); targets
+    is an OrderedDict by name. Falls back to the single TRELLO_BOARD_ID target.
+    """
+    path = path or os.getenv('TARGETS_PATH', DEFAULT_TARGETS_PATH)
+    if not os.path.exists(path):
+        default = Target('default', os.getenv('TRELLO_BOARD_ID'))
+        return OrderedDict([(default.name, default)]), get_max_in_flight()
+
+    with open(path, encoding='utf-8') as f:
+        config = json.load(f)
+    targets = OrderedDict()
+    for entry in config.get('targets', []):
+        if not entry.get('name') or not entry.get('board_id'):
+            raise ValueError(f"Target needs a name and a board_id: {entry}")
+        if entry['name'] in targets:
+            raise ValueError(f"Duplicate target name '{entry['name']}'")
+        targets[entry['name']] = Target(
+            entry['name'],
+            entry['board_id'],
+            entry.get('list', 'Factura'),
+            mapping_path=entry.get('mapping'),
+            max_in_flight=entry.get('max_in_flight'),
+        )
+    if not targets:
+        raise ValueError(f"No targets configured in {path}")
+    logger.info(f"Loaded {len(targets)} export targets from {path}")
+    return targets, int(config.get('max_in_flight') or get_max_in_flight())
+
+
+class FairScheduler:
+    """
+    Shares max_in_flight upstream request slots between targets. Waiting
+    requests are queued per target, and each free slot goes to the next target
+    in round-robin order that still has room under its own cap.
+    """
+
+    def __init__(self, max_in_flight):
+        self.max_in_flight = max_in_flight
+        self._lock = threading.Lock()
+        self._waiting = OrderedDict()
+        self._caps = {}
+        self._in_flight = {}
+        self._granted = {}
+        self._busy = 0
+
+    def register(self, name, cap=None):
+        with self._lock:
+            self._waiting.setdefault(name, deque())
+            self._caps[name] = cap
+            self._in_flight.setdefault(name, 0)
+            self._granted.setdefault(name, 0)
+
+    def acquire(self, name):
+        """Block until target name gets a request slot."""
+        granted = threading.Event()
+        with self._lock:
+            self._waiting[name].append(granted)
+            self._dispatch()
+        granted.wait()
+
+    def release(self, name):
+        with self._lock:
+            self._in_flight[name] -= 1
+            self._busy -= 1
+            self._dispatch()
+
+    def _dispatch(self):
+        while self._busy < self.max_in_flight:
+            for name, waiting in self._waiting.items():
+                cap = self._caps.get(name)
+                if waiting and (cap is None or self._in_flight[name] < cap):
+                    break
+            else:
+                return
+            waiting.popleft().set()
+            self._in_flight[name] += 1
+            self._granted[name] += 1
+            self._busy += 1
+            # The target just served goes to the back of the rotation
+            self._waiting.move_to_end(name)
+
+    @contextlib.contextmanager
+    def slot(self, name):
+        self.acquire(name)
+        try:
+            yield
+        finally:
+            self.release(name)
+
+    def gate(self, name):
+        """A zero-argument context manager factory for BoardLoader(gate=...)."""
+        return lambda: self.slot(name)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'max_in_flight': self.max_in_flight,
+                'in_flight': self._busy,
+                'targets': {
+                    name: {
+                        'in_flight': self._in_flight[name],
+                        'waiting': len(self._waiting[name]),
+                        'granted': self._granted[name],
+                        'max_in_flight': self._caps.get(name),
+                    }
+                    for name in self._caps
+                },
+            }
+
+
+class TargetStatus:
+    """Last known state, progress and result of every target, for the aggregated status view."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._status = {}
+
+    def _entry(self, name):
+        entry = self._status.get(name)
+        if entry is None:
+            entry = self._status[name] = {
+                'status': IDLE,
+                'job_id': None,
+                'progress': dict.fromkeys(PROGRESS_FIELDS, 0),
+                'started_at': None,
+                'finished_at': None,
+                'duration': None,
+                'result': None,
+                'error': None,
+            }
+        return entry
+
+    def update(self, name, **fields):
+        with self._lock:
+            entry = self._entry(name)
+            progress = fields.pop('progress', None)
+            if progress:
+                entry['progress'].update(progress)
+            entry.update(fields)
+
+    def start(self, name, job_id=None):
+        self.update(name, status=RUNNING, job_id=job_id, started_at=time.time(), finished_at=None,
+                    duration=None, result=None, error=None, progress=dict.fromkeys(PROGRESS_FIELDS, 0))
+
+    def finish(self, name, status, result=None, error=None):
+        now = time.time()
+        with self._lock:
+            entry = self._entry(name)
+            started = entry['started_at'] or now
+            entry.update(status=status, result=result, error=error, finished_at=now,
+                         duration=round(now - started, 3))
+
+    def totals(self, names):
+        """Progress counts summed over names."""
+        with self._lock:
+            totals = dict.fromkeys(PROGRESS_FIELDS, 0)
+            for name in names:
+                for field, value in self._entry(name)['progress'].items():
+                    totals[field] += value or 0
+            return totals
+
+    def snapshot(self, names):
+        with self._lock:
+            return {name: dict(self._entry(name), progress=dict(self._entry(name)['progress'])) for name in names}
+
+
+class TargetProgress:
+    """Progress reporter for one target inside a multi-target job; also updates the job's summed progress."""
+
+    def __init__(self, name, status, names, progress=None, lock=None):
+        self.name = name
+        self.status = status
+        self.names = names
+        self.progress = progress
+        self._lock = lock or threading.Lock()
+
+    def update(self, **counts):
+        self.status.update(self.name, progress=counts)
+        if self.progress is not None:
+            with self._lock:
+                self.progress.update(**self.status.totals(self.names))
+
+
+def run_targets(targets, run_one, scheduler, status, progress=None, job_id=None, max_workers=None):
+    """
+    Run run_one(target, gate, target_progress) -> result dict for every target
+    at once, each target's Trello requests going through the shared scheduler.
+    A failing target does not stop the others. Returns {name: outcome}; raises
+    JobCancelled after all targets stopped if the job was cancelled.
+    """
+    names = [target.name for target in targets]
+    for target in targets:
+        scheduler.register(target.name, target.max_in_flight)
+        status.update(target.name, status=QUEUED, job_id=job_id)
+    progress_lock = threading.Lock()
+    cancelled = threading.Event()
+
+    def run(target):
+        status.start(target.name, job_id)
+        target_progress = TargetProgress(target.name, status, names, progress, progress_lock)
+        try:
+            result = run_one(target, scheduler.gate(target.name), target_progress)
+        except JobCancelled:
+            cancelled.set()
+            status.finish(target.name, CANCELLED)
+            return {'status': CANCELLED}
+        except Exception as e:
+            logger.exception(f"Target {target.name} failed")
+            status.finish(target.name, FAILED, error=str(e))
+            return {'status': FAILED, 'error': str(e)}
+        status.finish(target.name, DONE, result=result)
+        logger.info(f"Target {target.name} finished")
+        return dict(result, status=DONE)
+
+    workers = max_workers or int(os.getenv('TARGET_WORKERS', '8'))
+    with ThreadPoolExecutor(max_workers=min(workers, len(targets)) or 1, thread_name_prefix='target') as pool:
+        outcomes = dict(zip(names, pool.map(run, targets)))
+    if cancelled.is_set():
+        raise JobCancelled()
+    return outcomes
+
+
+_targets = None
+_scheduler = None
+_status = TargetStatus()
+_targets_lock = threading.Lock()
+
+
+def get_targets():
+    """Return the configured targets (an OrderedDict by name), loading them on first use."""
+    _load()
+    return _targets
+
+
+def get_scheduler():
+    """Return the process-wide FairScheduler shared by all target runs."""
+    _load()
+    return _scheduler
+
+
+def get_target_status():
+    return _status
+
+
+def _load():
+    global _targets, _scheduler
+    with _targets_lock:
+        if _targets is None:
+            targets, max_in_flight = load_targets()
+            _scheduler = FairScheduler(max_in_flight)
+            _targets = targets
@@ -0,0 +1,72 @@
+import pytest
+
+from row_validation import normalize_dni, normalize_postal_code, normalize_province
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('12345678Z', '12345678Z'),
+    ('12345678-z', '12345678Z'),
+    ('12.345.678 Z', '12345678Z'),
+    # NIE: X, Y, Z are read as 0, 1, 2 for the control letter
+    ('X1234567L', 'X1234567L'),
+    ('y-1234567-x', 'Y1234567X'),
+    # A DNI that lost its leading zero is zero-filled to 8 digits
+    ('1234567L', '01234567L'),
+])
+def test_normalize_dni(value, expected):
+    assert normalize_dni(value) == (expected, None)
+
+
+@pytest.mark.parametrize('value, error', [
+    ('12345678A', 'DNI/NIE control letter does not match'),
+    ('X1234567A', 'DNI/NIE control letter does not match'),
+    ('X12345678Z', 'NIE must have 7 digits'),
+    ('12345678', 'DNI/NIE without control letter'),
+])
+def test_normalize_dni_rejects(value, error):
+    assert normalize_dni(value) == (value, error)
+
+
+@pytest.mark.parametrize('value', ['B12345678', 'PAS123456'])
+def test_normalize_dni_passes_other_ids(value):
+    assert normalize_dni(value) == (value, None)
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('28001', '28001'),
+    ('28.001', '28001'),
+    ('28 001', '28001'),
+    ('8001', '08001'),
+    ('8.001', '08001'),
+])
+def test_normalize_postal_code(value, expected):
+    assert normalize_postal_code(value) == (expected, None)
+
+
+@pytest.mark.parametrize('value, error', [
+    ('53001', 'unknown province prefix in postal code'),
+    ('00123', 'unknown province prefix in postal code'),
+    ('280011', 'postal code must have 5 digits'),
+    ('28A01', 'postal code must have 5 digits'),
+])
+def test_normalize_postal_code_rejects(value, error):
+    assert normalize_postal_code(value) == (value, error)
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('Madrid', 'Madrid'),
+    ('GIRONA', 'Girona'),
+    ('Gerona', 'Girona'),
+    ('La Coruña', 'A Coruña'),
+    ('a coruna', 'A Coruña'),
+    ('Vizcaya', 'Bizkaia'),
+    ('Islas Baleares', 'Illes Balears'),
+    ('Provincia de Orense', 'Ourense'),
+    (' alava ', 'Araba/Álava'),
+])
+def test_normalize_province(value, expected):
+    assert normalize_province(value) == (expected, None)
+
+
+def test_normalize_province_rejects():
+    assert normalize_province('Atlantis') == ('Atlantis', 'unknown province')
@@ -0,0 +1,318 @@
+"""
+Shared HTTP client for the Trello and Amazing Fields APIs.
+
+Keeps one pooled requests.Session per host, retries 429/5xx responses with
+exponential backoff and jitter, and throttles Trello calls with token buckets
+sized to Trello's per-key and per-token quotas. AsyncApiClient does the same
+on aiohttp for the ASGI routes.
+"""
+import os
+import time
+import asyncio
+import random
+import logging
+import threading
+from urllib.parse import urlsplit
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+
+from cache import cache_from_env
+from metrics import observe_cache, observe_upstream, upstream_category
+
+logger = logging.getLogger(__name__)
+
+# Trello allows 300 requests per 10 seconds per API key and 100 per token.
+TRELLO_KEY_LIMIT = (300, 10.0)
+TRELLO_TOKEN_LIMIT = (100, 10.0)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at capacity/interval tokens per second."""
+
+    def __init__(self, capacity, interval):
+        self.capacity = capacity
+        self.rate = capacity / interval
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Take one token, sleeping until one is available."""
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Take one token, yielding to the event loop until one is available."""
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            await asyncio.sleep(wait)
+
+    def limit_to(self, remaining):
+        """Clamp the available tokens to what the server says is left."""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.tokens, float(remaining))
+
+
+class ApiClient:
+    """Pooled, rate-limited HTTP client used for every upstream call."""
+
+    def __init__(self, pool_size=20, max_retries=3, backoff_base=0.5, backoff_max=8.0, rate_limit=True,
+                 cache=None):
+        self.pool_size = pool_size
+        self.cache = cache
+        self.rate_limit = rate_limit
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.stats = {'requests': 0, 'retries': 0, 'throttled': 0}
+        self._sessions = {}
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _session_for(self, url):
+        parts = urlsplit(url)
+        host = f"{parts.scheme}://{parts.netloc}"
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+                session.mount(host, adapter)
+                self._sessions[host] = session
+            return session
+
+    def _bucket(self, kind, value, limit):
+        with self._lock:
+            bucket = self._buckets.get((kind, value))
+            if bucket is None:
+                bucket = self._buckets[(kind, value)] = TokenBucket(*limit)
+            return bucket
+
+    def _buckets_for(self, params):
+        """Return the Trello quota buckets that apply to a request, if any."""
+        params = params or {}
+        buckets = []
+        if not self.rate_limit:
+            return buckets
+        if params.get('key'):
+            buckets.append(self._bucket('key', params['key'], TRELLO_KEY_LIMIT))
+        if params.get('token'):
+            buckets.append(self._bucket('token', params['token'], TRELLO_TOKEN_LIMIT))
+        return buckets
+
+    def _backoff(self, attempt, response):
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return random.uniform(0, delay)
+
+    def _read_rate_headers(self, response, buckets):
+        """Apply Trello's x-rate-limit-*-remaining headers to the local buckets."""
+        for kind, bucket in zip(('key', 'token'), buckets):
+            remaining = response.headers.get(f'x-rate-limit-api-{kind}-remaining')
+            if remaining is not None:
+                try:
+                    bucket.limit_to(int(remaining))
+                except ValueError:
+                    pass
+
+    def get(self, url, params=None, headers=None, timeout=30, use_cache=True):
+        """GET url through the response cache, if one is configured."""
+        if self.cache is None or not use_cache:
+            return self._get(url, params, headers, timeout)
+        response = self.cache.fetch(
+            url, params,
+            lambda extra_headers: self._get(url, params, {**(headers or {}), **extra_headers}, timeout)
+        )
+        observe_cache(upstream_category(url, params), response.from_cache)
+        return response
+
+    def _get(self, url, params=None, headers=None, timeout=30):
+        """GET url, retrying 429/5xx responses and connection errors with backoff."""
+        session = self._session_for(url)
+        buckets = self._buckets_for(params)
+        category = upstream_category(url, params)
+        response = None
+        for attempt in range(self.max_retries + 1):
+            for bucket in buckets:
+                bucket.acquire()
+            with self._lock:
+                self.stats['requests'] += 1
+            started = time.perf_counter()
+            try:
+                response = session.get(url, params=params, headers=headers, timeout=timeout)
+            except requests.ConnectionError:
+                observe_upstream(category, time.perf_counter() - started, 'error')
+                if attempt == self.max_retries:
+                    raise
+                response = None
+            else:
+                observe_upstream(category, time.perf_counter() - started, response.status_code)
+                self._read_rate_headers(response, buckets)
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    return response
+                if response.status_code == 429:
+                    with self._lock:
+                        self.stats['throttled'] += 1
+                    for bucket in buckets:
+                        bucket.limit_to(0)
+
+            with self._lock:
+                self.stats['retries'] += 1
+            delay = self._backoff(attempt, response)
+            status = response.status_code if response is not None else 'connection error'
+            logger.warning(f"Retrying {urlsplit(url).path} after {status} in {delay:.2f}s")
+            time.sleep(delay)
+        return response
+
+
+class AsyncApiClient(ApiClient):
+    """
+    ApiClient for coroutines: same retries, quota buckets, stats and cache,
+    on a pooled aiohttp session so waiting on upstream does not hold a thread.
+    Responses are returned as requests.Response objects, like ApiClient's.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._http = None
+
+    def _async_session(self):
+        if self._http is None or self._http.closed:
+            self._http = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.pool_size))
+        return self._http
+
+    async def _request(self, url, params, headers, timeout):
+        http = self._async_session()
+        client_timeout = aiohttp.ClientTimeout(total=timeout)
+        async with http.get(url, params=params, headers=headers, timeout=client_timeout) as upstream:
+            response = requests.Response()
+            response.status_code = upstream.status
+            response._content = await upstream.read()
+            response.headers.update(upstream.headers)
+            response.url = str(upstream.url)
+            response.encoding = upstream.charset or 'utf-8'
+            return response
+
+    async def get(self, url, params=None, headers=None, timeout=30, use_cache=True):
+        """GET url through the response cache, if one is configured."""
+        if self.cache is None or not use_cache:
+            return await self._get(url, params, headers, timeout)
+        response = await self.cache.fetch_async(
+            url, params,
+            lambda extra_headers: self._get(url, params, {**(headers or {}), **extra_headers}, timeout)
+        )
+        observe_cache(upstream_category(url, params), response.from_cache)
+        return response
+
+    async def _get(self, url, params=None, headers=None, timeout=30):
+        """GET url, retrying 429/5xx responses and connection errors with backoff."""
+        buckets = self._buckets_for(params)
+        category = upstream_category(url, params)
+        response = None
+        for attempt in range(self.max_retries + 1):
+            for bucket in buckets:
+                await bucket.acquire_async()
+            with self._lock:
+                self.stats['requests'] += 1
+            started = time.perf_counter()
+            try:
+                response = await self._request(url, params, headers, timeout)
+            except aiohttp.ClientConnectionError:
+                observe_upstream(category, time.perf_counter() - started, 'error')
+                if attempt == self.max_retries:
+                    raise
+                response = None
+            else:
+                observe_upstream(category, time.perf_counter() - started, response.status_code)
+                self._read_rate_headers(response, buckets)
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    return response
+                if response.status_code == 429:
+                    with self._lock:
+                        self.stats['throttled'] += 1
+                    for bucket in buckets:
+                        bucket.limit_to(0)
+
+            with self._lock:
+                self.stats['retries'] += 1
+            delay = self._backoff(attempt, response)
+            status = response.status_code if response is not None else 'connection error'
+            logger.warning(f"Retrying {urlsplit(url).path} after {status} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+        return response
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.close()
+            self._http = None
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the process-wide ApiClient, creating it from the environment on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ApiClient(
+                    pool_size=int(os.getenv('HTTP_POOL_SIZE', '20')),
+                    max_retries=int(os.getenv('HTTP_MAX_RETRIES', '3')),
+                    rate_limit=os.getenv('TRELLO_RATE_LIMIT', '1') != '0',
+                    cache=cache_from_env(),
+                )
+    return _client
+
+
+_async_client = None
+
+
+def get_async_client():
+    """
+    Return the process-wide AsyncApiClient. It shares the response cache and
+    the Trello quota buckets with get_client(), so both serving modes draw
+    from one budget and see the same invalidations.
+    """
+    global _async_client
+    if _async_client is None:
+        client = get_client()
+        with _client_lock:
+            if _async_client is None:
+                async_client = AsyncApiClient(
+                    pool_size=client.pool_size,
+                    max_retries=client.max_retries,
+                    rate_limit=client.rate_limit,
+                    cache=client.cache,
+                )
+                async_client._buckets = client._buckets
+                async_client._lock = client._lock
+                _async_client = async_client
+    return _async_client
@@ -0,0 +1,198 @@
+"""
+vTiger webservice client that upserts Accounts from export rows.
+
+Logs in once (getchallenge + login) and reuses the session until it expires,
+looks up existing accounts by account_no (or accountname, for rows without
+one) with one query per batch of rows, and creates or revises records
+concurrently on a bounded pool.
+"""
+import os
+import time
+import json
+import hashlib
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from fetcher import fan_out
+
+logger = logging.getLogger(__name__)
+
+# vTiger query results are capped at 100 rows.
+QUERY_BATCH_SIZE = 100
+
+UPSERT_FIELDS = ("accountname", "account_no", "phone", "email1", "website",
+                 "bill_street", "bill_city", "bill_state", "bill_code", "bill_country",
+                 "description")
+
+
+class VtigerError(Exception):
+    def __init__(self, code, message):
+        super().__init__(f"{code}: {message}")
+        self.code = code
+
+
+class VtigerClient:
+    def __init__(self, url, username, access_key, max_workers=4, session_ttl=1800):
+        self.endpoint = url.rstrip('/') + '/webservice.php'
+        self.username = username
+        self.access_key = access_key
+        self.max_workers = max_workers
+        self.session_ttl = session_ttl
+        self.http = requests.Session()
+        self.http.mount(self.endpoint, HTTPAdapter(pool_maxsize=max_workers))
+        self._session_name = None
+        self._user_id = None
+        self._session_expires = 0.0
+        self._lock = threading.Lock()
+
+    def _call(self, method, params):
+        if method == 'GET':
+            response = self.http.get(self.endpoint, params=params, timeout=30)
+        else:
+            response = self.http.post(self.endpoint, data=params, timeout=30)
+        response.raise_for_status()
+        payload = response.json()
+        if not payload.get('success'):
+            error = payload.get('error', {})
+            raise VtigerError(error.get('code', 'UNKNOWN'), error.get('message', ''))
+        return payload['result']
+
+    def login(self):
+        """Run the challenge/login handshake and cache the session."""
+        challenge = self._call('GET', {'operation': 'getchallenge', 'username': self.username})
+        access_key = hashlib.md5((challenge['token'] + self.access_key).encode('utf-8')).hexdigest()
+        result = self._call('POST', {
+            'operation': 'login',
+            'username': self.username,
+            'accessKey': access_key,
+        })
+        self._session_name = result['sessionName']
+        self._user_id = result['userId']
+        self._session_expires = time.monotonic() + self.session_ttl
+        logger.info(f"Logged in to vTiger as {self.username}")
+
+    def session(self):
+        """Return (sessionName, userId), logging in if there is no valid session."""
+        with self._lock:
+            if self._session_name is None or time.monotonic() >= self._session_expires:
+                self.login()
+            return self._session_name, self._user_id
+
+    def _invalidate_session(self, session_name):
+        with self._lock:
+            if self._session_name == session_name:
+                self._session_name = None
+
+    def call(self, method, operation, **params):
+        """Call an operation with the cached session, logging in again once if it expired."""
+        for attempt in range(2):
+            session_name, _ = self.session()
+            try:
+                return self._call(method, dict(params, operation=operation, sessionName=session_name))
+            except VtigerError as e:
+                if e.code != 'INVALID_SESSIONID' or attempt:
+                    raise
+                self._invalidate_session(session_name)
+
+    def find_accounts(self, values, field='account_no'):
+        """Map value -> vTiger record id for the accounts whose field (account_no or accountname) already exists."""
+        found = {}
+        values = list(values)
+        for start in range(0, len(values), QUERY_BATCH_SIZE):
+            chunk = values[start:start + QUERY_BATCH_SIZE]
+            quoted = ', '.join("'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'" for value in chunk)
+            records = self.call(
+                'GET', 'query',
+                query=f"SELECT id, {field} FROM Accounts WHERE {field} IN ({quoted});"
+            )
+            for record in records:
+                found[record[field]] = record['id']
+        return found
+
+    def upsert_account(self, row, existing_id=None, fields=UPSERT_FIELDS):
+        """
+        Create an account, or revise it if it already exists. Returns (action, record id).
+        Only the row's non-empty fields are sent, so a revise keeps what vTiger
+        has for the columns the row leaves empty.
+        """
+        element = {field: row[field] for field in fields if row.get(field)}
+        if existing_id:
+            element['id'] = existing_id
+            result = self.call('POST', 'revise', element=json.dumps(element))
+            return 'updated', result['id']
+        _, user_id = self.session()
+        element['assigned_user_id'] = user_id
+        result = self.call('POST', 'create', elementType='Accounts', element=json.dumps(element))
+        return 'created', result['id']
+
+    def push_accounts(self, rows, fields=None):
+        """
+        Upsert rows (dicts keyed by vTiger column) as Accounts, sending the
+        fields columns (the mapping's headers; UPSERT_FIELDS by default).
+        Rows are matched to existing accounts by account_no, or by accountname
+        when they have none, and deduplicated the same way (the last one wins).
+        Rows with neither are not pushed and reported as failed. Returns a
+        report with one result per record.
+        """
+        start = time.perf_counter()
+        fields = tuple(fields or UPSERT_FIELDS)
+        rows = list(rows)
+        by_account_no = {}
+        by_name = {}
+        unmatched = []
+        for row in rows:
+            if row.get('account_no'):
+                by_account_no[row['account_no']] = row
+            elif row.get('accountname'):
+                by_name[row['accountname']] = row
+            else:
+                unmatched.append(row)
+        unique_rows = list(by_account_no.values()) + list(by_name.values())
+
+        existing = self.find_accounts(by_account_no) if by_account_no else {}
+        existing_by_name = self.find_accounts(by_name, 'accountname') if by_name else {}
+
+        def push(row):
+            result = {'card_id': getattr(row, 'card_id', None),
+                      'account_no': row.get('account_no', ''), 'accountname': row.get('accountname', '')}
+            try:
+                if row.get('account_no'):
+                    existing_id = existing.get(row['account_no'])
+                else:
+                    existing_id = existing_by_name.get(row['accountname'])
+                action, record_id = self.upsert_account(row, existing_id, fields)
+                result.update(success=True, action=action, id=record_id)
+            except Exception as e:
+                logger.warning(f"vTiger push failed for {result['accountname']}: {e}")
+                result.update(success=False, error=str(e))
+            return result
+
+        results = fan_out(push, unique_rows, max_in_flight=self.max_workers)
+        results.extend({'card_id': getattr(row, 'card_id', None), 'account_no': '', 'accountname': '', 'success': False,
+                        'error': 'Row has neither account_no nor accountname'} for row in unmatched)
+        elapsed = time.perf_counter() - start
+        succeeded = sum(1 for result in results if result['success'])
+        return {
+            'total': len(unique_rows) + len(unmatched),
+            'duplicates': len(rows) - len(unique_rows) - len(unmatched),
+            'succeeded': succeeded,
+            'failed': len(results) - succeeded,
+            'created': sum(1 for result in results if result.get('action') == 'created'),
+            'updated': sum(1 for result in results if result.get('action') == 'updated'),
+            'seconds': round(elapsed, 3),
+            'records_per_sec': round(len(results) / elapsed, 1) if elapsed else None,
+            'results': results,
+        }
+
+
+def vtiger_client_from_env():
+    """Build a VtigerClient from VTIGER_URL, VTIGER_USERNAME and VTIGER_ACCESS_KEY, or None."""
+    url = os.getenv('VTIGER_URL')
+    username = os.getenv('VTIGER_USERNAME')
+    access_key = os.getenv('VTIGER_ACCESS_KEY')
+    if not (url and username and access_key):
+        return None
+    return VtigerClient(url, username, access_key, max_workers=int(os.getenv('VTIGER_PUSH_WORKERS', '4')))
@@ -0,0 +1,77 @@
+"""
+vTiger CSV export: maps Trello card data to vTiger Accounts import rows.
+"""
+import io
+import csv
+import zlib
+import logging
+
+from field_mapping import load_mapping
+from metrics import SpanTotal, span
+
+logger = logging.getLogger(__name__)
+
+# Compiled once at startup; see field_mapping.json
+DEFAULT_MAPPING = load_mapping()
+
+# vTiger CSV headers
+VTIGER_HEADERS = DEFAULT_MAPPING.headers
+
+
+def build_vtiger_row(card_data, mapping=None):
+    """Build the vTiger row (a dict keyed by VTIGER_HEADERS) for one card."""
+    return (mapping or DEFAULT_MAPPING).transform(card_data)
+
+
+def generate_vtiger_csv(data_row):
+    """Generate CSV content for vTiger import from one row (see build_vtiger_row)."""
+    logger.debug("Starting CSV generation")
+    with span('csv_generation'):
+        # Create CSV content
+        output = io.StringIO()
+        writer = csv.DictWriter(output, fieldnames=VTIGER_HEADERS)
+        writer.writeheader()
+        writer.writerow(data_row)
+        
+        csv_content = output.getvalue()
+    logger.debug("CSV generation complete")
+    return csv_content
+
+
+def iter_csv_rows(rows, headers=None):
+    """
+    Yield a multi-row vTiger CSV chunk by chunk: the header line, then one line
+    per row. Only one row is held in memory at a time. The time spent
+    formatting is recorded as one csv_generation span.
+    """
+    formatting = SpanTotal('csv_generation')
+    with formatting:
+        output = io.StringIO()
+        writer = csv.DictWriter(output, fieldnames=headers or VTIGER_HEADERS)
+        writer.writeheader()
+    yield output.getvalue()
+    
+    for row in rows:
+        with formatting:
+            output.seek(0)
+            output.truncate()
+            writer.writerow(row)
+            chunk = output.getvalue()
+        yield chunk
+    formatting.record()
+
+
+def iter_vtiger_csv(cards, mapping=None):
+    """Stream the vTiger CSV for an iterable of cards (see iter_csv_rows)."""
+    mapping = mapping or DEFAULT_MAPPING
+    return iter_csv_rows((mapping.transform(card_data) for card_data in cards), mapping.headers)
+
+
+def gzip_chunks(chunks, level=6):
+    """Gzip-compress a stream of text chunks, yielding compressed bytes."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()